@@ -1,61 +1,59 @@
+import asyncio
 import os
-import sys
 from logging.config import fileConfig
 
+from sqlalchemy import pool
 from sqlalchemy.engine import Connection
 from sqlalchemy.ext.asyncio import create_async_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy import engine_from_config, pool
 
 from alembic import context
 
 from app.models import Base
 
-DATABASE_URL = os.environ.get("DATABASE_URL")
+config = context.config
+
+DATABASE_URL = os.environ.get("ALEMBIC_DATABASE_URL") or os.environ.get("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("ALEMBIC_DATABASE_URL or DATABASE_URL is not set.")
 
-config = context.config
-
 if config.config_file_name:
     fileConfig(config.config_file_name)
 
 target_metadata = Base.metadata
 
+
 def run_migrations_offline() -> None:
     context.configure(
         url=DATABASE_URL,
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
-        # --- Для asyncpg ---
-        process_revision_directives=True,
-        async_url=DATABASE_URL
     )
 
     with context.begin_transaction():
         context.run_migrations()
 
-def run_migrations_online() -> None:
+
+def do_run_migrations(connection: Connection) -> None:
+    context.configure(connection=connection, target_metadata=target_metadata)
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_migrations_online() -> None:
     connectable = create_async_engine(
         DATABASE_URL,
         poolclass=pool.NullPool,
-        echo=True
     )
 
-    with connectable.connect() as connection:
-        context.configure(
-            connection=connection,
-            target_metadata=target_metadata,
-            process_revision_directives=True,
-            async_stdlib=True
-        )
+    async with connectable.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+
+    await connectable.dispose()
 
-        with context.begin_transaction():
-            context.run_migrations()
 
 if context.is_offline_mode():
     run_migrations_offline()
 else:
-    import asyncio
-    asyncio.run(run_migrations_online())
\ No newline at end of file
+    asyncio.run(run_migrations_online())
@@ -0,0 +1,45 @@
+"""Indexes for /history lookups on query_logs
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run inside a transaction, and it keeps query_logs writable during the build.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_query_logs_cadastral_number_created_at_id",
+            "query_logs",
+            ["cadastral_number", sa.text("created_at DESC"), sa.text("id DESC")],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_query_logs_created_at_id",
+            "query_logs",
+            ["created_at", "id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_query_logs_created_at_id", table_name="query_logs",
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_query_logs_cadastral_number_created_at_id", table_name="query_logs",
+                      postgresql_concurrently=True, if_exists=True)
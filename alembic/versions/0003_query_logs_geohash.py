@@ -0,0 +1,68 @@
+"""Geohash column and index on query_logs for /history/nearby
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.geo import GEOHASH_PRECISION, encode_geohash
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 10000
+
+
+def upgrade() -> None:
+    op.add_column(
+        "query_logs",
+        sa.Column("geohash", sa.String(GEOHASH_PRECISION, collation="C"), nullable=True),
+    )
+
+    with op.get_context().autocommit_block():
+        # Geohashes are computed in Python, so offline (--sql) runs leave existing rows NULL.
+        if not op.get_context().as_sql:
+            backfill_geohashes()
+
+        op.create_index(
+            "ix_query_logs_geohash",
+            "query_logs",
+            ["geohash"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def backfill_geohashes() -> None:
+    bind = op.get_bind()
+    last_id = 0
+    # Keyset batches, each committed on its own, so the backfill never holds long locks.
+    while True:
+        rows = bind.execute(
+            sa.text("SELECT id, latitude, longitude FROM query_logs "
+                    "WHERE id > :last_id ORDER BY id LIMIT :limit"),
+            {"last_id": last_id, "limit": BACKFILL_BATCH_SIZE},
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            sa.text("UPDATE query_logs SET geohash = :geohash WHERE id = :id"),
+            [{"id": row.id, "geohash": encode_geohash(row.latitude, row.longitude)} for row in rows],
+        )
+        last_id = rows[-1].id
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_query_logs_geohash", table_name="query_logs",
+                      postgresql_concurrently=True, if_exists=True)
+    op.drop_column("query_logs", "geohash")
@@ -0,0 +1,144 @@
+"""Partition query_logs by created_at and add hourly rollups
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 00:00:00
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.maintenance import QUERY_LOGS_PARTITION_INTERVAL, QUERY_LOGS_PARTITIONS_AHEAD, \
+    create_partition_statements, future_horizon
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = "id, cadastral_number, latitude, longitude, external_server_response, created_at, geohash"
+# The partitioned table is built under this name next to the live one and swapped in at the end.
+STAGING_TABLE = "query_logs_partitioned"
+COPY_BATCH_SIZE = 10000
+
+QUERY_LOG_INDEXES = {
+    "ix_query_logs_id": ["id"],
+    "ix_query_logs_geohash": ["geohash"],
+    "ix_query_logs_cadastral_number_created_at_id": ["cadastral_number", sa.text("created_at DESC"),
+                                                     sa.text("id DESC")],
+    "ix_query_logs_created_at_id": ["created_at", "id"],
+}
+
+
+def create_query_log_indexes(table: str = "query_logs") -> None:
+    for name, columns in QUERY_LOG_INDEXES.items():
+        op.create_index(name.replace("query_logs", table, 1), table, columns)
+
+
+def upgrade() -> None:
+    # Existing rows are copied in committed batches while query_logs stays live; only rows written during
+    # that copy are moved under an EXCLUSIVE lock (reads keep working), right before the tables are swapped.
+    # Offline (--sql) scripts cannot batch and copy everything in that final, locked step.
+    now = datetime.utcnow()
+    oldest = now
+    copied_through = 0
+    online = not op.get_context().as_sql
+    if online:
+        bind = op.get_bind()
+        oldest = bind.execute(sa.text("SELECT min(created_at) FROM query_logs")).scalar() or now
+        # SHARE mode waits out in-flight inserts, so every id up to the max is committed and any id
+        # handed out after this transaction ends is larger.
+        bind.execute(sa.text("LOCK TABLE query_logs IN SHARE MODE"))
+        copied_through = bind.execute(sa.text("SELECT coalesce(max(id), 0) FROM query_logs")).scalar()
+
+    op.execute(
+        f"CREATE TABLE {STAGING_TABLE} ("
+        "id integer NOT NULL DEFAULT nextval('query_logs_id_seq'::regclass), "
+        "cadastral_number varchar NOT NULL, "
+        "latitude double precision NOT NULL, "
+        "longitude double precision NOT NULL, "
+        "external_server_response varchar, "
+        "created_at timestamp without time zone NOT NULL DEFAULT now(), "
+        "geohash varchar(12) COLLATE \"C\""
+        ") PARTITION BY RANGE (created_at)"
+    )
+    horizon = future_horizon(now, QUERY_LOGS_PARTITION_INTERVAL, QUERY_LOGS_PARTITIONS_AHEAD)
+    for statement in create_partition_statements(oldest, horizon, QUERY_LOGS_PARTITION_INTERVAL, STAGING_TABLE):
+        op.execute(statement)
+    op.execute(f"CREATE TABLE query_logs_default PARTITION OF {STAGING_TABLE} DEFAULT")
+
+    with op.get_context().autocommit_block():
+        if online:
+            copy_query_logs(copied_through)
+        # Partitioned tables need the partition key in every unique constraint. The staging table takes
+        # no traffic yet, so plain index builds lock nothing that matters.
+        op.create_primary_key(f"{STAGING_TABLE}_pkey", STAGING_TABLE, ["id", "created_at"])
+        create_query_log_indexes(STAGING_TABLE)
+
+    op.execute("LOCK TABLE query_logs IN EXCLUSIVE MODE")
+    op.execute(f"INSERT INTO {STAGING_TABLE} ({COLUMNS}) SELECT {COLUMNS} FROM query_logs "
+               f"WHERE id > {copied_through}")
+    op.execute("ALTER TABLE query_logs RENAME TO query_logs_legacy")
+    op.execute(f"ALTER TABLE {STAGING_TABLE} RENAME TO query_logs")
+    op.execute("ALTER SEQUENCE query_logs_id_seq OWNED BY query_logs.id")
+    op.execute("DROP TABLE query_logs_legacy")
+    # The legacy table held the final names until it was dropped.
+    op.execute(f"ALTER TABLE query_logs RENAME CONSTRAINT {STAGING_TABLE}_pkey TO query_logs_pkey")
+    for name in QUERY_LOG_INDEXES:
+        op.execute(f"ALTER INDEX {name.replace('query_logs', STAGING_TABLE, 1)} RENAME TO {name}")
+
+    op.create_table(
+        "query_log_rollups_hourly",
+        sa.Column("bucket", sa.DateTime(), nullable=False),
+        sa.Column("cadastral_number", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("query_count", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("bucket", "cadastral_number", "status"),
+    )
+    op.create_index("ix_query_log_rollups_hourly_cadastral_number_bucket", "query_log_rollups_hourly",
+                    ["cadastral_number", "bucket"])
+
+
+def copy_query_logs(copied_through: int) -> None:
+    bind = op.get_bind()
+    last_id = 0
+    # Keyset batches, each committed on its own, so the copy never holds long locks on query_logs.
+    while last_id < copied_through:
+        last_id = bind.execute(sa.text(
+            f"WITH batch AS (INSERT INTO {STAGING_TABLE} ({COLUMNS}) SELECT {COLUMNS} FROM query_logs "
+            "WHERE id > :last_id AND id <= :copied_through ORDER BY id LIMIT :limit RETURNING id) "
+            "SELECT max(id) FROM batch"
+        ), {"last_id": last_id, "copied_through": copied_through, "limit": COPY_BATCH_SIZE}).scalar()
+        if last_id is None:
+            break
+
+
+def downgrade() -> None:
+    op.drop_index("ix_query_log_rollups_hourly_cadastral_number_bucket", table_name="query_log_rollups_hourly")
+    op.drop_table("query_log_rollups_hourly")
+
+    op.execute("ALTER TABLE query_logs RENAME TO query_logs_partitioned")
+    op.execute("ALTER TABLE query_logs_partitioned RENAME CONSTRAINT query_logs_pkey TO query_logs_partitioned_pkey")
+    for name in ("ix_query_logs_id", "ix_query_logs_geohash", "ix_query_logs_cadastral_number_created_at_id",
+                 "ix_query_logs_created_at_id"):
+        op.execute(f"DROP INDEX {name}")
+    op.execute(
+        "CREATE TABLE query_logs ("
+        "id integer NOT NULL DEFAULT nextval('query_logs_id_seq'::regclass) PRIMARY KEY, "
+        "cadastral_number varchar NOT NULL, "
+        "latitude double precision NOT NULL, "
+        "longitude double precision NOT NULL, "
+        "external_server_response varchar, "
+        "created_at timestamp without time zone NOT NULL DEFAULT now(), "
+        "geohash varchar(12) COLLATE \"C\""
+        ")"
+    )
+    op.execute(f"INSERT INTO query_logs ({COLUMNS}) SELECT {COLUMNS} FROM query_logs_partitioned")
+    op.execute("ALTER SEQUENCE query_logs_id_seq OWNED BY query_logs.id")
+    op.execute("DROP TABLE query_logs_partitioned")
+    create_query_log_indexes()
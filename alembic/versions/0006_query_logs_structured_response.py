@@ -0,0 +1,116 @@
+"""Structured external response on query_logs: JSONB payload plus status/address/value columns
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 00:00:00
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.models import parse_response_repr
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, Sequence[str], None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 10000
+
+INDEXES = {
+    "ix_query_logs_status_created_at_id": "status, created_at DESC, id DESC",
+    "ix_query_logs_value": "value",
+}
+
+
+def upgrade() -> None:
+    # Nullable columns without defaults are a catalog-only change, even on large partitions.
+    op.add_column("query_logs", sa.Column("external_response", postgresql.JSONB(), nullable=True))
+    op.add_column("query_logs", sa.Column("status", sa.String(32), nullable=True))
+    op.add_column("query_logs", sa.Column("address", sa.String(), nullable=True))
+    op.add_column("query_logs", sa.Column("value", sa.Float(), nullable=True))
+
+    with op.get_context().autocommit_block():
+        # The repr is parsed in Python, so offline (--sql) runs leave existing rows NULL.
+        if not op.get_context().as_sql:
+            backfill_responses()
+        for name, columns in INDEXES.items():
+            create_partitioned_index(name, columns)
+
+
+def backfill_responses() -> None:
+    bind = op.get_bind()
+    select_batch = sa.text(
+        "SELECT id, created_at, external_server_response FROM query_logs "
+        "WHERE (created_at, id) < (:created_at, :id) ORDER BY created_at DESC, id DESC LIMIT :limit"
+    )
+    update = sa.text(
+        "UPDATE query_logs SET external_response = CAST(:external_response AS jsonb), status = :status, "
+        "address = :address, value = :value WHERE id = :id AND created_at = :created_at"
+    )
+    last_created_at = bind.execute(sa.text("SELECT max(created_at) FROM query_logs")).scalar()
+    if last_created_at is None:
+        return
+    last_id = 2 ** 31 - 1
+    # Keyset batches over the (created_at, id) index, newest first, each committed on its own.
+    # Updating by the full key lets PostgreSQL prune to the one partition holding the row.
+    while True:
+        rows = bind.execute(select_batch, {"created_at": last_created_at, "id": last_id,
+                                           "limit": BACKFILL_BATCH_SIZE}).all()
+        if not rows:
+            break
+        updates = []
+        for row in rows:
+            response = parse_response_repr(row.external_server_response)
+            if response is None:
+                continue
+            value = response.get("value")
+            updates.append({
+                "id": row.id,
+                "created_at": row.created_at,
+                "external_response": json.dumps(response),
+                "status": response.get("status"),
+                "address": response.get("address"),
+                "value": float(value) if isinstance(value, (int, float)) else None,
+            })
+        if updates:
+            bind.execute(update, updates)
+        last_created_at, last_id = rows[-1].created_at, rows[-1].id
+
+
+def partitions() -> list[str]:
+    return list(op.get_bind().execute(sa.text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = 'query_logs' ORDER BY child.relname"
+    )).scalars())
+
+
+def create_partitioned_index(name: str, columns: str) -> None:
+    if op.get_context().as_sql:
+        op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON query_logs ({columns})")
+        return
+    # CREATE INDEX on a partitioned parent cannot be CONCURRENTLY, so the parent index starts
+    # invalid and each partition's index is built concurrently and attached; once every
+    # partition is attached the parent index becomes valid on its own.
+    op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY query_logs ({columns})")
+    for partition in partitions():
+        partition_index = f"{partition}_{name.removeprefix('ix_query_logs_')}_idx"
+        op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition_index} ON {partition} ({columns})")
+        op.execute(f"ALTER INDEX {name} ATTACH PARTITION {partition_index}")
+
+
+def downgrade() -> None:
+    for name in INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    op.drop_column("query_logs", "value")
+    op.drop_column("query_logs", "address")
+    op.drop_column("query_logs", "status")
+    op.drop_column("query_logs", "external_response")
@@ -0,0 +1,4 @@
+import time
+
+# Reference point for the startup timings reported by /ready.
+IMPORT_STARTED = time.perf_counter()
@@ -0,0 +1,96 @@
+import math
+from collections import OrderedDict
+
+from fastapi import Depends, HTTPException, status
+
+from app.config import env_bool, env_float, env_int
+from app.dependencies import get_current_active_user
+from app.models import User
+from app.resilience import ConcurrencyLimiter, Overloaded, TokenBucket
+
+RATE_LIMIT_ENABLED = env_bool("RATE_LIMIT_ENABLED", True)
+RATE_LIMIT_MAX_TRACKED_USERS = env_int("RATE_LIMIT_MAX_TRACKED_USERS", 100000)
+# Per-tier token buckets: sustained requests per second and burst size. A rate of 0 disables the limit for the tier.
+RATE_LIMIT_TIERS = {
+    "default": (env_float("RATE_LIMIT_DEFAULT_RPS", 5.0), env_int("RATE_LIMIT_DEFAULT_BURST", 20)),
+    "admin": (env_float("RATE_LIMIT_ADMIN_RPS", 0.0), env_int("RATE_LIMIT_ADMIN_BURST", 100)),
+}
+
+UPSTREAM_MAX_CONCURRENCY = env_int("UPSTREAM_MAX_CONCURRENCY", 50)
+UPSTREAM_MAX_QUEUE = env_int("UPSTREAM_MAX_QUEUE", 200)
+UPSTREAM_QUEUE_TIMEOUT = env_float("UPSTREAM_QUEUE_TIMEOUT", 2.0)
+# Shed new upstream calls while recent queue waits (p90) exceed this many seconds; 0 disables.
+UPSTREAM_SHED_WAIT = env_float("UPSTREAM_SHED_WAIT", 1.0)
+
+upstream_limiter = ConcurrencyLimiter(
+    max_concurrency=UPSTREAM_MAX_CONCURRENCY,
+    max_queue=UPSTREAM_MAX_QUEUE,
+    queue_timeout=UPSTREAM_QUEUE_TIMEOUT,
+    shed_wait=UPSTREAM_SHED_WAIT,
+)
+
+_buckets: OrderedDict[tuple[str, str], TokenBucket] = OrderedDict()
+rate_limit_counters = {tier: {"allowed": 0, "limited": 0} for tier in RATE_LIMIT_TIERS}
+
+
+def user_tier(user: User) -> str:
+    return "admin" if user.is_superuser else "default"
+
+
+def check_rate_limit(user: User, cost: int = 1) -> None:
+    if not RATE_LIMIT_ENABLED:
+        return
+    tier = user_tier(user)
+    rate, burst = RATE_LIMIT_TIERS[tier]
+    if rate <= 0:
+        return
+    key = (tier, user.email)
+    bucket = _buckets.get(key)
+    if bucket is None:
+        bucket = _buckets[key] = TokenBucket(rate, burst)
+        while len(_buckets) > RATE_LIMIT_MAX_TRACKED_USERS:
+            _buckets.popitem(last=False)
+    _buckets.move_to_end(key)
+
+    # A request larger than the burst could never be admitted, so waiting would not help: reject it outright.
+    if cost > bucket.capacity:
+        rate_limit_counters[tier]["limited"] += 1
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"Request costs {cost} lookups; the rate limit allows at most "
+                                   f"{bucket.capacity} per request")
+    if not bucket.try_acquire(cost):
+        rate_limit_counters[tier]["limited"] += 1
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                            detail="Rate limit exceeded",
+                            headers={"Retry-After": str(max(1, math.ceil(bucket.retry_after(cost))))})
+    rate_limit_counters[tier]["allowed"] += 1
+
+
+async def get_rate_limited_user(current_user: User = Depends(get_current_active_user)):
+    check_rate_limit(current_user)
+    return current_user
+
+
+async def admit_upstream_call(call):
+    """Run one upstream attempt in a concurrency slot; retries and their backoff belong outside it."""
+    try:
+        async with upstream_limiter.slot():
+            return await call()
+    except Overloaded as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            detail=f"Service is overloaded ({e.reason}), try again later",
+                            headers={"Retry-After": str(max(1, math.ceil(UPSTREAM_QUEUE_TIMEOUT)))})
+
+
+def admission_stats() -> dict:
+    return {
+        "rate_limit": {
+            "enabled": RATE_LIMIT_ENABLED,
+            "tracked_users": len(_buckets),
+            **{
+                tier: {"rate": RATE_LIMIT_TIERS[tier][0], "burst": RATE_LIMIT_TIERS[tier][1], **counters}
+                for tier, counters in rate_limit_counters.items()
+            },
+        },
+        "upstream": upstream_limiter.stats(),
+    }
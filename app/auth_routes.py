@@ -1,30 +1,50 @@
-from datetime import timedelta
+from datetime import datetime, timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from jose import JWTError, jwt
+from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from app import auth
 from app.db import get_db
-from app.dependencies import get_current_active_user, get_current_user
-from app.models import User
-from app.auth import verify_password, get_password_hash
+from app.dependencies import decode_token_claims, get_current_active_user, get_current_user, oauth2_scheme
+from app.models import RefreshToken, User
+from app.auth import get_password_hash_async, verify_and_update_password_async
+from app.revocation import revocation_list, revoke_session
 
 router = APIRouter()
 
 
+def issue_tokens(db: AsyncSession, user: User, session_id: str | None = None) -> dict:
+    """Access and refresh token pair for a new login session, or the next rotation of an existing one."""
+    session_id = session_id or auth.new_token_id()
+    refresh_jti = auth.new_token_id()
+    refresh_expires_at = datetime.utcnow() + timedelta(days=auth.REFRESH_TOKEN_EXPIRE_DAYS)
+    db.add(RefreshToken(jti=refresh_jti, user_id=user.id, session_id=session_id, expires_at=refresh_expires_at))
+    access_token = auth.create_access_token(
+        data={"sub": user.email, "sid": session_id},
+        expires_delta=timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES),
+    )
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": auth.create_refresh_token(user.email, refresh_jti, session_id, refresh_expires_at),
+    }
+
+
 @router.post("/register", response_model=dict)
 async def register_user(
         user_data: auth.UserCreate,
         db: AsyncSession = Depends(get_db)
 ):
     statement = select(User).where(User.email == user_data.email)
-    existing_user = await db.execute(statement).scalar_one_or_none()
+    existing_user = (await db.execute(statement)).scalar_one_or_none()
     if existing_user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
 
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
 
     new_user = User(
         email=user_data.email,
@@ -43,9 +63,13 @@ async def login_for_access_token(
         db: AsyncSession = Depends(get_db)
 ):
     statement = select(User).where(User.email == form_data.username)
-    user = await db.execute(statement).scalar_one_or_none()
+    user = (await db.execute(statement)).scalar_one_or_none()
 
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    verified, new_hash = (False, None)
+    if user:
+        verified, new_hash = await verify_and_update_password_async(form_data.password, user.hashed_password)
+
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -55,11 +79,79 @@ async def login_for_access_token(
     if not user.is_active:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
 
-    access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = auth.create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+    if new_hash:
+        # The stored hash used a different bcrypt cost; upgrade it while we have the plaintext.
+        user.hashed_password = new_hash
+
+    tokens = issue_tokens(db, user)
+    await db.commit()
+    return tokens
+
+
+@router.post("/refresh", response_model=auth.Token)
+async def refresh_access_token(
+        body: auth.RefreshRequest,
+        db: AsyncSession = Depends(get_db)
+):
+    invalid_token = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
     )
-    return {"access_token": access_token, "token_type": "bearer"}
+    try:
+        claims = jwt.decode(body.refresh_token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+    except JWTError:
+        raise invalid_token
+    if claims.get("type") != "refresh" or not claims.get("jti"):
+        raise invalid_token
+
+    stored = await db.get(RefreshToken, claims["jti"])
+    if stored is None or stored.revoked_at is not None:
+        raise invalid_token
+
+    # Conditional update, so of two requests presenting the same token only one gets to rotate it.
+    result = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.jti == stored.jti, RefreshToken.used_at.is_(None))
+        .values(used_at=datetime.utcnow())
+    )
+    if result.rowcount == 0:
+        used_at = (await db.execute(select(RefreshToken.used_at).where(RefreshToken.jti == stored.jti))).scalar_one()
+        if datetime.utcnow() - used_at < timedelta(seconds=auth.REFRESH_REUSE_GRACE_SECONDS):
+            # Most likely a retry that lost the race to the request which rotated it; that one's tokens stay valid.
+            raise invalid_token
+        # A rotated-out token came back, so it has leaked: end the session for every holder.
+        await revoke_session(db, stored.session_id)
+        await db.commit()
+        raise invalid_token
+
+    user = await db.get(User, stored.user_id)
+    if user is None:
+        raise invalid_token
+    if not user.is_active:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
+
+    tokens = issue_tokens(db, user, stored.session_id)
+    await db.commit()
+    return tokens
+
+
+@router.post("/logout", response_model=dict)
+async def logout(
+        token: str = Depends(oauth2_scheme),
+        current_user: User = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    claims = decode_token_claims(token)
+    if claims.get("sid"):
+        await revoke_session(db, claims["sid"])
+    elif claims.get("jti"):
+        await revocation_list.revoke(db, claims["jti"], datetime.utcfromtimestamp(claims["exp"]))
+    else:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Token cannot be revoked; it expires on its own")
+    await db.commit()
+    return {"message": "Logged out"}
 
 
 @router.get("/users/me", response_model=auth.UserOut)
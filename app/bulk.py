@@ -0,0 +1,336 @@
+import asyncio
+import csv
+import io
+import json
+import re
+import sys
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import env_int
+from app.geo import encode_geohash
+from app.models import parse_response_repr
+
+EXPORT_COLUMNS = ("id", "cadastral_number", "latitude", "longitude", "external_server_response", "created_at",
+                  "geohash", "external_response", "status", "address", "value")
+# Imported rows always take fresh ids from the sequence, so re-imports never collide with existing keys.
+IMPORT_COLUMNS = EXPORT_COLUMNS[1:]
+FORMATS = ("csv", "parquet")
+
+BULK_EXPORT_QUEUE_CHUNKS = env_int("BULK_EXPORT_QUEUE_CHUNKS", 16)
+BULK_PARQUET_ROW_GROUP_SIZE = env_int("BULK_PARQUET_ROW_GROUP_SIZE", 50000)
+BULK_IMPORT_BATCH_SIZE = env_int("BULK_IMPORT_BATCH_SIZE", 10000)
+BULK_GZIP_LEVEL = env_int("BULK_GZIP_LEVEL", 6)
+BULK_SPOOL_MAX_MEMORY = env_int("BULK_SPOOL_MAX_MEMORY", 16 * 1024 * 1024)
+READ_CHUNK_SIZE = 1024 * 1024
+
+_DONE = object()
+# COPY trims trailing zeros from fractions of a second, which datetime.fromisoformat only accepts from Python 3.11.
+_FRACTION = re.compile(r"(?<=:\d\d)\.(\d{1,6})(?!\d)")
+
+
+def check_format(fmt: str) -> None:
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Unsupported format: {fmt}, expected one of {', '.join(FORMATS)}")
+    if fmt == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="Parquet support requires pyarrow to be installed")
+
+
+def check_engine(engine: AsyncEngine) -> None:
+    if engine.dialect.driver != "asyncpg":
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Bulk export/import requires PostgreSQL (asyncpg)")
+
+
+def export_query(since: Optional[datetime] = None, until: Optional[datetime] = None,
+                 cadastral_number: Optional[str] = None) -> tuple[str, list]:
+    conditions, args = [], []
+    for clause, value in (("created_at >= ${}", since), ("created_at < ${}", until),
+                          ("cadastral_number = ${}", cadastral_number)):
+        if value is not None:
+            args.append(value)
+            conditions.append(clause.format(len(args)))
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    # external_response is exported as JSON text in both formats.
+    columns = ", ".join("external_response::text" if column == "external_response" else column
+                        for column in EXPORT_COLUMNS)
+    return f"SELECT {columns} FROM query_logs{where} ORDER BY created_at, id", args
+
+
+async def driver_connection(conn):
+    return (await conn.get_raw_connection()).driver_connection
+
+
+async def export_csv(engine: AsyncEngine, query: str, args: list) -> AsyncIterator[bytes]:
+    # COPY pushes chunks into a bounded queue, so a slow client throttles the server-side COPY.
+    queue = asyncio.Queue(maxsize=BULK_EXPORT_QUEUE_CHUNKS)
+
+    async def produce():
+        cancelled = False
+        try:
+            async with engine.connect() as conn:
+                driver = await driver_connection(conn)
+                await driver.copy_from_query(query, *args, output=queue.put, format="csv", header=True)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            # Cancelled only once the consumer has stopped reading: a sentinel would block on a full queue.
+            if not cancelled:
+                await queue.put(_DONE)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (chunk := await queue.get()) is not _DONE:
+            yield chunk
+        await producer
+    finally:
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+
+
+class _ChunkSink:
+    """Write-only file for ParquetWriter that hands out what has been written so far."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def parquet_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("id", pa.int32()),
+        ("cadastral_number", pa.string()),
+        ("latitude", pa.float64()),
+        ("longitude", pa.float64()),
+        ("external_server_response", pa.string()),
+        ("created_at", pa.timestamp("us")),
+        ("geohash", pa.string()),
+        ("external_response", pa.string()),
+        ("status", pa.string()),
+        ("address", pa.string()),
+        ("value", pa.float64()),
+    ])
+
+
+async def export_parquet(engine: AsyncEngine, query: str, args: list, compression: str) -> AsyncIterator[bytes]:
+    # Parquet is columnar, so rows come from a server-side cursor and each row group is flushed as it fills.
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression=compression)
+    async with engine.connect() as conn:
+        driver = await driver_connection(conn)
+        async with driver.transaction():
+            cursor = await driver.cursor(query, *args)
+            while records := await cursor.fetch(BULK_PARQUET_ROW_GROUP_SIZE):
+                columns = list(zip(*records))
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema,
+                ))
+                yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(BULK_GZIP_LEVEL, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        if compressed := compressor.compress(chunk):
+            yield compressed
+    yield compressor.flush()
+
+
+def export_chunks(engine: AsyncEngine, fmt: str, compress: bool, since: Optional[datetime] = None,
+                  until: Optional[datetime] = None, cadastral_number: Optional[str] = None) -> AsyncIterator[bytes]:
+    check_engine(engine)
+    check_format(fmt)
+    query, args = export_query(since, until, cadastral_number)
+    if fmt == "parquet":
+        # Parquet compresses per column chunk, so gzip selects the codec instead of wrapping the file.
+        return export_parquet(engine, query, args, "gzip" if compress else "snappy")
+    chunks = export_csv(engine, query, args)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def export_media_type(fmt: str, compress: bool) -> tuple[str, str]:
+    if fmt == "parquet":
+        return "application/vnd.apache.parquet", "query_logs.parquet"
+    if compress:
+        return "application/gzip", "query_logs.csv.gz"
+    return "text/csv", "query_logs.csv"
+
+
+def spool_file():
+    import tempfile
+
+    return tempfile.SpooledTemporaryFile(max_size=BULK_SPOOL_MAX_MEMORY)
+
+
+async def spool_chunks(chunks: AsyncIterator[bytes], compressed: bool):
+    # Parquet needs a seekable file and CSV records may span chunks, so uploads are spooled first.
+    spool = spool_file()
+    decompressor = zlib.decompressobj(47) if compressed else None
+    async for chunk in chunks:
+        spool.write(decompressor.decompress(chunk) if decompressor else chunk)
+    if decompressor:
+        spool.write(decompressor.flush())
+    spool.seek(0)
+    return spool
+
+
+def parse_timestamp(value: str) -> datetime:
+    return datetime.fromisoformat(_FRACTION.sub(lambda match: "." + match.group(1).ljust(6, "0"), value, count=1))
+
+
+def import_record(row: dict) -> tuple:
+    latitude = float(row["latitude"])
+    longitude = float(row["longitude"])
+    created_at = row.get("created_at") or datetime.utcnow()
+    if isinstance(created_at, str):
+        created_at = parse_timestamp(created_at)
+    # Files exported before the structured columns existed only carry the repr; recover the fields from it.
+    external_response = row.get("external_response") or None
+    response = json.loads(external_response) if external_response else \
+        parse_response_repr(row.get("external_server_response"))
+    value = row.get("value")
+    if value in (None, "") and response is not None:
+        value = response.get("value")
+    return (
+        row["cadastral_number"],
+        latitude,
+        longitude,
+        row.get("external_server_response") or None,
+        created_at,
+        row.get("geohash") or encode_geohash(latitude, longitude),
+        json.dumps(response) if response is not None else None,
+        row.get("status") or (response or {}).get("status"),
+        row.get("address") or (response or {}).get("address"),
+        float(value) if value not in (None, "") else None,
+    )
+
+
+def iter_import_rows(spool, fmt: str):
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(spool).iter_batches(batch_size=BULK_IMPORT_BATCH_SIZE):
+            yield from batch.to_pylist()
+        return
+    reader = csv.DictReader(io.TextIOWrapper(spool, encoding="utf-8", newline=""))
+    missing = {"cadastral_number", "latitude", "longitude"} - set(reader.fieldnames or ())
+    if missing:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"CSV header is missing columns: {', '.join(sorted(missing))}")
+    yield from reader
+
+
+async def import_records(spool, fmt: str, since: Optional[datetime], until: Optional[datetime],
+                         cadastral_number: Optional[str]) -> AsyncIterator[tuple]:
+    for number, row in enumerate(iter_import_rows(spool, fmt), 1):
+        try:
+            record = import_record(row)
+        except (KeyError, TypeError, ValueError) as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid row {number}: {exc}")
+        if since is not None and record[4] < since or until is not None and record[4] >= until \
+                or cadastral_number is not None and record[0] != cadastral_number:
+            continue
+        yield record
+        if number % BULK_IMPORT_BATCH_SIZE == 0:
+            # Parsing is CPU-bound, so give other requests a turn between batches.
+            await asyncio.sleep(0)
+
+
+async def import_chunks(engine: AsyncEngine, chunks: AsyncIterator[bytes], fmt: str, compressed: bool,
+                        since: Optional[datetime] = None, until: Optional[datetime] = None,
+                        cadastral_number: Optional[str] = None) -> int:
+    check_engine(engine)
+    check_format(fmt)
+    with await spool_chunks(chunks, compressed) as spool:
+        async with engine.connect() as conn:
+            driver = await driver_connection(conn)
+            # One COPY in one transaction, so a bad row leaves the table untouched.
+            async with driver.transaction():
+                result = await driver.copy_records_to_table(
+                    "query_logs", columns=IMPORT_COLUMNS,
+                    records=import_records(spool, fmt, since, until, cadastral_number),
+                )
+    return int(result.split()[-1])
+
+
+async def read_file_chunks(file) -> AsyncIterator[bytes]:
+    while chunk := file.read(READ_CHUNK_SIZE):
+        yield chunk
+
+
+def parse_args(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m app.bulk", description="Bulk export/import of query_logs")
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--gzip", action="store_true", help="gzip CSV (or use the gzip codec for Parquet)")
+    parser.add_argument("--since", type=parse_timestamp)
+    parser.add_argument("--until", type=parse_timestamp)
+    parser.add_argument("--cadastral-number")
+    parser.add_argument("--file", help="output file for export, input file for import (default: stdout/stdin)")
+    return parser.parse_args(argv)
+
+
+async def run_cli(args) -> None:
+    from app.db import dispose_engines, engine, read_engine
+
+    filters = {"since": args.since, "until": args.until, "cadastral_number": args.cadastral_number}
+    try:
+        if args.command == "export":
+            output = open(args.file, "wb") if args.file else sys.stdout.buffer
+            with output:
+                async for chunk in export_chunks(read_engine, args.format, args.gzip, **filters):
+                    output.write(chunk)
+        else:
+            source = open(args.file, "rb") if args.file else sys.stdin.buffer
+            with source:
+                imported = await import_chunks(engine, read_file_chunks(source), args.format, args.gzip, **filters)
+            print(f"imported {imported} rows", file=sys.stderr)
+    finally:
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(run_cli(parse_args()))
+    except HTTPException as exc:
+        sys.exit(f"error: {exc.detail}")
@@ -0,0 +1,43 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.bulk import FORMATS, export_chunks, export_media_type, import_chunks
+from app.db import engine, read_engine
+from app.dependencies import get_current_admin_user
+from app.models import User
+
+router = APIRouter(prefix="/admin/query_logs")
+
+FORMAT_PATTERN = f"^({'|'.join(FORMATS)})$"
+
+
+@router.get("/export")
+async def export_query_logs(
+        format: str = Query("csv", pattern=FORMAT_PATTERN),
+        gzip: bool = False,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        cadastral_number: Optional[str] = None,
+        current_user: User = Depends(get_current_admin_user)
+):
+    chunks = export_chunks(read_engine, format, gzip, since, until, cadastral_number)
+    media_type, filename = export_media_type(format, gzip)
+    return StreamingResponse(chunks, media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+@router.post("/import")
+async def import_query_logs(
+        request: Request,
+        format: str = Query("csv", pattern=FORMAT_PATTERN),
+        gzip: bool = False,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        cadastral_number: Optional[str] = None,
+        current_user: User = Depends(get_current_admin_user)
+):
+    imported = await import_chunks(engine, request.stream(), format, gzip, since, until, cadastral_number)
+    return {"imported": imported}
@@ -0,0 +1,130 @@
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Hashable
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    expires_at: float
+
+    def is_fresh(self, now: float | None = None) -> bool:
+        return (now if now is not None else time.monotonic()) < self.expires_at
+
+
+class TTLCache:
+    """Bounded LRU cache with per-entry TTL and single-flight loading.
+
+    Expired entries stay in place until they are evicted or overwritten, so
+    callers that can tolerate stale data may still read them via get_entry(),
+    or have get_or_load() serve them while a background load refreshes them.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[Hashable, CacheEntry] = OrderedDict()
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+        self.stale_hits = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_entry(self, key: Hashable) -> CacheEntry | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def get(self, key: Hashable) -> Any | None:
+        entry = self.get_entry(key)
+        if entry is not None and entry.is_fresh():
+            self.hits += 1
+            return entry.value
+        self.misses += 1
+        return None
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        if ttl <= 0 or self.max_size <= 0:
+            return
+        self._entries[key] = CacheEntry(value=value, expires_at=time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def get_or_load(
+            self,
+            key: Hashable,
+            loader: Callable[[], Awaitable[Any]],
+            ttl_for: Callable[[Any], float],
+            bypass: bool = False,
+            stale_ttl: float = 0,
+    ) -> Any:
+        """Cached value or the loader's result; with stale_ttl, entries expired for less than
+        stale_ttl seconds are returned immediately while a single background load refreshes them."""
+        if not bypass:
+            entry = self.get_entry(key)
+            if entry is not None and stale_ttl > 0 and not entry.is_fresh() \
+                    and time.monotonic() < entry.expires_at + stale_ttl:
+                self.stale_hits += 1
+                if key not in self._inflight:
+                    self._start_load(key, loader, ttl_for, single_flight=True)
+                return entry.value
+            value = self.get(key)
+            if value is not None:
+                return value
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                self.coalesced += 1
+                return await asyncio.shield(inflight)
+
+        return await asyncio.shield(self._start_load(key, loader, ttl_for, single_flight=not bypass))
+
+    def _start_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl_for: Callable[[Any], float],
+                    single_flight: bool) -> asyncio.Future:
+        # The load runs as its own task so a cancelled caller does not abort it for the others.
+        task = asyncio.ensure_future(self._load(key, loader, ttl_for))
+        task.add_done_callback(_consume_exception)
+        if single_flight:
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget_inflight(key, t))
+        return task
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                    ttl_for: Callable[[Any], float]) -> Any:
+        value = await loader()
+        self.set(key, value, ttl_for(value))
+        return value
+
+    def _forget_inflight(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "coalesced": self.coalesced,
+            "stale_hits": self.stale_hits,
+            "inflight": len(self._inflight),
+        }
+
+
+def _consume_exception(task: asyncio.Future) -> None:
+    if not task.cancelled():
+        task.exception()
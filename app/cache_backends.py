@@ -0,0 +1,333 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Hashable, Iterable
+
+from app.cache import CacheEntry, TTLCache
+from app.config import env_float
+
+logger = logging.getLogger(__name__)
+
+# "memory": per-process LRU only; "redis": shared Redis only; "tiered": local L1 in front of shared Redis L2.
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory")
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_KEY_PREFIX = os.environ.get("CACHE_KEY_PREFIX", "cadastral")
+CACHE_INVALIDATION_CHANNEL = os.environ.get("CACHE_INVALIDATION_CHANNEL", f"{CACHE_KEY_PREFIX}:invalidate")
+# Bounds how long an L1 copy can outlive an invalidation message that was missed.
+CACHE_L1_MAX_TTL = env_float("CACHE_L1_MAX_TTL", 5.0)
+# Expired values are kept this long in Redis so stale-on-error fallbacks still find them.
+CACHE_STALE_RETENTION = env_float("CACHE_STALE_RETENTION", 3600.0)
+CACHE_REDIS_TIMEOUT = env_float("CACHE_REDIS_TIMEOUT", 0.25)
+CACHE_LISTENER_RESTART_DELAY = env_float("CACHE_LISTENER_RESTART_DELAY", 1.0)
+
+BACKENDS = ("memory", "redis", "tiered")
+
+_redis_client = None
+_caches: dict[str, "Cache"] = {}
+_listener: asyncio.Task | None = None
+_listener_restart: asyncio.Task | None = None
+_background_tasks: set[asyncio.Task] = set()
+
+
+def get_redis():
+    global _redis_client
+    if _redis_client is None:
+        import redis.asyncio as redis
+
+        _redis_client = redis.from_url(CACHE_REDIS_URL, socket_timeout=CACHE_REDIS_TIMEOUT,
+                                       socket_connect_timeout=CACHE_REDIS_TIMEOUT)
+    return _redis_client
+
+
+def set_redis_client(client) -> None:
+    global _redis_client
+    _redis_client = client
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+class Cache:
+    """Cache facade over an in-process TTLCache (L1) and/or a shared Redis-protocol store (L2).
+
+    Keys are JSON-serialised, values go through encode/decode so they can be stored as JSON in L2.
+    Loads are coalesced per process by the L1 TTLCache, which holds nothing in "redis" mode.
+    """
+
+    def __init__(self, name: str, max_size: int, backend: str = CACHE_BACKEND,
+                 encode: Callable[[Any], Any] = _identity, decode: Callable[[Any], Any] = _identity):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown cache backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+        self.name = name
+        self.backend = backend
+        self.shared = backend != "memory"
+        self.local = TTLCache(max_size=0 if backend == "redis" else max_size)
+        self.encode = encode
+        self.decode = decode
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self.l2_errors = 0
+        self.l2_stale_hits = 0
+        self.refresh_errors = 0
+        self.invalidations_sent = 0
+        self.invalidations_received = 0
+        self._refreshing: set[str] = set()
+        _caches[name] = self
+
+    def _key(self, key: Hashable) -> str:
+        return json.dumps(key, separators=(",", ":"))
+
+    def _redis_key(self, cache_key: str) -> str:
+        return f"{CACHE_KEY_PREFIX}:{self.name}:{cache_key}"
+
+    def _local_ttl(self, ttl: float) -> float:
+        return min(ttl, CACHE_L1_MAX_TTL) if self.shared else ttl
+
+    async def _shared_get_many(self, cache_keys: list[str]) -> dict[str, CacheEntry]:
+        if not self.shared or not cache_keys:
+            return {}
+        try:
+            payloads = await get_redis().mget([self._redis_key(cache_key) for cache_key in cache_keys])
+        except Exception:
+            self.l2_errors += 1
+            logger.warning("cache %s: L2 read failed", self.name, exc_info=True)
+            return {}
+        entries = {}
+        corrupt = []
+        now = time.time()
+        for cache_key, payload in zip(cache_keys, payloads):
+            if payload is None:
+                self.l2_misses += 1
+                continue
+            try:
+                stored = json.loads(payload)
+                # Wall-clock expiry is shared by every worker; convert it to this process's monotonic clock.
+                expires_at = time.monotonic() + stored["expires_at"] - now
+                entries[cache_key] = CacheEntry(value=self.decode(stored["value"]), expires_at=expires_at)
+            except (ValueError, KeyError, TypeError):
+                # Written by another version or corrupted: treat it as a miss so the caller reloads and rewrites it.
+                self.l2_misses += 1
+                corrupt.append(self._redis_key(cache_key))
+        if corrupt:
+            logger.warning("cache %s: dropping %d unreadable L2 entries", self.name, len(corrupt))
+            try:
+                await get_redis().delete(*corrupt)
+            except Exception:
+                self.l2_errors += 1
+                logger.warning("cache %s: L2 delete failed", self.name, exc_info=True)
+        return entries
+
+    async def _shared_set(self, cache_key: str, value: Any, ttl: float) -> None:
+        if not self.shared or ttl <= 0:
+            return
+        payload = json.dumps({"value": self.encode(value), "expires_at": time.time() + ttl})
+        try:
+            await get_redis().set(self._redis_key(cache_key), payload, px=int((ttl + CACHE_STALE_RETENTION) * 1000))
+        except Exception:
+            self.l2_errors += 1
+            logger.warning("cache %s: L2 write failed", self.name, exc_info=True)
+
+    async def get_entry(self, key: Hashable) -> CacheEntry | None:
+        """Return the entry even if expired, for stale-on-error fallbacks."""
+        cache_key = self._key(key)
+        entry = self.local.get_entry(cache_key)
+        if entry is None:
+            entry = (await self._shared_get_many([cache_key])).get(cache_key)
+        return entry
+
+    async def get_many(self, keys: Iterable[Hashable]) -> dict[Hashable, Any]:
+        """Fresh values for the given keys, fetched from L2 in a single round trip where L1 misses."""
+        found, missing = {}, {}
+        for key in keys:
+            cache_key = self._key(key)
+            value = self.local.get(cache_key)
+            if value is not None:
+                found[key] = value
+            else:
+                missing[cache_key] = key
+        for cache_key, entry in (await self._shared_get_many(list(missing))).items():
+            remaining = entry.expires_at - time.monotonic()
+            if remaining > 0:
+                self.l2_hits += 1
+                self.local.set(cache_key, entry.value, self._local_ttl(remaining))
+                found[missing[cache_key]] = entry.value
+        return found
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]],
+                          ttl_for: Callable[[Any], float], bypass: bool = False, stale_ttl: float = 0) -> Any:
+        """See TTLCache.get_or_load; stale_ttl also applies to entries found expired in L2."""
+        if not self.shared:
+            return await self.local.get_or_load(self._key(key), loader, ttl_for, bypass=bypass, stale_ttl=stale_ttl)
+        cache_key = self._key(key)
+        local_ttl = None
+
+        async def shared_loader():
+            nonlocal local_ttl
+            if not bypass:
+                entry = (await self._shared_get_many([cache_key])).get(cache_key)
+                if entry is not None and entry.is_fresh():
+                    self.l2_hits += 1
+                    local_ttl = self._local_ttl(entry.expires_at - time.monotonic())
+                    return entry.value
+                if entry is not None and time.monotonic() < entry.expires_at + stale_ttl:
+                    # Serve the stale value without keeping it in L1; the refresh writes both tiers.
+                    self.l2_stale_hits += 1
+                    local_ttl = 0
+                    self._refresh(cache_key, loader, ttl_for)
+                    return entry.value
+            value = await loader()
+            ttl = ttl_for(value)
+            local_ttl = self._local_ttl(ttl)
+            await self._shared_set(cache_key, value, ttl)
+            return value
+
+        return await self.local.get_or_load(cache_key, shared_loader, lambda value: local_ttl, bypass=bypass,
+                                            stale_ttl=stale_ttl)
+
+    def _refresh(self, cache_key: str, loader: Callable[[], Awaitable[Any]], ttl_for: Callable[[Any], float]) -> None:
+        if cache_key in self._refreshing:
+            return
+
+        async def refresh():
+            try:
+                value = await loader()
+                ttl = ttl_for(value)
+                self.local.set(cache_key, value, self._local_ttl(ttl))
+                await self._shared_set(cache_key, value, ttl)
+            except Exception:
+                self.refresh_errors += 1
+                logger.warning("cache %s: background refresh failed", self.name, exc_info=True)
+            finally:
+                self._refreshing.discard(cache_key)
+
+        self._refreshing.add(cache_key)
+        task = asyncio.ensure_future(refresh())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+    async def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        cache_key = self._key(key)
+        self.local.set(cache_key, value, self._local_ttl(ttl))
+        await self._shared_set(cache_key, value, ttl)
+
+    async def delete(self, key: Hashable) -> None:
+        cache_key = self._key(key)
+        self.local.delete(cache_key)
+        if not self.shared:
+            return
+        try:
+            await get_redis().delete(self._redis_key(cache_key))
+            await get_redis().publish(CACHE_INVALIDATION_CHANNEL, json.dumps({"cache": self.name, "key": cache_key}))
+            self.invalidations_sent += 1
+        except Exception:
+            self.l2_errors += 1
+            logger.warning("cache %s: L2 invalidation failed", self.name, exc_info=True)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Synchronous delete for event hooks: drops L1 now and fans the L2 delete out in the background."""
+        self.local.delete(self._key(key))
+        if not self.shared:
+            return
+        try:
+            task = asyncio.get_running_loop().create_task(self.delete(key))
+        except RuntimeError:
+            return
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+    def clear(self) -> None:
+        self.local.clear()
+
+    def on_invalidation(self, cache_key: str) -> None:
+        self.invalidations_received += 1
+        self.local.delete(cache_key)
+
+    def stats(self) -> dict:
+        stats = self.local.stats()
+        if self.shared:
+            stats.update(l2_hits=self.l2_hits, l2_misses=self.l2_misses, l2_errors=self.l2_errors,
+                         l2_stale_hits=self.l2_stale_hits, refresh_errors=self.refresh_errors,
+                         invalidations_sent=self.invalidations_sent,
+                         invalidations_received=self.invalidations_received)
+        return stats
+
+
+async def _listen_for_invalidations(pubsub) -> None:
+    while True:
+        try:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.warning("cache invalidation listener failed, retrying", exc_info=True)
+            await asyncio.sleep(1.0)
+            continue
+        if message is None:
+            continue
+        _apply_invalidation(message["data"])
+
+
+def _apply_invalidation(raw) -> None:
+    try:
+        data = json.loads(raw)
+        cache = _caches.get(data.get("cache"))
+        if cache is not None:
+            cache.on_invalidation(data["key"])
+    except (ValueError, KeyError, TypeError, AttributeError):
+        # A foreign or malformed message on the channel must not stop this worker's invalidations.
+        logger.warning("ignoring malformed cache invalidation message: %r", raw)
+
+
+def _listener_done(task: asyncio.Task, pubsub) -> None:
+    global _listener, _listener_restart
+    closing = asyncio.ensure_future(pubsub.aclose())
+    _background_tasks.add(closing)
+    closing.add_done_callback(_background_tasks.discard)
+    if task.cancelled() or _listener is not task:
+        return
+    # Without a listener this worker's L1 would miss every invalidation, so subscribe again.
+    logger.error("cache invalidation listener stopped, restarting", exc_info=task.exception())
+    _listener = None
+    _listener_restart = asyncio.ensure_future(_restart_listener())
+
+
+async def _restart_listener() -> None:
+    await asyncio.sleep(CACHE_LISTENER_RESTART_DELAY)
+    await start_cache_invalidation()
+
+
+async def start_cache_invalidation() -> None:
+    """Subscribe to cross-worker invalidations when any cache keeps an L1 copy of shared data."""
+    global _listener
+    if _listener is not None or not any(cache.backend == "tiered" for cache in _caches.values()):
+        return
+    pubsub = get_redis().pubsub()
+    try:
+        await pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+    except Exception:
+        # Without the subscription L1 copies still expire after CACHE_L1_MAX_TTL.
+        logger.warning("cache invalidation subscription failed", exc_info=True)
+        await pubsub.aclose()
+        return
+    _listener = asyncio.create_task(_listen_for_invalidations(pubsub))
+    _listener.add_done_callback(lambda task: _listener_done(task, pubsub))
+
+
+async def stop_cache_invalidation() -> None:
+    global _listener, _listener_restart, _redis_client
+    if _listener_restart is not None:
+        _listener_restart.cancel()
+        await asyncio.gather(_listener_restart, return_exceptions=True)
+        _listener_restart = None
+    if _listener is not None:
+        _listener.cancel()
+        await asyncio.gather(_listener, return_exceptions=True)
+        _listener = None
+    if _background_tasks:
+        await asyncio.gather(*_background_tasks, return_exceptions=True)
+    if _redis_client is not None:
+        await _redis_client.aclose()
+        _redis_client = None
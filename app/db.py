@@ -1,5 +1,7 @@
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from app.config import env_bool, env_int
 from app.models import Base
 import os
 
@@ -7,11 +9,37 @@ DATABASE_URL = os.environ.get("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL is not set in environment variables")
 
-engine = create_async_engine(
-    DATABASE_URL,
-    future=True,
-    echo=True
-)
+# Optional read replica for history/read endpoints; falls back to the primary when unset.
+DATABASE_READ_URL = os.environ.get("DATABASE_READ_URL")
+
+DB_ECHO = env_bool("DB_ECHO", False)
+DB_POOL_SIZE = env_int("DB_POOL_SIZE", 5)
+DB_MAX_OVERFLOW = env_int("DB_MAX_OVERFLOW", 10)
+DB_POOL_TIMEOUT = env_int("DB_POOL_TIMEOUT", 30)
+DB_POOL_RECYCLE = env_int("DB_POOL_RECYCLE", 1800)
+DB_POOL_PRE_PING = env_bool("DB_POOL_PRE_PING", True)
+DB_STATEMENT_CACHE_SIZE = env_int("DB_STATEMENT_CACHE_SIZE", 100)
+DB_READ_POOL_SIZE = env_int("DB_READ_POOL_SIZE", DB_POOL_SIZE)
+DB_READ_MAX_OVERFLOW = env_int("DB_READ_MAX_OVERFLOW", DB_MAX_OVERFLOW)
+
+
+def engine_options(url: str, pool_size: int, max_overflow: int) -> dict:
+    options = {"future": True, "echo": DB_ECHO, "pool_pre_ping": DB_POOL_PRE_PING}
+    url = make_url(url)
+    if url.get_backend_name() != "sqlite":
+        options.update(pool_size=pool_size, max_overflow=max_overflow,
+                       pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE)
+    if url.get_driver_name() == "asyncpg":
+        # SQLAlchemy's per-connection cache of asyncpg prepared statements.
+        options["connect_args"] = {"prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE}
+    return options
+
+
+engine = create_async_engine(DATABASE_URL, **engine_options(DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW))
+
+read_engine = create_async_engine(
+    DATABASE_READ_URL, **engine_options(DATABASE_READ_URL, DB_READ_POOL_SIZE, DB_READ_MAX_OVERFLOW)
+) if DATABASE_READ_URL else engine
 
 async_session_maker = sessionmaker(
     bind=engine,
@@ -19,6 +47,24 @@ async_session_maker = sessionmaker(
     expire_on_commit=False
 )
 
+read_session_maker = sessionmaker(
+    bind=read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+) if read_engine is not engine else async_session_maker
+
+
 async def get_db():
     async with async_session_maker() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+
+async def get_read_db():
+    async with read_session_maker() as session:
+        yield session
+
+
+async def dispose_engines():
+    if read_engine is not engine:
+        await read_engine.dispose()
+    await engine.dispose()
@@ -1,15 +1,77 @@
+import time
+
 from fastapi import Depends, HTTPException, status
+from fastapi.encoders import jsonable_encoder
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
+from sqlalchemy import event, inspect
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
+from app import metrics, profiling
+from app.cache import TTLCache
+from app.cache_backends import Cache
+from app.config import env_float, env_int
 from app.db import get_db
 from app.models import User
-from app.auth import SECRET_KEY, ALGORITHM, TokenData
+from app.auth import SECRET_KEY, ALGORITHM, TokenData, UserOut
+from app.revocation import revocation_list
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
+PRINCIPAL_CACHE_TTL = env_float("PRINCIPAL_CACHE_TTL", 30.0)
+PRINCIPAL_CACHE_MAX_SIZE = env_int("PRINCIPAL_CACHE_MAX_SIZE", 10000)
+TOKEN_CLAIMS_CACHE_MAX_SIZE = env_int("TOKEN_CLAIMS_CACHE_MAX_SIZE", 10000)
+
+# Authenticated users are cached as detached UserOut snapshots keyed by the token subject (email).
+principal_cache = Cache("principal", max_size=PRINCIPAL_CACHE_MAX_SIZE,
+                        encode=jsonable_encoder, decode=lambda data: UserOut(**data))
+# Decoded claims are cheap to recompute and bound to a single token, so they stay per-process.
+token_claims_cache = TTLCache(max_size=TOKEN_CLAIMS_CACHE_MAX_SIZE)
+
+
+def decode_token_claims(token: str) -> dict:
+    claims = token_claims_cache.get(token)
+    if claims is not None:
+        return claims
+    claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    expires_at = claims.get("exp")
+    if expires_at is not None:
+        token_claims_cache.set(token, claims, ttl=expires_at - time.time())
+    return claims
+
+
+def invalidate_user(email: str) -> None:
+    principal_cache.invalidate(email)
+
+
+async def load_principal(email: str, db: AsyncSession) -> UserOut | None:
+    async def loader():
+        statement = select(User).where(User.email == email)
+        user = (await db.execute(statement)).scalar_one_or_none()
+        if user is None:
+            return None
+        return UserOut(
+            id=user.id,
+            email=user.email,
+            is_active=user.is_active,
+            is_superuser=user.is_superuser,
+            is_verified=user.is_verified,
+            created_at=user.created_at,
+        )
+
+    return await principal_cache.get_or_load(
+        email, loader, lambda principal: PRINCIPAL_CACHE_TTL if principal is not None else 0
+    )
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target: User) -> None:
+    invalidate_user(target.email)
+    for previous_email in inspect(target).attrs.email.history.deleted:
+        invalidate_user(previous_email)
+
 
 async def get_current_user(
         token: str = Depends(oauth2_scheme),
@@ -21,19 +83,27 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        with metrics.stage("get_current_user", "decode_token"):
+            payload = decode_token_claims(token)
         email: str = payload.get("sub")
-        if email is None:
+        # Refresh tokens are only accepted by /refresh.
+        if email is None or payload.get("type") == "refresh":
             raise credentials_exception
         token_data = TokenData(email=email)
     except JWTError:
         raise credentials_exception
 
-    statement = select(User).where(User.email == token_data.email)
-    user = await db.execute(statement).scalar_one_or_none()
+    with metrics.stage("get_current_user", "check_revocation"):
+        revoked = await revocation_list.is_revoked(db, payload.get("jti"), payload.get("sid"))
+    if revoked:
+        raise credentials_exception
+
+    with metrics.stage("get_current_user", "load_user"):
+        user = await load_principal(token_data.email, db)
 
     if user is None:
         raise credentials_exception
+    profiling.note_principal(user)
     return user
 
 
@@ -49,4 +119,4 @@ async def get_current_admin_user(current_user: User = Depends(get_current_active
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Operation not permitted, insufficient permissions",
         )
-    return current_user
\ No newline at end of file
+    return current_user
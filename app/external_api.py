@@ -0,0 +1,259 @@
+import asyncio
+import os
+import time
+
+import httpx
+from fastapi import HTTPException, status
+
+from app.admission import admit_upstream_call
+from app.cache_backends import Cache
+from app import metrics
+from app.config import env_bool, env_float, env_int
+from app.resilience import CircuitBreaker, LatencyTracker, backoff_delay
+
+EXTERNAL_API_URL = os.environ.get("EXTERNAL_API_URL", "http://external_api_mock:8001")
+EXTERNAL_API_MAX_CONNECTIONS = env_int("EXTERNAL_API_MAX_CONNECTIONS", 100)
+EXTERNAL_API_MAX_KEEPALIVE_CONNECTIONS = env_int("EXTERNAL_API_MAX_KEEPALIVE_CONNECTIONS", 20)
+EXTERNAL_API_KEEPALIVE_EXPIRY = env_float("EXTERNAL_API_KEEPALIVE_EXPIRY", 30.0)
+EXTERNAL_API_HTTP2 = env_bool("EXTERNAL_API_HTTP2", False)
+EXTERNAL_API_CONNECT_TIMEOUT = env_float("EXTERNAL_API_CONNECT_TIMEOUT", 2.0)
+EXTERNAL_API_READ_TIMEOUT = env_float("EXTERNAL_API_READ_TIMEOUT", 5.0)
+EXTERNAL_API_WRITE_TIMEOUT = env_float("EXTERNAL_API_WRITE_TIMEOUT", 5.0)
+EXTERNAL_API_POOL_TIMEOUT = env_float("EXTERNAL_API_POOL_TIMEOUT", 2.0)
+
+LOOKUP_CACHE_ENABLED = env_bool("LOOKUP_CACHE_ENABLED", True)
+LOOKUP_CACHE_MAX_SIZE = env_int("LOOKUP_CACHE_MAX_SIZE", 10000)
+LOOKUP_CACHE_SUCCESS_TTL = env_float("LOOKUP_CACHE_SUCCESS_TTL", 300.0)
+LOOKUP_CACHE_NOT_FOUND_TTL = env_float("LOOKUP_CACHE_NOT_FOUND_TTL", 60.0)
+# Expired lookups younger than this many seconds are served at once and refreshed in the background; 0 disables.
+LOOKUP_CACHE_STALE_WHILE_REVALIDATE = env_float("LOOKUP_CACHE_STALE_WHILE_REVALIDATE", 0.0)
+LOOKUP_CACHE_KEY_COORDINATES = env_bool("LOOKUP_CACHE_KEY_COORDINATES", False)
+LOOKUP_CACHE_COORDINATE_PRECISION = env_int("LOOKUP_CACHE_COORDINATE_PRECISION", 5)
+
+EXTERNAL_API_RETRIES = env_int("EXTERNAL_API_RETRIES", 2)
+EXTERNAL_API_RETRY_BASE_DELAY = env_float("EXTERNAL_API_RETRY_BASE_DELAY", 0.05)
+EXTERNAL_API_RETRY_MAX_DELAY = env_float("EXTERNAL_API_RETRY_MAX_DELAY", 1.0)
+EXTERNAL_API_TOTAL_TIMEOUT = env_float("EXTERNAL_API_TOTAL_TIMEOUT", 10.0)
+EXTERNAL_API_BREAKER_FAILURE_THRESHOLD = env_int("EXTERNAL_API_BREAKER_FAILURE_THRESHOLD", 5)
+EXTERNAL_API_BREAKER_RESET_TIMEOUT = env_float("EXTERNAL_API_BREAKER_RESET_TIMEOUT", 30.0)
+EXTERNAL_API_SERVE_STALE = env_bool("EXTERNAL_API_SERVE_STALE", True)
+EXTERNAL_API_HEDGE_ENABLED = env_bool("EXTERNAL_API_HEDGE_ENABLED", False)
+EXTERNAL_API_HEDGE_PERCENTILE = env_float("EXTERNAL_API_HEDGE_PERCENTILE", 95.0)
+EXTERNAL_API_HEDGE_MIN_DELAY = env_float("EXTERNAL_API_HEDGE_MIN_DELAY", 0.05)
+EXTERNAL_API_LATENCY_WINDOW = env_int("EXTERNAL_API_LATENCY_WINDOW", 1000)
+
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+
+lookup_cache = Cache("lookup", max_size=LOOKUP_CACHE_MAX_SIZE)
+external_api_breaker = CircuitBreaker(
+    failure_threshold=EXTERNAL_API_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=EXTERNAL_API_BREAKER_RESET_TIMEOUT,
+)
+external_api_latency = LatencyTracker(window=EXTERNAL_API_LATENCY_WINDOW)
+external_api_counters = {
+    "requests": 0,
+    "retries": 0,
+    "failures": 0,
+    "hedges": 0,
+    "hedge_wins": 0,
+    "stale_served": 0,
+}
+
+_http_client: httpx.AsyncClient | None = None
+
+
+def create_http_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=EXTERNAL_API_MAX_CONNECTIONS,
+        max_keepalive_connections=EXTERNAL_API_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=EXTERNAL_API_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(
+        connect=EXTERNAL_API_CONNECT_TIMEOUT,
+        read=EXTERNAL_API_READ_TIMEOUT,
+        write=EXTERNAL_API_WRITE_TIMEOUT,
+        pool=EXTERNAL_API_POOL_TIMEOUT,
+    )
+    return httpx.AsyncClient(
+        base_url=EXTERNAL_API_URL,
+        limits=limits,
+        timeout=timeout,
+        http2=EXTERNAL_API_HTTP2,
+    )
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    # Lifespan normally opens the client; this covers apps driven without it (e.g. a bare TestClient).
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = create_http_client()
+    return _http_client
+
+
+def normalize_cadastral_number(cadastral_number: str) -> str:
+    return "".join(cadastral_number.split()).upper()
+
+
+def lookup_cache_key(cadastral_number: str, latitude: float, longitude: float) -> tuple:
+    number = normalize_cadastral_number(cadastral_number)
+    if not LOOKUP_CACHE_KEY_COORDINATES:
+        return (number,)
+    return (
+        number,
+        round(latitude, LOOKUP_CACHE_COORDINATE_PRECISION),
+        round(longitude, LOOKUP_CACHE_COORDINATE_PRECISION),
+    )
+
+
+def lookup_cache_ttl(response: dict) -> float:
+    response_status = response.get("status")
+    if response_status == "Success":
+        return LOOKUP_CACHE_SUCCESS_TTL
+    if response_status == "NotFound":
+        return LOOKUP_CACHE_NOT_FOUND_TTL
+    return 0
+
+
+async def call_external_api(cadastral_number: str, latitude: float, longitude: float,
+                            use_cache: bool = True) -> dict:
+    if not LOOKUP_CACHE_ENABLED:
+        return await fetch_external_api(cadastral_number, latitude, longitude)
+    key = lookup_cache_key(cadastral_number, latitude, longitude)
+    try:
+        return await lookup_cache.get_or_load(
+            key,
+            lambda: fetch_external_api(cadastral_number, latitude, longitude),
+            lookup_cache_ttl,
+            bypass=not use_cache,
+            stale_ttl=LOOKUP_CACHE_STALE_WHILE_REVALIDATE,
+        )
+    except HTTPException as e:
+        stale_entry = await lookup_cache.get_entry(key)
+        if e.status_code != status.HTTP_503_SERVICE_UNAVAILABLE or not EXTERNAL_API_SERVE_STALE \
+                or stale_entry is None:
+            raise
+        external_api_counters["stale_served"] += 1
+        return stale_entry.value
+
+
+async def cached_lookups(items: list[tuple[str, float, float]]) -> dict[tuple, dict]:
+    """Fresh cached responses for many (cadastral_number, latitude, longitude) items in one cache round trip."""
+    if not LOOKUP_CACHE_ENABLED:
+        return {}
+    keys = {lookup_cache_key(*item): item for item in items}
+    return {keys[key]: value for key, value in (await lookup_cache.get_many(keys)).items()}
+
+
+async def fetch_external_api(cadastral_number: str, latitude: float, longitude: float) -> dict:
+    payload = {
+        "cadastral_number": cadastral_number,
+        "latitude": latitude,
+        "longitude": longitude
+    }
+    deadline = time.monotonic() + EXTERNAL_API_TOTAL_TIMEOUT
+    attempt = 0
+    while True:
+        if not external_api_breaker.allow_request():
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="External API is unavailable: circuit breaker is open",
+                                headers={"Retry-After": str(max(1, round(external_api_breaker.retry_after())))})
+        # None until the call has an outcome; settled in `finally` however the attempt ends.
+        healthy = None
+        try:
+            external_api_counters["requests"] += 1
+            response = await admit_upstream_call(lambda: post_lookup(payload))
+            healthy = response.status_code not in RETRYABLE_STATUS_CODES and response.status_code < 500
+            response.raise_for_status()
+            return response.json()
+        except ValueError:
+            healthy = False
+            error = HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                  detail="External API returned an invalid response")
+            retryable = False
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                return {"cadastral_number": cadastral_number, "status": "NotFound",
+                        "message": "External API could not find data"}
+            error = HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                  detail=f"External API error: {e.response.status_code}")
+            retryable = e.response.status_code in RETRYABLE_STATUS_CODES
+        except httpx.RequestError as e:
+            healthy = False
+            error = HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                  detail=f"External API is unavailable: {e}")
+            retryable = True
+        finally:
+            # Every admitted call settles the breaker, so a half-open probe is never left outstanding.
+            if healthy is None:
+                external_api_breaker.release()
+            elif healthy:
+                external_api_breaker.record_success()
+            else:
+                external_api_breaker.record_failure()
+
+        delay = backoff_delay(attempt, EXTERNAL_API_RETRY_BASE_DELAY, EXTERNAL_API_RETRY_MAX_DELAY)
+        if not retryable or attempt >= EXTERNAL_API_RETRIES or time.monotonic() + delay >= deadline:
+            external_api_counters["failures"] += 1
+            raise error
+        external_api_counters["retries"] += 1
+        attempt += 1
+        await asyncio.sleep(delay)
+
+
+async def post_lookup(payload: dict) -> httpx.Response:
+    if not EXTERNAL_API_HEDGE_ENABLED:
+        return await _timed_post(payload)
+
+    hedge_delay = external_api_latency.percentile(EXTERNAL_API_HEDGE_PERCENTILE)
+    hedge_delay = max(EXTERNAL_API_HEDGE_MIN_DELAY, hedge_delay or 0)
+    primary = asyncio.ensure_future(_timed_post(payload))
+    pending = {primary}
+    try:
+        done, _ = await asyncio.wait(pending, timeout=hedge_delay)
+        if done:
+            return primary.result()
+
+        # The primary is slower than the recent p95: race a second request against it.
+        external_api_counters["hedges"] += 1
+        hedge = asyncio.ensure_future(_timed_post(payload))
+        pending.add(hedge)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        external_api_counters["hedge_wins"] += 1
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _timed_post(payload: dict) -> httpx.Response:
+    started = time.perf_counter()
+    try:
+        response = await get_http_client().post("/mock_query/", json=payload)
+    except httpx.RequestError:
+        metrics.record_upstream_response("error")
+        raise
+    external_api_latency.record(time.perf_counter() - started)
+    metrics.record_upstream_response(str(response.status_code))
+    return response
+
+
+def external_api_stats() -> dict:
+    return {
+        **external_api_counters,
+        "breaker": external_api_breaker.stats(),
+        "latency_p95_seconds": external_api_latency.percentile(95),
+    }
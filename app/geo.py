@@ -0,0 +1,90 @@
+import math
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE_LAT = 111320.0
+GEOHASH_PRECISION = 12
+
+
+def encode_geohash(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            middle = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= middle:
+                bits = bits * 2 + 1
+                lon_range[0] = middle
+            else:
+                bits = bits * 2
+                lon_range[1] = middle
+        else:
+            middle = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= middle:
+                bits = bits * 2 + 1
+                lat_range[0] = middle
+            else:
+                bits = bits * 2
+                lat_range[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def cell_size_degrees(precision: int) -> tuple[float, float]:
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = math.floor(precision * 5 / 2)
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(latitude: float, longitude: float, radius_m: float) -> tuple[float, float, float, float]:
+    d_lat = radius_m / METERS_PER_DEGREE_LAT
+    cos_lat = max(math.cos(math.radians(latitude)), 1e-6)
+    d_lon = min(radius_m / (METERS_PER_DEGREE_LAT * cos_lat), 180.0)
+    return latitude - d_lat, latitude + d_lat, longitude - d_lon, longitude + d_lon
+
+
+def covering_geohashes(latitude: float, longitude: float, radius_m: float) -> list[str]:
+    """Geohash cells (the containing cell plus its 8 neighbours) that together cover the circle.
+
+    The precision is the finest one whose cells are at least radius_m on each side, so the
+    3x3 block around the centre always contains the whole circle. Returns [] when the radius
+    is too large for any useful prefix.
+    """
+    cos_lat = max(math.cos(math.radians(latitude)), 1e-6)
+    precision = 0
+    for candidate in range(1, GEOHASH_PRECISION + 1):
+        lat_deg, lon_deg = cell_size_degrees(candidate)
+        if lat_deg * METERS_PER_DEGREE_LAT < radius_m or lon_deg * METERS_PER_DEGREE_LAT * cos_lat < radius_m:
+            break
+        precision = candidate
+    if precision == 0:
+        return []
+
+    lat_deg, lon_deg = cell_size_degrees(precision)
+    cells = set()
+    for d_lat in (-lat_deg, 0.0, lat_deg):
+        for d_lon in (-lon_deg, 0.0, lon_deg):
+            cell_lat = latitude + d_lat
+            if not -90.0 <= cell_lat <= 90.0:
+                continue
+            cell_lon = (longitude + d_lon + 180.0) % 360.0 - 180.0
+            cells.add(encode_geohash(cell_lat, cell_lon, precision))
+    return sorted(cells)
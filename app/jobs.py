@@ -0,0 +1,297 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.orm import sessionmaker
+
+from app.config import env_float, env_int
+from app.db import async_session_maker
+from app.external_api import call_external_api
+from app.models import QueryJob, QueryLog, response_columns
+
+logger = logging.getLogger(__name__)
+
+# Workers in this process; 0 only accepts jobs and leaves execution to other processes.
+JOB_WORKERS = env_int("JOB_WORKERS", 4)
+JOB_POLL_INTERVAL = env_float("JOB_POLL_INTERVAL", 1.0)
+# A running job whose lease expires (its worker died) is handed to another worker.
+JOB_LEASE_SECONDS = env_float("JOB_LEASE_SECONDS", 60.0)
+JOB_MAX_ATTEMPTS = env_int("JOB_MAX_ATTEMPTS", 3)
+JOB_LONG_POLL_MAX_WAIT = env_float("JOB_LONG_POLL_MAX_WAIT", 30.0)
+JOB_SSE_HEARTBEAT = env_float("JOB_SSE_HEARTBEAT", 15.0)
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+TERMINAL_STATUSES = (SUCCEEDED, FAILED)
+
+
+class JobRunner:
+    """Pool of asyncio workers that execute QueryJob rows stored in the database.
+
+    Jobs are claimed with a conditional UPDATE, so several processes can share the
+    table. New jobs submitted in this process wake the workers immediately; jobs
+    from elsewhere (or left over from a restart) are picked up by polling.
+    """
+
+    def __init__(self, session_maker: sessionmaker, workers: int, poll_interval: float, lease_seconds: float,
+                 max_attempts: int):
+        self.session_maker = session_maker
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup: asyncio.Event | None = None
+        self._claimed: set[str] = set()
+        self._watchers: dict[str, set[asyncio.Event]] = {}
+        self.submitted = 0
+        self.claimed = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.recovered = 0
+        self.lost_leases = 0
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    def start(self) -> None:
+        if self.running or self.workers <= 0:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work(number)) for number in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._claimed:
+            # Hand interrupted jobs straight back instead of waiting for their leases to expire.
+            async with self.session_maker() as session:
+                await session.execute(
+                    update(QueryJob)
+                    .where(QueryJob.id.in_(self._claimed), QueryJob.status == RUNNING)
+                    .values(status=PENDING, lease_expires_at=None, updated_at=datetime.utcnow())
+                )
+                await session.commit()
+            self._claimed.clear()
+
+    async def submit(self, session, user_id: int, cadastral_number: str, latitude: float, longitude: float,
+                     use_cache: bool = True) -> QueryJob:
+        job = QueryJob(
+            id=str(uuid.uuid4()),
+            user_id=user_id,
+            cadastral_number=cadastral_number,
+            latitude=latitude,
+            longitude=longitude,
+            use_cache=use_cache,
+            status=PENDING,
+            attempts=0,
+        )
+        session.add(job)
+        await session.commit()
+        self.submitted += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def wait_for_update(self, job_id: str, timeout: float) -> None:
+        """Sleep until this process finishes the job or the timeout passes, whichever is first."""
+        event = asyncio.Event()
+        self._watchers.setdefault(job_id, set()).add(event)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            watchers = self._watchers.get(job_id)
+            if watchers is not None:
+                watchers.discard(event)
+                if not watchers:
+                    del self._watchers[job_id]
+
+    def _notify(self, job_id: str) -> None:
+        for event in self._watchers.get(job_id, ()):
+            event.set()
+
+    async def _work(self, number: int) -> None:
+        while True:
+            try:
+                claim = await self._claim()
+                if claim is not None:
+                    await self._run(*claim)
+                    continue
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    if number == 0:
+                        await self._recover_expired()
+                self._wakeup.clear()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("query job worker %d failed", number)
+                await asyncio.sleep(self.poll_interval)
+
+    async def _claim(self) -> tuple[str, datetime] | None:
+        async with self.session_maker() as session:
+            # SKIP LOCKED keeps concurrent claimers off the same row where the database supports it;
+            # the status check in the UPDATE is what actually guarantees a single owner.
+            statement = select(QueryJob.id).where(QueryJob.status == PENDING) \
+                .order_by(QueryJob.created_at).limit(1).with_for_update(skip_locked=True)
+            job_id = (await session.execute(statement)).scalar_one_or_none()
+            if job_id is None:
+                return None
+            now = datetime.utcnow()
+            lease_expires_at = now + timedelta(seconds=self.lease_seconds)
+            result = await session.execute(
+                update(QueryJob)
+                .where(QueryJob.id == job_id, QueryJob.status == PENDING)
+                .values(status=RUNNING, attempts=QueryJob.attempts + 1, started_at=now, updated_at=now,
+                        lease_expires_at=lease_expires_at)
+            )
+            await session.commit()
+        if result.rowcount != 1:
+            return None
+        self.claimed += 1
+        self._claimed.add(job_id)
+        return job_id, lease_expires_at
+
+    async def _run(self, job_id: str, lease_expires_at: datetime) -> None:
+        try:
+            async with self.session_maker() as session:
+                job = await session.get(QueryJob, job_id)
+                # Release the connection for the duration of the upstream call.
+                await session.commit()
+                if job is None:
+                    logger.warning("query job %s disappeared after it was claimed", job_id)
+                    return
+                try:
+                    response = await call_external_api(job.cadastral_number, job.latitude, job.longitude,
+                                                       use_cache=job.use_cache)
+                except HTTPException as e:
+                    columns = None
+                    outcome = {"status": FAILED, "status_code": e.status_code, "error": str(e.detail)}
+                else:
+                    columns = response_columns(response)
+                    outcome = {"status": SUCCEEDED, "status_code": 200,
+                               "external_server_response": columns["external_server_response"]}
+                now = datetime.utcnow()
+                # Only the holder of the current lease may finish the job: if the lease expired and the job
+                # was handed to another worker (or it was purged), this result is dropped.
+                result = await session.execute(
+                    update(QueryJob)
+                    .where(QueryJob.id == job_id, QueryJob.status == RUNNING,
+                           QueryJob.lease_expires_at == lease_expires_at)
+                    .values(**outcome, finished_at=now, updated_at=now, lease_expires_at=None)
+                )
+                if result.rowcount != 1:
+                    await session.rollback()
+                    self.lost_leases += 1
+                    logger.warning("query job %s lost its lease before finishing; result discarded", job_id)
+                    return
+                if columns is not None:
+                    log = QueryLog(
+                        cadastral_number=job.cadastral_number,
+                        latitude=job.latitude,
+                        longitude=job.longitude,
+                        **columns,
+                    )
+                    session.add(log)
+                    await session.flush()
+                    await session.execute(update(QueryJob).where(QueryJob.id == job_id).values(query_log_id=log.id))
+                    self.succeeded += 1
+                else:
+                    self.failed += 1
+                await session.commit()
+        finally:
+            self._claimed.discard(job_id)
+            self._notify(job_id)
+
+    async def _recover_expired(self) -> None:
+        now = datetime.utcnow()
+        expired = (QueryJob.status == RUNNING, QueryJob.lease_expires_at < now)
+        async with self.session_maker() as session:
+            retried = await session.execute(
+                update(QueryJob).where(*expired, QueryJob.attempts < self.max_attempts)
+                .values(status=PENDING, lease_expires_at=None, updated_at=now)
+            )
+            await session.execute(
+                update(QueryJob).where(*expired)
+                .values(status=FAILED, error=f"Job abandoned after {self.max_attempts} attempts",
+                        lease_expires_at=None, finished_at=now, updated_at=now)
+            )
+            await session.commit()
+        if retried.rowcount:
+            self.recovered += retried.rowcount
+            self._wakeup.set()
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._tasks),
+            "running_jobs": len(self._claimed),
+            "watchers": len(self._watchers),
+            "submitted": self.submitted,
+            "claimed": self.claimed,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "recovered": self.recovered,
+            "lost_leases": self.lost_leases,
+        }
+
+
+def job_to_dict(job: QueryJob) -> dict:
+    return {
+        "id": job.id,
+        "status": job.status,
+        "cadastral_number": job.cadastral_number,
+        "latitude": job.latitude,
+        "longitude": job.longitude,
+        "attempts": job.attempts,
+        "query_log_id": job.query_log_id,
+        "external_server_response": job.external_server_response,
+        "status_code": job.status_code,
+        "error": job.error,
+        "created_at": job.created_at.isoformat(),
+        "updated_at": job.updated_at.isoformat(),
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+async def job_events(job_id: str):
+    """Server-Sent Events for a job: one event per state change, ending with the terminal state."""
+    last_sent = None
+    last_sent_at = time.monotonic()
+    while True:
+        async with job_runner.session_maker() as session:
+            job = await session.get(QueryJob, job_id)
+        if job is None:
+            yield f"event: error\ndata: {json.dumps({'id': job_id, 'error': 'Job not found'})}\n\n"
+            return
+        data = job_to_dict(job)
+        if data != last_sent:
+            yield f"event: {job.status}\ndata: {json.dumps(data)}\n\n"
+            last_sent, last_sent_at = data, time.monotonic()
+            if job.status in TERMINAL_STATUSES:
+                return
+        elif time.monotonic() - last_sent_at >= JOB_SSE_HEARTBEAT:
+            yield ": keep-alive\n\n"
+            last_sent_at = time.monotonic()
+        await job_runner.wait_for_update(job_id, JOB_POLL_INTERVAL)
+
+
+job_runner = JobRunner(
+    async_session_maker,
+    workers=JOB_WORKERS,
+    poll_interval=JOB_POLL_INTERVAL,
+    lease_seconds=JOB_LEASE_SECONDS,
+    max_attempts=JOB_MAX_ATTEMPTS,
+)
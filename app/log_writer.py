@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import time
+
+from fastapi import HTTPException, status
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import env_bool, env_float, env_int
+from app.db import engine
+from app.models import QueryLog
+
+logger = logging.getLogger(__name__)
+
+QUERY_LOG_WRITE_BEHIND = env_bool("QUERY_LOG_WRITE_BEHIND", False)
+QUERY_LOG_QUEUE_SIZE = env_int("QUERY_LOG_QUEUE_SIZE", 10000)
+QUERY_LOG_FLUSH_BATCH_SIZE = env_int("QUERY_LOG_FLUSH_BATCH_SIZE", 500)
+QUERY_LOG_FLUSH_INTERVAL = env_float("QUERY_LOG_FLUSH_INTERVAL", 0.5)
+QUERY_LOG_ENQUEUE_TIMEOUT = env_float("QUERY_LOG_ENQUEUE_TIMEOUT", 1.0)
+QUERY_LOG_FLUSH_RETRIES = env_int("QUERY_LOG_FLUSH_RETRIES", 2)
+
+_STOP = object()
+
+
+class QueryLogWriter:
+    """Buffers QueryLog rows in a bounded queue and inserts them in batches from a background task."""
+
+    def __init__(self, engine: AsyncEngine, queue_size: int, batch_size: int, flush_interval: float,
+                 enqueue_timeout: float, flush_retries: int):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.flush_retries = flush_retries
+        self._queue: asyncio.Queue | None = None
+        self._queue_size = queue_size
+        self._task: asyncio.Task | None = None
+        self.enqueued = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.failed_rows = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self._queue_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        if not self._task.done():
+            await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def enqueue(self, row: dict) -> None:
+        if not self.running:
+            self.start()
+        try:
+            # Waiting for free space is the backpressure: callers slow down to the flush rate.
+            await asyncio.wait_for(self._queue.put(row), timeout=self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Query log queue is full, try again later",
+                                headers={"Retry-After": "1"})
+        self.enqueued += 1
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = []
+            item = await self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+            if batch:
+                await self._flush(batch)
+        # Drain whatever was enqueued before shutdown.
+        while not self._queue.empty():
+            batch = []
+            while len(batch) < self.batch_size and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is not _STOP:
+                    batch.append(item)
+            if batch:
+                await self._flush(batch)
+
+    async def _flush(self, rows: list[dict]) -> None:
+        for attempt in range(self.flush_retries + 1):
+            started = time.perf_counter()
+            try:
+                async with self.engine.begin() as conn:
+                    await conn.execute(insert(QueryLog), rows)
+            except Exception:
+                logger.exception("Failed to flush %d query log rows (attempt %d)", len(rows), attempt + 1)
+                if attempt < self.flush_retries:
+                    await asyncio.sleep(min(0.1 * 2 ** attempt, 2.0))
+                continue
+            elapsed = time.perf_counter() - started
+            self.flushes += 1
+            self.flushed_rows += len(rows)
+            self.last_flush_seconds = elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+            self.total_flush_seconds += elapsed
+            return
+        self.failed_rows += len(rows)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": QUERY_LOG_WRITE_BEHIND,
+            "running": self.running,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_capacity": self._queue_size,
+            "enqueued": self.enqueued,
+            "rejected": self.rejected,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "failed_rows": self.failed_rows,
+            "last_flush_seconds": self.last_flush_seconds,
+            "max_flush_seconds": self.max_flush_seconds,
+            "avg_flush_seconds": self.total_flush_seconds / self.flushes if self.flushes else 0.0,
+        }
+
+
+query_log_writer = QueryLogWriter(
+    engine,
+    queue_size=QUERY_LOG_QUEUE_SIZE,
+    batch_size=QUERY_LOG_FLUSH_BATCH_SIZE,
+    flush_interval=QUERY_LOG_FLUSH_INTERVAL,
+    enqueue_timeout=QUERY_LOG_ENQUEUE_TIMEOUT,
+    flush_retries=QUERY_LOG_FLUSH_RETRIES,
+)
@@ -1,30 +1,109 @@
+import asyncio
+import json
 import os
-from fastapi import FastAPI, Depends
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy import and_, func, insert, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy.future import select
 
-from app.db import engine, get_db, Base
-from app.models import QueryLog, User
+from app.db import dispose_engines, engine, get_db, get_read_db, read_engine, read_session_maker, Base
+from app.models import QueryJob, QueryLog, QueryLogRollup, User, response_columns
 from app.auth import TokenData, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, SECRET_KEY, \
     ALGORITHM
+from app import metrics, profiling
+from app.admission import admission_stats, check_rate_limit, get_rate_limited_user
 from app.auth_routes import router as auth_router
-from app.dependencies import get_current_active_user
+from app.bulk_routes import router as bulk_router
+from app.config import env_bool, env_int
+from app.geo import bounding_box, covering_geohashes, haversine_m
+from app.dependencies import get_current_active_user, get_current_admin_user, principal_cache, \
+    token_claims_cache
+from app.cache_backends import start_cache_invalidation, stop_cache_invalidation
+from app.external_api import EXTERNAL_API_URL, cached_lookups, call_external_api, close_http_client, \
+    external_api_stats, get_http_client, lookup_cache, normalize_cadastral_number
+from app.jobs import JOB_LONG_POLL_MAX_WAIT, JOB_POLL_INTERVAL, TERMINAL_STATUSES, job_events, job_runner, \
+    job_to_dict
+from app.log_writer import QUERY_LOG_WRITE_BEHIND, query_log_writer
+from app.maintenance import MAINTENANCE_ENABLED, maintenance_loop
+from app.pagination import encode_cursor, etag_matches, history_etag, history_statement
+from app.revocation import revocation_list
+from app.serialization import FAST_JSON_ENABLED, FastJSONResponse, query_log_columns_select, rows_to_dicts
+from app.warmup import startup_state
 
-import httpx
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 
-EXTERNAL_API_URL = os.environ.get("EXTERNAL_API_URL", "http://external_api_mock:8001")
 DATABASE_URL = os.environ.get("DATABASE_URL")
 
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL is not set in environment variables")
 
-app = FastAPI()
+QUERY_BATCH_MAX_ITEMS = env_int("QUERY_BATCH_MAX_ITEMS", 1000)
+QUERY_BATCH_CONCURRENCY = env_int("QUERY_BATCH_CONCURRENCY", 20)
+HISTORY_DEFAULT_LIMIT = env_int("HISTORY_DEFAULT_LIMIT", 100)
+HISTORY_MAX_LIMIT = env_int("HISTORY_MAX_LIMIT", 1000)
+HISTORY_STREAM_CHUNK_SIZE = env_int("HISTORY_STREAM_CHUNK_SIZE", 1000)
+NEARBY_MAX_RADIUS_M = env_int("NEARBY_MAX_RADIUS_M", 50000)
+NEARBY_MAX_CANDIDATES = env_int("NEARBY_MAX_CANDIDATES", 10000)
+HISTORY_STATS_DEFAULT_HOURS = env_int("HISTORY_STATS_DEFAULT_HOURS", 24)
+HISTORY_ETAG_ENABLED = env_bool("HISTORY_ETAG_ENABLED", True)
+# Alembic owns the schema in production; this is for local runs and throwaway databases.
+CREATE_TABLES_ON_STARTUP = env_bool("CREATE_TABLES_ON_STARTUP", False)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    startup_state.lifespan_start()
+    if CREATE_TABLES_ON_STARTUP:
+        await create_db_and_tables()
+    get_http_client()
+    await start_cache_invalidation()
+    if QUERY_LOG_WRITE_BEHIND:
+        query_log_writer.start()
+    job_runner.start()
+    revocation_list.start()
+    maintenance_task = asyncio.create_task(maintenance_loop(engine)) if MAINTENANCE_ENABLED else None
+    # Warm-up runs after startup, so /ping answers at once while /ready waits for it.
+    warmup_task = asyncio.create_task(startup_state.warm_up())
+    startup_state.lifespan_ready()
+    try:
+        yield
+    finally:
+        startup_state.stopping = True
+        warmup_task.cancel()
+        await asyncio.gather(warmup_task, return_exceptions=True)
+        if maintenance_task is not None:
+            maintenance_task.cancel()
+            await asyncio.gather(maintenance_task, return_exceptions=True)
+        await job_runner.stop()
+        await revocation_list.stop()
+        await query_log_writer.stop()
+        await close_http_client()
+        await stop_cache_invalidation()
+        await dispose_engines()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(auth_router)
+app.include_router(bulk_router)
+
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+    metrics.instrument_pool(engine.sync_engine.pool)
+    if read_engine is not engine:
+        metrics.instrument_pool(read_engine.sync_engine.pool, "replica")
+
+if profiling.PROFILING_ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
+    profiling.instrument_engine(engine)
+    profiling.instrument_engine(read_engine)
 
 
 class QueryLogCreate(BaseModel):
@@ -34,39 +113,70 @@ class QueryLogCreate(BaseModel):
 
 
 class QueryLogResponse(BaseModel):
-    id: int
+    id: Optional[int] = None
     cadastral_number: str
     latitude: float
     longitude: float
     external_server_response: Optional[str] = None
     created_at: datetime
+    external_response: Optional[dict] = None
+    status: Optional[str] = None
+    address: Optional[str] = None
+    value: Optional[float] = None
 
     class Config:
         orm_mode = True
 
 
-async def call_external_api(cadastral_number: str, latitude: float, longitude: float) -> dict:
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{EXTERNAL_API_URL}/mock_query/",
-                json={
-                    "cadastral_number": cadastral_number,
-                    "latitude": latitude,
-                    "longitude": longitude
-                }
-            )
-            response.raise_for_status()
-            return response.json()
-    except httpx.HTTPStatusError as e:
-        if e.response.status_code == 404:
-            return {"cadastral_number": cadastral_number, "status": "NotFound",
-                    "message": "External API could not find data"}
-        else:
-            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                                detail=f"External API error: {e.response.status_code}")
-    except httpx.RequestError as e:
-        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"External API is unavailable: {e}")
+class NearbyQueryLogResponse(QueryLogResponse):
+    distance_m: float
+
+
+class HistoryStatsBucket(BaseModel):
+    bucket: datetime
+    status: str
+    query_count: int
+
+
+class HistoryStatsResponse(BaseModel):
+    cadastral_number: Optional[str] = None
+    since: datetime
+    until: datetime
+    total: int
+    by_status: Dict[str, int]
+    buckets: List[HistoryStatsBucket]
+
+
+class QueryJobResponse(BaseModel):
+    id: str
+    status: str
+    cadastral_number: str
+    latitude: float
+    longitude: float
+    attempts: int
+    query_log_id: Optional[int] = None
+    external_server_response: Optional[str] = None
+    status_code: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+
+class QueryBatchItemResult(BaseModel):
+    cadastral_number: str
+    latitude: float
+    longitude: float
+    status_code: int
+    log: Optional[QueryLogResponse] = None
+    error: Optional[str] = None
+
+
+def is_no_cache(cache_control: Optional[str]) -> bool:
+    if not cache_control:
+        return False
+    directives = {directive.strip().split("=", 1)[0].lower() for directive in cache_control.split(",")}
+    return "no-cache" in directives or "no-store" in directives
 
 
 @app.get("/ping")
@@ -74,51 +184,383 @@ async def ping():
     return {"message": "pong"}
 
 
+@app.get("/ready")
+async def ready():
+    report = await startup_state.readiness()
+    if not report["ready"]:
+        return JSONResponse(report, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return report
+
+
 @app.post("/query", response_model=QueryLogResponse)
 async def process_query(
         query_data: QueryLogCreate,
+        cache_control: Optional[str] = Header(None),
         db: AsyncSession = Depends(get_db),
-        current_user: User = Depends(get_current_active_user)
+        current_user: User = Depends(get_rate_limited_user)
 ):
-    external_response = await call_external_api(
-        query_data.cadastral_number,
-        query_data.latitude,
-        query_data.longitude
-    )
+    with metrics.stage("process_query", "upstream"):
+        external_response = await call_external_api(
+            query_data.cadastral_number,
+            query_data.latitude,
+            query_data.longitude,
+            use_cache=not is_no_cache(cache_control)
+        )
+
+    if QUERY_LOG_WRITE_BEHIND:
+        # The row is persisted by the background writer, so its id is not known yet.
+        row = {
+            "cadastral_number": query_data.cadastral_number,
+            "latitude": query_data.latitude,
+            "longitude": query_data.longitude,
+            **response_columns(external_response),
+            "created_at": datetime.utcnow(),
+        }
+        with metrics.stage("process_query", "enqueue_log"):
+            await query_log_writer.enqueue(row)
+        if FAST_JSON_ENABLED:
+            return FastJSONResponse({"id": None, **row})
+        return row
 
     log_entry = QueryLog(
         cadastral_number=query_data.cadastral_number,
         latitude=query_data.latitude,
         longitude=query_data.longitude,
-        external_server_response=str(external_response),
+        **response_columns(external_response),
     )
-    db.add(log_entry)
-    await db.commit()
-    await db.refresh(log_entry)
+    with metrics.stage("process_query", "db_commit"):
+        db.add(log_entry)
+        await db.commit()
+        await db.refresh(log_entry)
 
+    if FAST_JSON_ENABLED:
+        return FastJSONResponse(query_log_to_dict(log_entry))
     return log_entry
 
 
+@app.post("/query/batch", response_model=List[QueryBatchItemResult])
+async def process_query_batch(
+        items: List[QueryLogCreate],
+        cache_control: Optional[str] = Header(None),
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_active_user)
+):
+    if len(items) > QUERY_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"Batch is limited to {QUERY_BATCH_MAX_ITEMS} items")
+
+    unique_items: dict[tuple, QueryLogCreate] = {}
+    for item in items:
+        unique_items.setdefault(batch_item_key(item), item)
+    check_rate_limit(current_user, cost=len(unique_items))
+
+    use_cache = not is_no_cache(cache_control)
+    semaphore = asyncio.Semaphore(QUERY_BATCH_CONCURRENCY)
+    # One multi-get up front, so already-cached items skip per-item cache round trips.
+    cached = await cached_lookups([(item.cadastral_number, item.latitude, item.longitude)
+                                   for item in unique_items.values()]) if use_cache else {}
+
+    async def lookup(item: QueryLogCreate):
+        cached_response = cached.get((item.cadastral_number, item.latitude, item.longitude))
+        if cached_response is not None:
+            return cached_response, None
+        async with semaphore:
+            try:
+                return await call_external_api(item.cadastral_number, item.latitude, item.longitude,
+                                               use_cache=use_cache), None
+            except HTTPException as e:
+                return None, e
+
+    lookups = await asyncio.gather(*(lookup(item) for item in unique_items.values()))
+    outcomes = dict(zip(unique_items.keys(), lookups))
+
+    rows = [
+        {
+            "cadastral_number": item.cadastral_number,
+            "latitude": item.latitude,
+            "longitude": item.longitude,
+            **response_columns(outcomes[key][0]),
+        }
+        for key, item in unique_items.items()
+        if outcomes[key][1] is None
+    ]
+    logs = {}
+    if rows:
+        # One transaction; SQLAlchemy batches the rows into multi-row INSERT ... RETURNING statements.
+        result = await db.scalars(insert(QueryLog).returning(QueryLog, sort_by_parameter_order=True), rows)
+        inserted = result.all()
+        await db.commit()
+        successful_keys = [key for key in unique_items if outcomes[key][1] is None]
+        logs = dict(zip(successful_keys, inserted))
+
+    results = []
+    for item in items:
+        key = batch_item_key(item)
+        error = outcomes[key][1]
+        results.append({
+            "cadastral_number": item.cadastral_number,
+            "latitude": item.latitude,
+            "longitude": item.longitude,
+            "status_code": error.status_code if error else status.HTTP_200_OK,
+            "log": logs.get(key),
+            "error": error.detail if error else None,
+        })
+    return results
+
+
+@app.post("/query/async", response_model=QueryJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_query_job(
+        query_data: QueryLogCreate,
+        response: Response,
+        cache_control: Optional[str] = Header(None),
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_rate_limited_user)
+):
+    job = await job_runner.submit(db, current_user.id, query_data.cadastral_number, query_data.latitude,
+                                  query_data.longitude, use_cache=not is_no_cache(cache_control))
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return job_to_dict(job)
+
+
+@app.get("/jobs/{job_id}", response_model=QueryJobResponse)
+async def get_query_job(
+        job_id: str,
+        wait: float = Query(0, ge=0, le=JOB_LONG_POLL_MAX_WAIT),
+        accept: Optional[str] = Header(None),
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_active_user)
+):
+    job = await db.get(QueryJob, job_id)
+    if job is None or (job.user_id != current_user.id and not current_user.is_superuser):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+
+    if accept and "text/event-stream" in accept:
+        return StreamingResponse(job_events(job_id), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache"})
+
+    # Long-poll: wake on local completion, re-read the row at least every poll interval for other workers.
+    deadline = time.monotonic() + wait
+    while job.status not in TERMINAL_STATUSES and (remaining := deadline - time.monotonic()) > 0:
+        # Ending the transaction returns the connection to the pool while this request waits.
+        await db.rollback()
+        await job_runner.wait_for_update(job_id, min(remaining, JOB_POLL_INTERVAL))
+        job = await db.get(QueryJob, job_id, populate_existing=True)
+        if job is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job_to_dict(job)
+
+
+def batch_item_key(item: QueryLogCreate) -> tuple:
+    return normalize_cadastral_number(item.cadastral_number), item.latitude, item.longitude
+
+
 @app.get("/history", response_model=List[QueryLogResponse])
 async def get_query_history(
+        response: Response,
         cadastral_number: Optional[str] = None,
-        db: AsyncSession = Depends(get_db),
+        limit: int = Query(HISTORY_DEFAULT_LIMIT, ge=1, le=HISTORY_MAX_LIMIT),
+        cursor: Optional[str] = None,
+        status_filter: Optional[str] = Query(None, alias="status"),
+        min_value: Optional[float] = None,
+        max_value: Optional[float] = None,
+        if_none_match: Optional[str] = Header(None),
+        db: AsyncSession = Depends(get_read_db),
         current_user: User = Depends(get_current_active_user)
 ):
-    statement = select(QueryLog).order_by(QueryLog.created_at.desc())
-    if cadastral_number:
-        statement = statement.where(QueryLog.cadastral_number == cadastral_number)
-
-    result = await db.execute(statement)
-    logs = result.scalars().all()
+    if FAST_JSON_ENABLED:
+        # Plain column tuples skip ORM identity-map hydration and per-object pydantic validation.
+        statement = history_statement(query_log_columns_select(), cadastral_number, cursor, status_filter,
+                                      min_value, max_value).limit(limit + 1)
+        logs = (await db.execute(statement)).all()
+    else:
+        statement = history_statement(select(QueryLog), cadastral_number, cursor, status_filter,
+                                      min_value, max_value).limit(limit + 1)
+        logs = (await db.execute(statement)).scalars().all()
 
-    if not logs and cadastral_number:
+    if not logs and cadastral_number and not cursor and status_filter is None \
+            and min_value is None and max_value is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f"No history found for cadastral number: {cadastral_number}")
 
+    has_more = len(logs) > limit
+    if has_more:
+        logs = logs[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(logs[-1].created_at, logs[-1].id)
+
+    if HISTORY_ETAG_ENABLED:
+        # Tagged from the page itself, so a match costs no extra query and skips serialization and transfer.
+        response.headers["ETag"] = history_etag(logs, has_more, limit, cadastral_number, cursor, status_filter,
+                                                min_value, max_value)
+        response.headers["Cache-Control"] = "private, no-cache"
+        if etag_matches(if_none_match, response.headers["ETag"]):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=dict(response.headers))
+
+    if FAST_JSON_ENABLED:
+        # Returning a Response bypasses the injected one, so carry its headers over.
+        fast_response = FastJSONResponse(rows_to_dicts(logs))
+        fast_response.headers.update(response.headers)
+        return fast_response
     return logs
 
 
+@app.get("/history/stream")
+async def stream_query_history(
+        cadastral_number: Optional[str] = None,
+        cursor: Optional[str] = None,
+        status_filter: Optional[str] = Query(None, alias="status"),
+        min_value: Optional[float] = None,
+        max_value: Optional[float] = None,
+        current_user: User = Depends(get_current_active_user)
+):
+    statement = history_statement(select(QueryLog), cadastral_number, cursor, status_filter, min_value, max_value) \
+        .execution_options(yield_per=HISTORY_STREAM_CHUNK_SIZE)
+
+    async def generate_ndjson():
+        # The stream outlives the request dependencies, so it opens its own session.
+        async with read_session_maker() as session:
+            result = await session.stream_scalars(statement)
+            async for logs in result.partitions():
+                yield "".join(json.dumps(query_log_to_dict(log)) + "\n" for log in logs)
+
+    return StreamingResponse(generate_ndjson(), media_type="application/x-ndjson")
+
+
+@app.get("/history/stats", response_model=HistoryStatsResponse)
+async def get_query_history_stats(
+        cadastral_number: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        db: AsyncSession = Depends(get_read_db),
+        current_user: User = Depends(get_current_active_user)
+):
+    # Served from the hourly rollups, which outlive the raw partitions dropped by retention.
+    until = until or datetime.utcnow()
+    since = since or until - timedelta(hours=HISTORY_STATS_DEFAULT_HOURS)
+    if since >= until:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="since must be earlier than until")
+
+    query_count = func.sum(QueryLogRollup.query_count)
+    statement = select(QueryLogRollup.bucket, QueryLogRollup.status, query_count) \
+        .where(QueryLogRollup.bucket >= since, QueryLogRollup.bucket < until) \
+        .group_by(QueryLogRollup.bucket, QueryLogRollup.status) \
+        .order_by(QueryLogRollup.bucket, QueryLogRollup.status)
+    if cadastral_number:
+        statement = statement.where(QueryLogRollup.cadastral_number == cadastral_number)
+    rows = (await db.execute(statement)).all()
+
+    by_status = {}
+    for row in rows:
+        by_status[row.status] = by_status.get(row.status, 0) + row[2]
+    return {
+        "cadastral_number": cadastral_number,
+        "since": since,
+        "until": until,
+        "total": sum(by_status.values()),
+        "by_status": by_status,
+        "buckets": [{"bucket": row.bucket, "status": row.status, "query_count": row[2]} for row in rows],
+    }
+
+
+@app.get("/history/nearby", response_model=List[NearbyQueryLogResponse])
+async def get_nearby_query_history(
+        lat: float = Query(..., ge=-90, le=90),
+        lon: float = Query(..., ge=-180, le=180),
+        radius_m: float = Query(..., gt=0, le=NEARBY_MAX_RADIUS_M),
+        limit: int = Query(HISTORY_DEFAULT_LIMIT, ge=1, le=HISTORY_MAX_LIMIT),
+        db: AsyncSession = Depends(get_read_db),
+        current_user: User = Depends(get_current_active_user)
+):
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_m)
+    conditions = [QueryLog.latitude.between(min_lat, max_lat)]
+    if -180 <= min_lon and max_lon <= 180:
+        conditions.append(QueryLog.longitude.between(min_lon, max_lon))
+
+    cells = covering_geohashes(lat, lon, radius_m)
+    if cells:
+        # Each cell is a prefix range on the geohash index; "~" sorts after every base32 character.
+        conditions.append(or_(*(and_(QueryLog.geohash >= cell, QueryLog.geohash < cell + "~") for cell in cells)))
+
+    statement = select(QueryLog).where(*conditions) \
+        .order_by(QueryLog.created_at.desc(), QueryLog.id.desc()).limit(NEARBY_MAX_CANDIDATES)
+    candidates = (await db.execute(statement)).scalars().all()
+
+    nearby = []
+    for log in candidates:
+        distance = haversine_m(lat, lon, log.latitude, log.longitude)
+        if distance <= radius_m:
+            nearby.append((distance, log))
+    # Nearest first; candidates arrive newest first and the sort is stable, so equal distances stay newest first.
+    nearby.sort(key=lambda match: match[0])
+    return [{**query_log_to_dict(log), "distance_m": round(distance, 1)} for distance, log in nearby[:limit]]
+
+
+def query_log_to_dict(log: QueryLog) -> dict:
+    return {
+        "id": log.id,
+        "cadastral_number": log.cadastral_number,
+        "latitude": log.latitude,
+        "longitude": log.longitude,
+        "external_server_response": log.external_server_response,
+        "created_at": log.created_at.isoformat(),
+        "external_response": log.external_response,
+        "status": log.status,
+        "address": log.address,
+        "value": log.value,
+    }
+
+
+@app.get("/admin/stats")
+async def get_service_stats(current_user: User = Depends(get_current_admin_user)):
+    return {
+        "external_api": external_api_stats(),
+        "lookup_cache": lookup_cache.stats(),
+        "principal_cache": principal_cache.stats(),
+        "token_claims_cache": token_claims_cache.stats(),
+        "revocation_list": revocation_list.stats(),
+        "query_log_writer": query_log_writer.stats(),
+        "admission": admission_stats(),
+        "jobs": job_runner.stats(),
+        "profiling": profiling.profile_store.stats(),
+    }
+
+
+@app.get("/admin/profiles")
+async def get_profiles(
+        format: str = Query("collapsed", pattern="^(collapsed|json)$"),
+        reset: bool = False,
+        current_user: User = Depends(get_current_admin_user)
+):
+    if not profiling.PROFILING_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profiling is disabled")
+    store = profiling.profile_store
+    if format == "collapsed":
+        # Folded stacks, ready for flamegraph.pl or speedscope.
+        response = PlainTextResponse(store.collapsed(),
+                                     headers={"Content-Disposition": 'attachment; filename="profiles.folded"'})
+    else:
+        response = {"stats": store.stats(), "sql": store.top_sql(), "profiles": list(store.profiles)}
+    if reset:
+        store.clear()
+    return response
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Metrics are disabled")
+    body, content_type = metrics.render_latest()
+    return Response(content=body, media_type=content_type)
+
+
+metrics.register_stats_collector("external_api", external_api_stats)
+metrics.register_stats_collector("lookup_cache", lookup_cache.stats)
+metrics.register_stats_collector("principal_cache", principal_cache.stats)
+metrics.register_stats_collector("query_log_writer", query_log_writer.stats)
+metrics.register_stats_collector("admission", admission_stats)
+metrics.register_stats_collector("jobs", job_runner.stats)
+metrics.register_stats_collector("profiling", profiling.profile_store.stats)
+
+
 async def create_db_and_tables():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
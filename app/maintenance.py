@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import os
+import re
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import env_bool, env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+QUERY_LOGS_PARTITION_INTERVAL = os.environ.get("QUERY_LOGS_PARTITION_INTERVAL", "month")
+QUERY_LOGS_PARTITIONS_AHEAD = env_int("QUERY_LOGS_PARTITIONS_AHEAD", 3)
+QUERY_LOGS_RETENTION_DAYS = env_int("QUERY_LOGS_RETENTION_DAYS", 365)
+QUERY_LOGS_DROP_EXPIRED = env_bool("QUERY_LOGS_DROP_EXPIRED", True)
+QUERY_LOG_ROLLUP_LOOKBACK_HOURS = env_int("QUERY_LOG_ROLLUP_LOOKBACK_HOURS", 2)
+MAINTENANCE_ENABLED = env_bool("MAINTENANCE_ENABLED", True)
+MAINTENANCE_INTERVAL = env_float("MAINTENANCE_INTERVAL", 300.0)
+
+# pg_try_advisory_lock key, so only one worker/instance runs maintenance at a time.
+MAINTENANCE_LOCK_KEY = 7270014
+
+PARTITION_NAME_RE = re.compile(r"^query_logs_p(\d{4})_(\d{2})(?:_(\d{2}))?$")
+
+# Status of a logged lookup; rows not yet backfilled by migration 0006 only carry it in the legacy repr.
+ROLLUP_STATUS_SQL = "coalesce(status, substring(external_server_response from '''status'': ''([^'']*)'''), 'Unknown')"
+
+
+def partition_start(moment: datetime, interval: str) -> datetime:
+    if interval == "day":
+        return datetime(moment.year, moment.month, moment.day)
+    return datetime(moment.year, moment.month, 1)
+
+
+def next_partition_start(start: datetime, interval: str) -> datetime:
+    if interval == "day":
+        return start + timedelta(days=1)
+    return datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+
+def partition_name(start: datetime, interval: str) -> str:
+    if interval == "day":
+        return f"query_logs_p{start:%Y_%m_%d}"
+    return f"query_logs_p{start:%Y_%m}"
+
+
+def parse_partition_name(name: str) -> tuple[datetime, datetime] | None:
+    match = PARTITION_NAME_RE.match(name)
+    if match is None:
+        return None
+    year, month, day = match.groups()
+    if day is None:
+        start = datetime(int(year), int(month), 1)
+        return start, next_partition_start(start, "month")
+    start = datetime(int(year), int(month), int(day))
+    return start, next_partition_start(start, "day")
+
+
+def create_partition_statements(since: datetime, until: datetime, interval: str,
+                                parent: str = "query_logs") -> list[str]:
+    statements = []
+    start = partition_start(since, interval)
+    while start <= until:
+        end = next_partition_start(start, interval)
+        statements.append(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(start, interval)} PARTITION OF {parent} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+        start = end
+    return statements
+
+
+def future_horizon(now: datetime, interval: str, ahead: int) -> datetime:
+    start = partition_start(now, interval)
+    for _ in range(ahead):
+        start = next_partition_start(start, interval)
+    return start
+
+
+async def is_partitioned(conn) -> bool:
+    result = await conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('query_logs'))"
+    ))
+    return bool(result.scalar())
+
+
+async def ensure_future_partitions(conn, now: datetime) -> int:
+    statements = create_partition_statements(
+        now, future_horizon(now, QUERY_LOGS_PARTITION_INTERVAL, QUERY_LOGS_PARTITIONS_AHEAD),
+        QUERY_LOGS_PARTITION_INTERVAL,
+    )
+    for statement in statements:
+        await conn.execute(text(statement))
+    return len(statements)
+
+
+async def expire_partitions(conn, now: datetime) -> list[str]:
+    if QUERY_LOGS_RETENTION_DAYS <= 0:
+        return []
+    cutoff = now - timedelta(days=QUERY_LOGS_RETENTION_DAYS)
+    result = await conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass('query_logs')"
+    ))
+    expired = []
+    for name in result.scalars():
+        bounds = parse_partition_name(name)
+        if bounds is None or bounds[1] > cutoff:
+            continue
+        await conn.execute(text(f"ALTER TABLE query_logs DETACH PARTITION {name}"))
+        if QUERY_LOGS_DROP_EXPIRED:
+            await conn.execute(text(f"DROP TABLE {name}"))
+        expired.append(name)
+    return expired
+
+
+async def refresh_rollups(conn) -> int:
+    # Re-aggregate from the last rolled-up hour (minus a lookback for late rows) so the upsert stays idempotent.
+    since = (await conn.execute(text(
+        "SELECT coalesce(max(bucket) - make_interval(hours => :lookback), "
+        "date_trunc('hour', (SELECT min(created_at) FROM query_logs))) FROM query_log_rollups_hourly"
+    ), {"lookback": QUERY_LOG_ROLLUP_LOOKBACK_HOURS})).scalar()
+    if since is None:
+        return 0
+    result = await conn.execute(text(
+        "INSERT INTO query_log_rollups_hourly (bucket, cadastral_number, status, query_count) "
+        f"SELECT date_trunc('hour', created_at), cadastral_number, {ROLLUP_STATUS_SQL}, count(*) "
+        "FROM query_logs WHERE created_at >= :since GROUP BY 1, 2, 3 "
+        "ON CONFLICT (bucket, cadastral_number, status) DO UPDATE SET query_count = EXCLUDED.query_count"
+    ), {"since": since})
+    return result.rowcount
+
+
+async def run_maintenance(engine: AsyncEngine, now: datetime | None = None) -> dict:
+    if engine.dialect.name != "postgresql":
+        return {"skipped": "maintenance requires PostgreSQL"}
+    now = now or datetime.utcnow()
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        locked = (await conn.execute(text("SELECT pg_try_advisory_lock(:key)"),
+                                     {"key": MAINTENANCE_LOCK_KEY})).scalar()
+        if not locked:
+            return {"skipped": "another worker holds the maintenance lock"}
+        try:
+            report = {"partitions_ensured": 0, "partitions_expired": []}
+            if await is_partitioned(conn):
+                report["partitions_ensured"] = await ensure_future_partitions(conn, now)
+                report["partitions_expired"] = await expire_partitions(conn, now)
+            report["rollup_rows"] = await refresh_rollups(conn)
+            return report
+        finally:
+            await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+
+
+async def maintenance_loop(engine: AsyncEngine) -> None:
+    while True:
+        try:
+            report = await run_maintenance(engine)
+            logger.info("query_logs maintenance: %s", report)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("query_logs maintenance failed")
+        await asyncio.sleep(MAINTENANCE_INTERVAL)
+
+
+if __name__ == "__main__":
+    from app.db import engine
+
+    async def main():
+        print(await run_maintenance(engine))
+        await engine.dispose()
+
+    asyncio.run(main())
@@ -0,0 +1,162 @@
+import time
+from contextlib import nullcontext
+
+from app.config import env_bool
+
+METRICS_ENABLED = env_bool("METRICS_ENABLED", True)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NOOP = nullcontext()
+
+registry = None
+_request_latency = None
+_stage_latency = None
+_upstream_responses = None
+_pool_checkout_wait = None
+_pool_in_use = None
+_pool_size = None
+_stage_children: dict[tuple[str, str], object] = {}
+
+
+class _StageTimer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+
+def stage(operation: str, name: str):
+    if not METRICS_ENABLED:
+        return _NOOP
+    child = _stage_children.get((operation, name))
+    if child is None:
+        child = _stage_children[(operation, name)] = _stage_latency.labels(operation, name)
+    return _StageTimer(child)
+
+
+def record_upstream_response(status: str) -> None:
+    if METRICS_ENABLED:
+        _upstream_responses.labels(status).inc()
+
+
+def instrument_pool(pool, name: str = "primary") -> None:
+    if not METRICS_ENABLED or getattr(pool, "_metrics_instrumented", False):
+        return
+    connect = pool.connect
+    checkout_wait = _pool_checkout_wait.labels(name)
+
+    # Pool events fire only once a connection has been handed out, so queueing is timed around the public
+    # Pool.connect(), which every Engine.connect() goes through.
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            checkout_wait.observe(time.perf_counter() - started)
+
+    pool.connect = timed_connect
+    pool._metrics_instrumented = True
+    if hasattr(pool, "checkedout"):
+        _pool_in_use.labels(name).set_function(pool.checkedout)
+    if hasattr(pool, "size"):
+        _pool_size.labels(name).set_function(pool.size)
+
+
+def register_stats_collector(name: str, stats_fn) -> None:
+    """Export a component's stats() dict as gauges named '<name>_<key>' (nested dicts are flattened)."""
+    if METRICS_ENABLED:
+        registry.register(_StatsCollector(name, stats_fn))
+
+
+class _StatsCollector:
+    def __init__(self, name: str, stats_fn):
+        self.name = name
+        self.stats_fn = stats_fn
+
+    def collect(self):
+        from prometheus_client.core import GaugeMetricFamily
+
+        for key, value in _flatten(self.name, self.stats_fn()):
+            yield GaugeMetricFamily(key, f"{self.name} statistic", value=value)
+
+
+def _flatten(prefix: str, stats: dict):
+    for key, value in stats.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            yield from _flatten(name, value)
+        elif isinstance(value, bool):
+            yield name, float(value)
+        elif isinstance(value, (int, float)):
+            yield name, float(value)
+        elif key == "state":
+            # Circuit breaker state: 0 closed, 1 half-open, 2 open.
+            yield name, float({"closed": 0, "half_open": 1, "open": 2}.get(value, -1))
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            # Label by route template, not raw path, to keep label cardinality bounded.
+            path = getattr(route, "path", "unmatched")
+            _request_latency.labels(scope["method"], path, str(status_code)) \
+                .observe(time.perf_counter() - started)
+
+
+def render_latest() -> tuple[bytes, str]:
+    from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+if METRICS_ENABLED:
+    from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+
+    registry = CollectorRegistry()
+    _request_latency = Histogram(
+        "http_request_duration_seconds", "HTTP request latency by route",
+        ["method", "route", "status"], buckets=LATENCY_BUCKETS, registry=registry,
+    )
+    _stage_latency = Histogram(
+        "stage_duration_seconds", "Latency of individual stages inside request handlers",
+        ["operation", "stage"], buckets=LATENCY_BUCKETS, registry=registry,
+    )
+    _upstream_responses = Counter(
+        "external_api_responses", "External API responses by HTTP status (or 'error')",
+        ["status"], registry=registry,
+    )
+    _pool_checkout_wait = Histogram(
+        "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled DB connection",
+        ["pool"], buckets=LATENCY_BUCKETS, registry=registry,
+    )
+    _pool_in_use = Gauge("db_pool_connections_in_use", "Connections currently checked out of the pool",
+                         ["pool"], registry=registry)
+    _pool_size = Gauge("db_pool_size", "Configured pool size", ["pool"], registry=registry)
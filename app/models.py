@@ -1,10 +1,44 @@
 from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.orm import declarative_base, Mapped, mapped_column
-from sqlalchemy import Integer, String, DateTime, func, Boolean, Float
+from sqlalchemy import Integer, String, DateTime, func, Boolean, Float, Index, JSON
+from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime
 
+from app.geo import GEOHASH_PRECISION, encode_geohash
+
 Base = declarative_base(cls=AsyncAttrs)
 
+
+def parse_response_repr(text: str | None) -> dict | None:
+    """Recover the upstream response from the legacy repr() stored in external_server_response."""
+    if not text:
+        return None
+    import ast
+
+    try:
+        response = ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return None
+    return response if isinstance(response, dict) else None
+
+
+def response_columns(response: dict) -> dict:
+    """Column values for an upstream response: the structured payload, its promoted fields and the legacy repr."""
+    return {
+        "external_server_response": str(response),
+        "external_response": response,
+        "status": response.get("status"),
+        "address": response.get("address"),
+        "value": response.get("value"),
+    }
+
+
+def _geohash_default(context) -> str:
+    # Context-sensitive default, so ORM adds and Core bulk/executemany inserts all get a geohash.
+    params = context.get_current_parameters()
+    return encode_geohash(params["latitude"], params["longitude"])
+
+
 class QueryLog(Base):
     __tablename__ = "query_logs"
 
@@ -14,6 +48,49 @@ class QueryLog(Base):
     longitude: Mapped[float] = mapped_column(Float, nullable=False)
     external_server_response: Mapped[str] = mapped_column(String, nullable=True)
     created_at: Mapped[DateTime] = mapped_column(DateTime, nullable=False, server_default=func.now())
+    # Byte-wise collation keeps geohash prefix ranges contiguous in the btree index.
+    geohash: Mapped[str] = mapped_column(
+        String(GEOHASH_PRECISION).with_variant(String(GEOHASH_PRECISION, collation="C"), "postgresql"),
+        nullable=True, index=True, default=_geohash_default,
+    )
+    external_response: Mapped[dict] = mapped_column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)
+    status: Mapped[str] = mapped_column(String(32), nullable=True)
+    address: Mapped[str] = mapped_column(String, nullable=True)
+    value: Mapped[float] = mapped_column(Float, nullable=True, index=True)
+
+
+# Serve /history ordered by (created_at DESC, id DESC), with and without a cadastral_number filter.
+Index("ix_query_logs_cadastral_number_created_at_id",
+      QueryLog.cadastral_number, QueryLog.created_at.desc(), QueryLog.id.desc())
+Index("ix_query_logs_created_at_id", QueryLog.created_at, QueryLog.id)
+Index("ix_query_logs_status_created_at_id", QueryLog.status, QueryLog.created_at.desc(), QueryLog.id.desc())
+
+
+class QueryJob(Base):
+    __tablename__ = "query_jobs"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    cadastral_number: Mapped[str] = mapped_column(String, nullable=False)
+    latitude: Mapped[float] = mapped_column(Float, nullable=False)
+    longitude: Mapped[float] = mapped_column(Float, nullable=False)
+    use_cache: Mapped[bool] = mapped_column(Boolean, nullable=False, default=True)
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="pending")
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    query_log_id: Mapped[int] = mapped_column(Integer, nullable=True)
+    external_server_response: Mapped[str] = mapped_column(String, nullable=True)
+    status_code: Mapped[int] = mapped_column(Integer, nullable=True)
+    error: Mapped[str] = mapped_column(String, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    started_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    lease_expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+
+
+# Workers claim the oldest pending job and sweep running jobs whose lease has expired.
+Index("ix_query_jobs_status_created_at", QueryJob.status, QueryJob.created_at)
+
 
 class User(Base):
     __tablename__ = "users"
@@ -24,4 +101,40 @@ class User(Base):
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     is_superuser: Mapped[bool] = mapped_column(Boolean, default=False)
     is_verified: Mapped[bool] = mapped_column(Boolean, default=False)
-    created_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now())
\ No newline at end of file
+    created_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now())
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    jti: Mapped[str] = mapped_column(String(32), primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    # Session id shared by every token rotated from the same login.
+    session_id: Mapped[str] = mapped_column(String(32), nullable=False, index=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+    used_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    revoked_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+
+    # A single access token's jti, or a session id revoking every token of that session.
+    token_id: Mapped[str] = mapped_column(String(32), primary_key=True)
+    # When the last token carrying this id expires; the row is useless (and purged) after that.
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+    revoked_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+class QueryLogRollup(Base):
+    __tablename__ = "query_log_rollups_hourly"
+
+    bucket: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    cadastral_number: Mapped[str] = mapped_column(String, primary_key=True)
+    status: Mapped[str] = mapped_column(String, primary_key=True)
+    query_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+Index("ix_query_log_rollups_hourly_cadastral_number_bucket",
+      QueryLogRollup.cadastral_number, QueryLogRollup.bucket)
@@ -0,0 +1,61 @@
+import base64
+import hashlib
+import json
+from datetime import datetime
+
+from fastapi import HTTPException, status
+from sqlalchemy import Select, literal, tuple_
+
+from app.models import QueryLog
+
+
+def encode_cursor(created_at: datetime, log_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), log_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, log_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(log_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def history_statement(statement: Select, cadastral_number: str | None = None,
+                      cursor: str | None = None, status: str | None = None,
+                      min_value: float | None = None, max_value: float | None = None) -> Select:
+    statement = statement.order_by(QueryLog.created_at.desc(), QueryLog.id.desc())
+    if cadastral_number:
+        statement = statement.where(QueryLog.cadastral_number == cadastral_number)
+    if status:
+        statement = statement.where(QueryLog.status == status)
+    if min_value is not None:
+        statement = statement.where(QueryLog.value >= min_value)
+    if max_value is not None:
+        statement = statement.where(QueryLog.value <= max_value)
+    if cursor:
+        created_at, log_id = decode_cursor(cursor)
+        # Row-value comparison matches the (created_at, id) ordering and can use a composite index.
+        statement = statement.where(tuple_(QueryLog.created_at, QueryLog.id) < tuple_(
+            literal(created_at, QueryLog.created_at.type), literal(log_id, QueryLog.id.type)
+        ))
+    return statement
+
+
+def history_etag(page: list, has_more: bool, *params) -> str:
+    """Validator for a /history page, derived from the rows it returned and the request parameters."""
+    # Weak: the same rows may be rendered by either JSON serializer.
+    rows = [[log.id, log.created_at] for log in page]
+    raw = json.dumps([rows, has_more, *params], default=str, separators=(",", ":")).encode()
+    return f'W/"{hashlib.blake2b(raw, digest_size=12).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
@@ -0,0 +1,305 @@
+import asyncio
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime
+
+from sqlalchemy import event
+
+from app.config import env_bool, env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+PROFILING_ENABLED = env_bool("PROFILING_ENABLED", False)
+# Fraction of requests whose stacks are sampled; requests with PROFILING_HEADER are sampled too (admins only).
+PROFILING_SAMPLE_RATE = env_float("PROFILING_SAMPLE_RATE", 0.01)
+PROFILING_HEADER = os.environ.get("PROFILING_HEADER", "X-Profile").lower().encode()
+PROFILING_INTERVAL = env_float("PROFILING_INTERVAL", 0.005)
+# Requests slower than this are logged with their SQL and stacks; 0 disables slow-request logging.
+PROFILING_SLOW_REQUEST_MS = env_float("PROFILING_SLOW_REQUEST_MS", 1000.0)
+PROFILING_MAX_SQL_PER_REQUEST = env_int("PROFILING_MAX_SQL_PER_REQUEST", 100)
+PROFILING_MAX_PROFILES = env_int("PROFILING_MAX_PROFILES", 50)
+PROFILING_MAX_STACKS = env_int("PROFILING_MAX_STACKS", 20000)
+SQL_TEXT_LIMIT = 1000
+
+_current_profile: ContextVar["RequestProfile | None"] = ContextVar("current_profile", default=None)
+
+
+class RequestProfile:
+    """Everything captured for one request: wall-clock stack samples (if sampled) and its SQL."""
+
+    def __init__(self, method: str, path: str, sampled: bool, requested_only: bool, root_frame):
+        self.method = method
+        self.path = path
+        self.route = path
+        self.status_code = 500
+        self.sampled = sampled
+        # Sampled only because of the header, which still has to be backed by an admin principal.
+        self.requested_only = requested_only
+        self.is_admin = False
+        self.root_frame = root_frame
+        self.started_at = datetime.utcnow()
+        self.duration = 0.0
+        self.samples: Counter[str] = Counter()
+        self.sql: list[dict] = []
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+
+    def record_sql(self, statement: str, duration: float, executemany: bool) -> None:
+        self.sql_count += 1
+        self.sql_seconds += duration
+        if len(self.sql) < PROFILING_MAX_SQL_PER_REQUEST:
+            self.sql.append({"statement": statement[:SQL_TEXT_LIMIT], "duration_ms": round(duration * 1000, 3),
+                             "executemany": executemany})
+
+    def stacks(self) -> dict[str, int]:
+        """Samples keyed by collapsed stack, rooted at a "METHOD /route" frame so routes aggregate separately."""
+        root = f"{self.method} {self.route}"
+        return {f"{root};{stack}" if stack else root: count for stack, count in self.samples.items()}
+
+    def collapsed(self) -> list[str]:
+        return [f"{stack} {count}" for stack, count in sorted(self.stacks().items(), key=lambda item: -item[1])]
+
+    def to_dict(self) -> dict:
+        return {
+            "method": self.method,
+            "route": self.route,
+            "path": self.path,
+            "status_code": self.status_code,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration * 1000, 3),
+            "sampled": self.sampled,
+            "samples": sum(self.samples.values()),
+            "stacks": self.collapsed(),
+            "sql_count": self.sql_count,
+            "sql_ms": round(self.sql_seconds * 1000, 3),
+            "sql": self.sql,
+        }
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+
+def _coroutine_chain(coro) -> tuple[list, object]:
+    """Frames of a suspended await chain, outermost first, and the object the innermost one waits on."""
+    frames = []
+    awaited = coro
+    while awaited is not None:
+        frame = getattr(awaited, "cr_frame", None) or getattr(awaited, "gi_frame", None) \
+            or getattr(awaited, "ag_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        awaited = getattr(awaited, "cr_await", None) or getattr(awaited, "gi_yieldfrom", None) \
+            or getattr(awaited, "ag_await", None)
+    return frames, awaited
+
+
+def task_stack(task: asyncio.Task, thread_frame, root_frame) -> str:
+    """Collapsed wall-clock stack of a task below root_frame, whether it is running or awaiting."""
+    coro = task.get_coro()
+    if getattr(coro, "cr_running", False) and thread_frame is not None:
+        # Running right now: the loop thread's real stack also shows synchronous (CPU-bound) frames.
+        frames = []
+        frame = thread_frame
+        while frame is not None and frame is not root_frame:
+            frames.append(frame)
+            frame = frame.f_back
+        if frame is root_frame:
+            return ";".join(_frame_label(frame) for frame in reversed(frames))
+    frames, awaited = _coroutine_chain(coro)
+    if root_frame in frames:
+        frames = frames[frames.index(root_frame) + 1:]
+    labels = [_frame_label(frame) for frame in frames]
+    if awaited is not None:
+        # "await future" suspends on the future's iterator (FutureIter in the C implementation).
+        labels.append(f"[awaiting {type(awaited).__name__.removesuffix('Iter')}]")
+    return ";".join(labels)
+
+
+class StackSampler:
+    """Background thread that periodically samples the stacks of the tasks serving profiled requests."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._active: dict[asyncio.Task, tuple[RequestProfile, int]] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def add(self, task: asyncio.Task, profile: RequestProfile) -> None:
+        with self._lock:
+            self._active[task] = (profile, threading.get_ident())
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+            self._thread.start()
+        self._wakeup.set()
+
+    def remove(self, task: asyncio.Task) -> None:
+        with self._lock:
+            self._active.pop(task, None)
+
+    def _run(self) -> None:
+        while True:
+            if not self._active:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            # Sampling under the lock means a profile is never written to after remove() returns.
+            with self._lock:
+                for task, (profile, thread_id) in self._active.items():
+                    try:
+                        profile.samples[task_stack(task, frames.get(thread_id), profile.root_frame)] += 1
+                    except Exception:
+                        # The stack can change under us while it is walked; skip that sample.
+                        continue
+
+
+class ProfileStore:
+    """Aggregated stacks and SQL of profiled requests, plus the most recent (and slow) profiles."""
+
+    def __init__(self, max_profiles: int, max_stacks: int):
+        self.max_stacks = max_stacks
+        self.stacks: Counter[str] = Counter()
+        self.sql: dict[str, list] = {}
+        self.profiles: deque[dict] = deque(maxlen=max_profiles)
+        self.profiled_requests = 0
+        self.samples = 0
+        self.dropped_samples = 0
+        self.slow_requests = 0
+
+    def add(self, profile: RequestProfile, slow: bool) -> None:
+        self.profiled_requests += 1
+        for stack, count in profile.stacks().items():
+            self.samples += count
+            if stack in self.stacks or len(self.stacks) < self.max_stacks:
+                self.stacks[stack] += count
+            else:
+                self.dropped_samples += count
+        for query in profile.sql:
+            totals = self.sql.get(query["statement"])
+            if totals is None:
+                if len(self.sql) >= self.max_stacks:
+                    continue
+                totals = self.sql[query["statement"]] = [0, 0.0]
+            totals[0] += 1
+            totals[1] += query["duration_ms"]
+        if slow:
+            self.slow_requests += 1
+        self.profiles.append(profile.to_dict())
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_sql(self, limit: int = 50) -> list[dict]:
+        ranked = sorted(self.sql.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [{"statement": statement, "count": count, "total_ms": round(total, 3)}
+                for statement, (count, total) in ranked]
+
+    def clear(self) -> None:
+        self.stacks.clear()
+        self.sql.clear()
+        self.profiles.clear()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": PROFILING_ENABLED,
+            "profiled_requests": self.profiled_requests,
+            "samples": self.samples,
+            "dropped_samples": self.dropped_samples,
+            "slow_requests": self.slow_requests,
+            "distinct_stacks": len(self.stacks),
+        }
+
+
+sampler = StackSampler(PROFILING_INTERVAL)
+profile_store = ProfileStore(PROFILING_MAX_PROFILES, PROFILING_MAX_STACKS)
+
+
+def note_principal(user) -> None:
+    """Called once the request's user is known; profiling on request is honoured for admins only."""
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.is_admin = bool(user.is_superuser)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is not None:
+        conn.info.setdefault("profiling_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    started = conn.info.get("profiling_started")
+    if profile is not None and started:
+        profile.record_sql(statement, time.perf_counter() - started.pop(), executemany)
+
+
+def instrument_engine(engine) -> None:
+    sync_engine = engine.sync_engine
+    if not PROFILING_ENABLED or event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def log_slow_request(profile: RequestProfile) -> None:
+    sql = "\n".join(f"  {query['duration_ms']:.1f} ms  {query['statement']}" for query in profile.sql)
+    stacks = "\n".join(f"  {line}" for line in profile.collapsed())
+    logger.warning("slow request %s %s: %.1f ms, status %d, %d SQL statements (%.1f ms)\nSQL:\n%s\nstacks:\n%s",
+                   profile.method, profile.path, profile.duration * 1000, profile.status_code, profile.sql_count,
+                   profile.sql_seconds * 1000, sql or "  -", stacks or "  (not sampled)")
+
+
+class ProfilingMiddleware:
+    """Captures SQL for every request and wall-clock stacks for sampled ones; logs slow requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        requested = any(name == PROFILING_HEADER for name, _ in scope["headers"])
+        sampled_randomly = random.random() < PROFILING_SAMPLE_RATE
+        profile = RequestProfile(scope["method"], scope["path"], requested or sampled_randomly,
+                                 requested and not sampled_randomly, sys._getframe())
+        token = _current_profile.set(profile)
+        task = asyncio.current_task()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        if profile.sampled:
+            sampler.add(task, profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if profile.sampled:
+                sampler.remove(task)
+            profile.duration = time.perf_counter() - started
+            _current_profile.reset(token)
+            profile.route = getattr(scope.get("route"), "path", "unmatched")
+            if profile.requested_only and not profile.is_admin:
+                # The header is only honoured for admins; drop what was sampled for anyone else.
+                profile.sampled = False
+                profile.samples.clear()
+            slow = 0 < PROFILING_SLOW_REQUEST_MS <= profile.duration * 1000
+            if slow:
+                log_slow_request(profile)
+            if profile.sampled or slow:
+                profile_store.add(profile, slow)
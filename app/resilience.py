@@ -0,0 +1,194 @@
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    After failure_threshold failures in a row the breaker opens and rejects calls
+    for reset_timeout seconds, then lets a limited number of probe calls through
+    (half-open). A successful probe closes it again, a failed one re-opens it.
+    Probes that end without an outcome are handed back with release(); any that
+    are never settled expire after reset_timeout, so the breaker cannot stay
+    half-open with no probe slots.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self.half_open_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+
+    def allow_request(self) -> bool:
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self.half_open_calls = 0
+            self.half_open_at = time.monotonic()
+        if self.state == HALF_OPEN:
+            if self.half_open_calls >= self.half_open_max_calls \
+                    and time.monotonic() - self.half_open_at >= self.reset_timeout:
+                # The outstanding probes never reported back; let new ones through.
+                self.half_open_calls = 0
+                self.half_open_at = time.monotonic()
+            if self.half_open_calls >= self.half_open_max_calls:
+                self.rejected += 1
+                return False
+            self.half_open_calls += 1
+        return True
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self.state = CLOSED
+
+    def release(self) -> None:
+        """Hand back an admitted call that ended without an outcome, e.g. because it was cancelled."""
+        if self.state == HALF_OPEN and self.half_open_calls > 0:
+            self.half_open_calls -= 1
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.times_opened += 1
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def retry_after(self) -> float:
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+class LatencyTracker:
+    def __init__(self, window: int):
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, percent: float) -> float | None:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(len(ordered) * percent / 100))
+        return ordered[index]
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+
+    def try_acquire(self, cost: float = 1) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True
+        return False
+
+    def retry_after(self, cost: float = 1) -> float:
+        return max(0.0, cost - self.tokens) / self.rate if self.rate else 1.0
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class ConcurrencyLimiter:
+    """Caps in-flight work and sheds load instead of queueing without bound.
+
+    When every slot is taken, a new caller is rejected straight away if the wait
+    queue is full or if recent queue waits (p90) exceed shed_wait; otherwise it
+    waits up to queue_timeout for a slot.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float, shed_wait: float,
+                 window: int = 200):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.shed_wait = shed_wait
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.wait_times = LatencyTracker(window)
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected: dict[str, int] = {"queue_full": 0, "queue_timeout": 0, "latency": 0}
+
+    def _reject(self, reason: str):
+        self.rejected[reason] += 1
+        return Overloaded(reason)
+
+    @asynccontextmanager
+    async def slot(self):
+        if not self._semaphore.locked():
+            # A free slot is taken without suspending, so the check and the acquire cannot race.
+            await self._semaphore.acquire()
+            self.wait_times.record(0.0)
+        else:
+            if self.queued >= self.max_queue:
+                raise self._reject("queue_full")
+            recent_wait = self.wait_times.percentile(90)
+            if self.shed_wait > 0 and recent_wait is not None and recent_wait > self.shed_wait:
+                raise self._reject("latency")
+            self.queued += 1
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise self._reject("queue_timeout")
+            finally:
+                self.queued -= 1
+            self.wait_times.record(time.monotonic() - started)
+        self.admitted += 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "queue_wait_p90": self.wait_times.percentile(90) or 0.0,
+        }
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    # "Full jitter": spreads retries from many clients across the whole backoff window.
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
@@ -0,0 +1,204 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.auth import ACCESS_TOKEN_EXPIRE_MINUTES
+from app.config import env_float, env_int
+from app.db import async_session_maker
+from app.models import RefreshToken, RevokedToken
+
+logger = logging.getLogger(__name__)
+
+REVOCATION_SYNC_INTERVAL = env_float("REVOCATION_SYNC_INTERVAL", 5.0)
+# Full reloads drop expired ids (a Bloom filter cannot delete) and grow the filter if it filled up.
+REVOCATION_REBUILD_INTERVAL = env_float("REVOCATION_REBUILD_INTERVAL", 3600.0)
+REVOCATION_BLOOM_CAPACITY = env_int("REVOCATION_BLOOM_CAPACITY", 100000)
+REVOCATION_BLOOM_ERROR_RATE = env_float("REVOCATION_BLOOM_ERROR_RATE", 0.001)
+# Incremental syncs re-read this many seconds behind the newest revocation seen, which covers clock skew
+# between workers and transactions committing out of order.
+REVOCATION_SYNC_OVERLAP = env_float("REVOCATION_SYNC_OVERLAP", 60.0)
+
+
+class BloomFilter:
+    """Set membership in a fixed bit array: no false negatives, false positives at about `error_rate`."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        # Double hashing: all k positions come from the two halves of a single digest.
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        step = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * step) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str) -> None:
+        added = False
+        for position in self._positions(item):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    """Revoked token and session ids, held by every worker as a Bloom filter over the revoked_tokens table.
+
+    Checks cost a few hashes and no query unless the filter matches, which it does for revoked ids and,
+    at the configured error rate, for others; a match is confirmed with a primary key lookup. Revocations
+    made in another worker are picked up by the periodic sync.
+    """
+
+    def __init__(self, session_maker: sessionmaker, capacity: int, error_rate: float, sync_interval: float,
+                 rebuild_interval: float, sync_overlap: float):
+        self.session_maker = session_maker
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.rebuild_interval = rebuild_interval
+        self.sync_overlap = timedelta(seconds=sync_overlap)
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.loaded = False
+        self._synced_until: datetime | None = None
+        self._rebuilt_at: float | None = None
+        # Ids revoked here while a rebuild is reading the table, so the new filter does not miss them.
+        self._revoked_during_rebuild: list[str] | None = None
+        self._task: asyncio.Task | None = None
+        self.checks = 0
+        self.filter_hits = 0
+        self.false_positives = 0
+        self.syncs = 0
+        self.rebuilds = 0
+        self.sync_errors = 0
+
+    async def is_revoked(self, db: AsyncSession, *token_ids: str | None) -> bool:
+        self.checks += 1
+        suspects = [token_id for token_id in token_ids if token_id and token_id in self.bloom]
+        if not suspects:
+            return False
+        self.filter_hits += 1
+        statement = select(RevokedToken.token_id).where(
+            RevokedToken.token_id.in_(suspects), RevokedToken.expires_at > datetime.utcnow()
+        ).limit(1)
+        revoked = (await db.execute(statement)).first() is not None
+        if not revoked:
+            self.false_positives += 1
+        return revoked
+
+    async def revoke(self, db: AsyncSession, token_id: str, expires_at: datetime) -> None:
+        """Record a revocation in the caller's transaction; this worker enforces it at once."""
+        await db.merge(RevokedToken(token_id=token_id, expires_at=expires_at, revoked_at=datetime.utcnow()))
+        self.bloom.add(token_id)
+        if self._revoked_during_rebuild is not None:
+            self._revoked_during_rebuild.append(token_id)
+
+    def _advance(self, rows) -> None:
+        for token_id, revoked_at in rows:
+            self.bloom.add(token_id)
+            if self._synced_until is None or revoked_at > self._synced_until:
+                self._synced_until = revoked_at
+
+    async def sync(self) -> int:
+        statement = select(RevokedToken.token_id, RevokedToken.revoked_at)
+        if self._synced_until is not None:
+            statement = statement.where(RevokedToken.revoked_at >= self._synced_until - self.sync_overlap)
+        async with self.session_maker() as session:
+            rows = (await session.execute(statement)).all()
+        self._advance(rows)
+        self.syncs += 1
+        return len(rows)
+
+    async def rebuild(self) -> int:
+        """Purge expired rows and reload the live ids into a freshly sized filter."""
+        now = datetime.utcnow()
+        self._revoked_during_rebuild = []
+        try:
+            async with self.session_maker() as session:
+                await session.execute(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+                await session.execute(delete(RefreshToken).where(RefreshToken.expires_at <= now))
+                await session.commit()
+                rows = (await session.execute(
+                    select(RevokedToken.token_id, RevokedToken.revoked_at).where(RevokedToken.expires_at > now)
+                )).all()
+            self.bloom = BloomFilter(max(self.capacity, 2 * len(rows)), self.error_rate)
+            self._synced_until = None
+            self._advance(rows)
+            for token_id in self._revoked_during_rebuild:
+                self.bloom.add(token_id)
+        finally:
+            self._revoked_during_rebuild = None
+        self.loaded = True
+        self._rebuilt_at = time.monotonic()
+        self.rebuilds += 1
+        return len(rows)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if self._rebuilt_at is None or time.monotonic() - self._rebuilt_at >= self.rebuild_interval:
+                    await self.rebuild()
+                else:
+                    await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.sync_errors += 1
+                logger.exception("revocation list sync failed")
+            await asyncio.sleep(self.sync_interval)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self.loaded,
+            "ids": self.bloom.count,
+            "capacity": self.bloom.capacity,
+            "filter_bytes": len(self.bloom.bits),
+            "hashes": self.bloom.hashes,
+            "checks": self.checks,
+            "filter_hits": self.filter_hits,
+            "false_positives": self.false_positives,
+            "syncs": self.syncs,
+            "rebuilds": self.rebuilds,
+            "sync_errors": self.sync_errors,
+        }
+
+
+revocation_list = RevocationList(async_session_maker, REVOCATION_BLOOM_CAPACITY, REVOCATION_BLOOM_ERROR_RATE,
+                                 REVOCATION_SYNC_INTERVAL, REVOCATION_REBUILD_INTERVAL, REVOCATION_SYNC_OVERLAP)
+
+
+async def revoke_session(db: AsyncSession, session_id: str) -> None:
+    """End a login session: its refresh tokens stop rotating and its access tokens stop authenticating."""
+    now = datetime.utcnow()
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.session_id == session_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=now)
+    )
+    # Access tokens issued up to now expire within their lifetime, after which the entry can go.
+    await revocation_list.revoke(db, session_id, now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
@@ -0,0 +1,47 @@
+import logging
+
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+
+from app.config import env_bool
+from app.models import QueryLog
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+FAST_JSON_REQUESTED = env_bool("FAST_JSON_ENABLED", False)
+FAST_JSON_ENABLED = FAST_JSON_REQUESTED and orjson is not None
+
+if FAST_JSON_REQUESTED and orjson is None:
+    logger.warning("FAST_JSON_ENABLED is set but orjson is not installed; using the default serializer")
+
+QUERY_LOG_COLUMNS = (
+    QueryLog.id,
+    QueryLog.cadastral_number,
+    QueryLog.latitude,
+    QueryLog.longitude,
+    QueryLog.external_server_response,
+    QueryLog.created_at,
+    QueryLog.external_response,
+    QueryLog.status,
+    QueryLog.address,
+    QueryLog.value,
+)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        # orjson writes naive datetimes in the same ISO format pydantic uses.
+        return orjson.dumps(content)
+
+
+def query_log_columns_select():
+    return select(*QUERY_LOG_COLUMNS)
+
+
+def rows_to_dicts(rows) -> list[dict]:
+    return [row._asdict() for row in rows]
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import AsyncExitStack
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app import IMPORT_STARTED
+from app.auth import PASSWORD_HASH_WORKERS, password_executor, pwd_context
+from app.config import env_bool, env_float, env_int
+from app.db import DB_POOL_SIZE, DB_READ_POOL_SIZE, engine, read_engine
+from app.external_api import EXTERNAL_API_MAX_KEEPALIVE_CONNECTIONS, get_http_client
+from app.models import QueryLog, User
+from app.pagination import history_statement
+from app.revocation import revocation_list
+from app.serialization import FAST_JSON_ENABLED, query_log_columns_select
+
+logger = logging.getLogger(__name__)
+
+STARTUP_WARMUP_ENABLED = env_bool("STARTUP_WARMUP_ENABLED", True)
+# Connections opened (and primed with the hot statements) per pool before the instance reports ready.
+WARMUP_DB_CONNECTIONS = env_int("WARMUP_DB_CONNECTIONS", DB_POOL_SIZE)
+WARMUP_READ_DB_CONNECTIONS = env_int("WARMUP_READ_DB_CONNECTIONS", DB_READ_POOL_SIZE)
+WARMUP_UPSTREAM_CONNECTIONS = env_int("WARMUP_UPSTREAM_CONNECTIONS", min(4, EXTERNAL_API_MAX_KEEPALIVE_CONNECTIONS))
+# Any response opens the keep-alive connection, so the default path does not need to exist upstream.
+WARMUP_UPSTREAM_PATH = os.environ.get("WARMUP_UPSTREAM_PATH", "/")
+WARMUP_TIMEOUT = env_float("WARMUP_TIMEOUT", 30.0)
+READY_CHECK_DB = env_bool("READY_CHECK_DB", True)
+READY_CHECK_TIMEOUT = env_float("READY_CHECK_TIMEOUT", 1.0)
+
+# Filter value matching no real row; only the statement text matters for the prepared statement caches.
+WARMUP_PROBE = "warm-up"
+
+
+def primary_statements() -> list:
+    # Same construction as load_principal, so the compiled and prepared statement caches get a hit.
+    return [select(User).where(User.email == WARMUP_PROBE)]
+
+
+def read_statements() -> list:
+    # LIMIT renders as a bind parameter, so any page size primes the same statement.
+    statements = [
+        history_statement(select(QueryLog)).limit(1),
+        history_statement(select(QueryLog), WARMUP_PROBE).limit(1),
+    ]
+    if FAST_JSON_ENABLED:
+        statements += [
+            history_statement(query_log_columns_select()).limit(1),
+            history_statement(query_log_columns_select(), WARMUP_PROBE).limit(1),
+        ]
+    return statements
+
+
+async def warm_engine(engine: AsyncEngine, connections: int, statements: list) -> int:
+    """Open `connections` pooled connections at once and run the hot statements on each of them."""
+    if connections <= 0:
+        return 0
+    async with AsyncExitStack() as stack:
+        # Held together, so the pool really grows to `connections` instead of reusing one connection.
+        opened = await asyncio.gather(*(stack.enter_async_context(engine.connect()) for _ in range(connections)))
+
+        async def prime(conn):
+            for statement in statements:
+                await conn.execute(statement)
+            await conn.rollback()
+
+        await asyncio.gather(*(prime(conn) for conn in opened))
+    return len(opened)
+
+
+async def warm_password_hashing() -> int:
+    # The first hash loads passlib's bcrypt backend and runs its self-test; one verify per worker starts
+    # every executor thread.
+    loop = asyncio.get_running_loop()
+    hashed = await loop.run_in_executor(password_executor, pwd_context.hash, WARMUP_PROBE)
+    await asyncio.gather(*(loop.run_in_executor(password_executor, pwd_context.verify, WARMUP_PROBE,
+                                                hashed) for _ in range(PASSWORD_HASH_WORKERS)))
+    return PASSWORD_HASH_WORKERS
+
+
+async def warm_upstream(connections: int) -> int:
+    # Concurrent requests each need their own connection, which then stays in the keep-alive pool.
+    client = get_http_client()
+    results = await asyncio.gather(*(client.head(WARMUP_UPSTREAM_PATH) for _ in range(connections)),
+                                   return_exceptions=True)
+    failures = [result for result in results if isinstance(result, Exception)]
+    if failures:
+        raise failures[0]
+    return len(results)
+
+
+async def ping_database() -> None:
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+class StartupState:
+    """Startup timings and warm-up results behind /ready."""
+
+    def __init__(self):
+        self.lifespan_started: float | None = None
+        self.lifespan_seconds: float | None = None
+        self.ready_at: float | None = None
+        self.warmed_up = False
+        self.stopping = False
+        self.steps: dict[str, dict] = {}
+
+    def lifespan_start(self) -> None:
+        self.lifespan_started = time.perf_counter()
+
+    def lifespan_ready(self) -> None:
+        self.lifespan_seconds = time.perf_counter() - self.lifespan_started
+
+    async def _step(self, name: str, coro) -> None:
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(coro, WARMUP_TIMEOUT)
+            self.steps[name] = {"ok": True, "warmed": result}
+        except Exception as e:
+            # A failed step only costs the first requests their lazy setup, so it does not block readiness.
+            logger.warning("warm-up step %s failed: %r", name, e)
+            self.steps[name] = {"ok": False, "error": repr(e)}
+        self.steps[name]["seconds"] = round(time.perf_counter() - started, 3)
+
+    async def warm_up(self) -> None:
+        if STARTUP_WARMUP_ENABLED:
+            steps = [
+                self._step("db", warm_engine(engine, WARMUP_DB_CONNECTIONS,
+                                             primary_statements() + ([] if read_engine is not engine
+                                                                     else read_statements()))),
+                self._step("password_hashing", warm_password_hashing()),
+                self._step("upstream", warm_upstream(WARMUP_UPSTREAM_CONNECTIONS)),
+            ]
+            if read_engine is not engine:
+                steps.append(self._step("read_db", warm_engine(read_engine, WARMUP_READ_DB_CONNECTIONS,
+                                                               read_statements())))
+            await asyncio.gather(*steps)
+        self.warmed_up = True
+        self.ready_at = time.perf_counter()
+        report = self.timings()
+        logger.info("startup: imports %.3fs, lifespan %.3fs, ready %.3fs after import",
+                    report["imports_seconds"], report["lifespan_seconds"] or 0, report["ready_seconds"])
+
+    def timings(self) -> dict:
+        return {
+            "imports_seconds": round(self.lifespan_started - IMPORT_STARTED, 3) if self.lifespan_started else None,
+            "lifespan_seconds": round(self.lifespan_seconds, 3) if self.lifespan_seconds is not None else None,
+            "ready_seconds": round(self.ready_at - IMPORT_STARTED, 3) if self.ready_at else None,
+        }
+
+    async def readiness(self) -> dict:
+        # Until the revocation list is loaded, revoked tokens would still be accepted.
+        checks = {"warm_up": self.warmed_up, "revocation_list": revocation_list.loaded,
+                  "accepting": not self.stopping}
+        if READY_CHECK_DB and self.warmed_up and not self.stopping:
+            try:
+                await asyncio.wait_for(ping_database(), READY_CHECK_TIMEOUT)
+                checks["db"] = True
+            except Exception as e:
+                logger.warning("readiness check: database unavailable: %r", e)
+                checks["db"] = False
+        return {"ready": all(checks.values()), "checks": checks, "startup": self.timings(), "warm_up": self.steps}
+
+
+startup_state = StartupState()
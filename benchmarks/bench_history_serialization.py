@@ -0,0 +1,81 @@
+"""GET /history with 10k-row pages: ORM + pydantic + stdlib json vs. column tuples + orjson.
+
+Usage: python -m benchmarks.bench_history_serialization [--rows 10000] [--repeat 10]
+
+Runs the app in-process against a throwaway SQLite database (needs aiosqlite), so the numbers
+isolate hydration/validation/encoding cost rather than database or network latency.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+WORK_DIR = tempfile.mkdtemp(prefix="bench_history_")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{WORK_DIR}/bench.db")
+os.environ.setdefault("HISTORY_MAX_LIMIT", "100000")
+os.environ.setdefault("MAINTENANCE_ENABLED", "false")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app import main as app_main  # noqa: E402
+from app.db import engine  # noqa: E402
+from app.dependencies import get_current_active_user  # noqa: E402
+from app.models import Base, QueryLog, User  # noqa: E402
+
+
+async def seed(rows: int) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        started = datetime(2026, 1, 1)
+        await conn.execute(insert(QueryLog), [
+            {
+                "cadastral_number": f"77:01:{number % 500:07d}:{number}",
+                "latitude": 55.0 + number * 1e-5,
+                "longitude": 37.0 + number * 1e-5,
+                "external_server_response": str({"status": "Success", "value": number}),
+                "created_at": started + timedelta(seconds=number),
+            }
+            for number in range(rows)
+        ])
+
+
+def measure(client: TestClient, fast: bool, rows: int, repeat: int) -> dict:
+    app_main.FAST_JSON_ENABLED = fast
+    client.get("/history", params={"limit": rows})
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get("/history", params={"limit": rows})
+        timings.append(time.perf_counter() - started)
+        assert response.status_code == 200 and len(response.json()) == rows
+    return {
+        "p50_ms": statistics.median(timings) * 1000,
+        "min_ms": min(timings) * 1000,
+        "rows_per_second": rows / statistics.median(timings),
+        "bytes": len(response.content),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    asyncio.run(seed(args.rows))
+    user = User(id=1, email="bench@example.com", is_active=True)
+    app_main.app.dependency_overrides[get_current_active_user] = lambda: user
+    with TestClient(app_main.app) as client:
+        for name, fast in (("orm + pydantic (before)", False), ("columns + orjson (after)", True)):
+            result = measure(client, fast, args.rows, args.repeat)
+            print(f"{name:>25}: p50={result['p50_ms']:8.1f} ms  min={result['min_ms']:8.1f} ms  "
+                  f"{result['rows_per_second']:9.0f} rows/s  body={result['bytes']} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Event-loop lag during a login storm, with bcrypt inline vs. in the password thread pool.
+
+Usage: python -m benchmarks.bench_login_event_loop_lag [--logins 40] [--concurrency 20]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.auth import get_password_hash, pwd_context, verify_and_update_password_async
+
+TICK_SECONDS = 0.005
+
+
+async def measure_lag(stop: asyncio.Event, samples: list[float]) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        samples.append(time.perf_counter() - started - TICK_SECONDS)
+
+
+async def inline_login(password: str, hashed: str) -> None:
+    pwd_context.verify_and_update(password, hashed)
+
+
+async def pooled_login(password: str, hashed: str) -> None:
+    await verify_and_update_password_async(password, hashed)
+
+
+async def run_storm(login, logins: int, concurrency: int, password: str, hashed: str) -> dict:
+    samples: list[float] = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(measure_lag(stop, samples))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one_login():
+        async with semaphore:
+            await login(password, hashed)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+
+    samples.sort()
+    return {
+        "logins_per_second": logins / elapsed,
+        "lag_p50_ms": statistics.median(samples) * 1000 if samples else 0.0,
+        "lag_p99_ms": samples[int(len(samples) * 0.99) - 1] * 1000 if samples else 0.0,
+        "lag_max_ms": samples[-1] * 1000 if samples else 0.0,
+        "ticks": len(samples),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    password = "benchmark-password"
+    hashed = get_password_hash(password)
+    print(f"bcrypt hash: {hashed[:7]}...  logins={args.logins} concurrency={args.concurrency}")
+    for name, login in (("inline (before)", inline_login), ("thread pool (after)", pooled_login)):
+        result = asyncio.run(run_storm(login, args.logins, args.concurrency, password, hashed))
+        print(f"{name:>20}: {result['logins_per_second']:7.1f} logins/s  "
+              f"lag p50={result['lag_p50_ms']:7.1f} ms  p99={result['lag_p99_ms']:7.1f} ms  "
+              f"max={result['lag_max_ms']:7.1f} ms  ticks={result['ticks']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Compare two loadgen reports and flag latency/throughput regressions.
+
+Usage: python -m benchmarks.compare baseline.json candidate.json [--threshold 0.10]
+Exits with status 1 when any scenario regresses by more than the threshold.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def relative_change(before: float, after: float) -> float:
+    if before == 0:
+        return 0.0 if after == 0 else float("inf")
+    return (after - before) / before
+
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> list[str]:
+    regressions = []
+    print(f"{'scenario':<18} {'metric':<16} {'baseline':>12} {'candidate':>12} {'change':>9}")
+    for name, before in baseline["scenarios"].items():
+        after = candidate["scenarios"].get(name)
+        if after is None:
+            continue
+        rows = [
+            ("throughput_rps", before["throughput_rps"], after["throughput_rps"], True),
+            ("p50_ms", before["latency_ms"]["p50"], after["latency_ms"]["p50"], False),
+            ("p99_ms", before["latency_ms"]["p99"], after["latency_ms"]["p99"], False),
+            ("error_rate", before["error_rate"], after["error_rate"], False),
+        ]
+        for metric, old, new, higher_is_better in rows:
+            change = relative_change(old, new)
+            worse = -change if higher_is_better else change
+            flag = " !" if worse > threshold else ""
+            print(f"{name:<18} {metric:<16} {old:>12.3f} {new:>12.3f} {change:>+8.1%}{flag}")
+            if worse > threshold:
+                regressions.append(f"{name}.{metric}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("candidate", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args()
+
+    regressions = compare(json.loads(args.baseline.read_text()), json.loads(args.candidate.read_text()),
+                          args.threshold)
+    if regressions:
+        print(f"regressions: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""Reproducible load test for the cadastral service.
+
+Starts mock_external_server and app.main:app with uvicorn, runs a fixed set of
+scenarios against them and writes a JSON report that benchmarks/compare.py can
+diff between commits.
+
+Usage:
+    python -m benchmarks.loadgen --output benchmarks/results/$(git rev-parse --short HEAD).json
+
+DATABASE_URL selects the database (PostgreSQL recommended); without it a
+throwaway SQLite file is used as a stand-in (requires aiosqlite).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+HOT_NUMBERS = ["123456789012", "987654321098"]
+BENCH_EMAIL = "loadgen@example.com"
+BENCH_PASSWORD = "loadgen-password"
+
+
+def percentile(ordered: list[float], percent: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(len(ordered) * percent / 100) - 1))
+    return ordered[index]
+
+
+def summarize(latencies: list[float], statuses: dict[int, int], elapsed: float) -> dict:
+    ordered = sorted(latencies)
+    total = len(ordered)
+    errors = sum(count for code, count in statuses.items() if code >= 500 or code == 0)
+    return {
+        "requests": total,
+        "duration_seconds": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.fmean(ordered) * 1000, 3) if ordered else 0.0,
+            "p50": round(percentile(ordered, 50) * 1000, 3),
+            "p90": round(percentile(ordered, 90) * 1000, 3),
+            "p99": round(percentile(ordered, 99) * 1000, 3),
+            "max": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+        },
+        "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+        "error_rate": round(errors / total, 4) if total else 0.0,
+    }
+
+
+async def run_closed_loop(make_request, requests: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    statuses: dict[int, int] = {}
+    counter = iter(range(requests))
+
+    async def worker():
+        for sequence in counter:
+            started = time.perf_counter()
+            try:
+                status_code = await make_request(sequence)
+            except httpx.HTTPError:
+                status_code = 0
+            latencies.append(time.perf_counter() - started)
+            statuses[status_code] = statuses.get(status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, statuses, time.perf_counter() - started)
+
+
+def query_body(cadastral_number: str) -> dict:
+    return {"cadastral_number": cadastral_number, "latitude": 55.7558, "longitude": 37.6173}
+
+
+async def scenario_cold_cache(client: httpx.AsyncClient, headers: dict, args) -> dict:
+    run_id = random.randrange(10 ** 6)
+
+    async def make_request(sequence: int) -> int:
+        response = await client.post("/query", json=query_body(f"cold-{run_id}-{sequence}"), headers=headers)
+        return response.status_code
+
+    return await run_closed_loop(make_request, args.requests, args.concurrency)
+
+
+async def scenario_hot_cache(client: httpx.AsyncClient, headers: dict, args) -> dict:
+    for number in HOT_NUMBERS:
+        await client.post("/query", json=query_body(number), headers=headers)
+
+    async def make_request(sequence: int) -> int:
+        number = HOT_NUMBERS[sequence % len(HOT_NUMBERS)]
+        response = await client.post("/query", json=query_body(number), headers=headers)
+        return response.status_code
+
+    return await run_closed_loop(make_request, args.requests, args.concurrency)
+
+
+async def scenario_mixed(client: httpx.AsyncClient, headers: dict, args) -> dict:
+    rng = random.Random(42)
+
+    async def make_request(sequence: int) -> int:
+        if rng.random() < args.write_ratio:
+            response = await client.post("/query", json=query_body(rng.choice(HOT_NUMBERS)), headers=headers)
+        else:
+            params = {"limit": 50}
+            if rng.random() < 0.5:
+                params["cadastral_number"] = rng.choice(HOT_NUMBERS)
+            response = await client.get("/history", params=params, headers=headers)
+        return response.status_code
+
+    return await run_closed_loop(make_request, args.requests, args.concurrency)
+
+
+async def scenario_login_storm(client: httpx.AsyncClient, headers: dict, args) -> dict:
+    async def make_request(sequence: int) -> int:
+        response = await client.post("/login", data={"username": BENCH_EMAIL, "password": BENCH_PASSWORD})
+        return response.status_code
+
+    return await run_closed_loop(make_request, args.login_requests, args.concurrency)
+
+
+SCENARIOS = {
+    "cold_cache": scenario_cold_cache,
+    "hot_cache": scenario_hot_cache,
+    "mixed_read_write": scenario_mixed,
+    "login_storm": scenario_login_storm,
+}
+
+
+async def wait_until_up(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                # /ready answers 503 until the app has warmed up.
+                if (await client.get(url)).status_code < 500:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout} seconds")
+
+
+async def create_schema(database_url: str) -> None:
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from app.models import Base
+
+    engine = create_async_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    await engine.dispose()
+
+
+def start_server(target: str, port: int, env: dict, log_path: Path) -> subprocess.Popen:
+    log = open(log_path, "w")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", target, "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> dict:
+    database_url = os.environ.get("DATABASE_URL") or f"sqlite+aiosqlite:///{args.workdir / 'loadgen.db'}"
+    await create_schema(database_url)
+
+    env = {
+        **os.environ,
+        "DATABASE_URL": database_url,
+        "EXTERNAL_API_URL": f"http://127.0.0.1:{args.mock_port}",
+        "DB_ECHO": "false",
+        # A single benchmark user would otherwise be throttled by the per-user rate limit.
+        "RATE_LIMIT_ENABLED": os.environ.get("RATE_LIMIT_ENABLED", "false"),
+    }
+    processes = [
+        start_server("mock_external_server.main:app", args.mock_port, env, args.workdir / "mock.log"),
+        start_server("app.main:app", args.app_port, env, args.workdir / "app.log"),
+    ]
+    try:
+        await wait_until_up(f"http://127.0.0.1:{args.mock_port}/docs")
+        await wait_until_up(f"http://127.0.0.1:{args.app_port}/ready")
+
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.app_port}", limits=limits,
+                                     timeout=30) as client:
+            await client.post("/register", json={"email": BENCH_EMAIL, "password": BENCH_PASSWORD})
+            login = await client.post("/login", data={"username": BENCH_EMAIL, "password": BENCH_PASSWORD})
+            login.raise_for_status()
+            headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+            results = {}
+            for name in args.scenarios:
+                print(f"running {name}...", file=sys.stderr)
+                results[name] = await SCENARIOS[name](client, headers, args)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+    return {
+        "meta": {
+            "git_revision": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": database_url.split("://", 1)[0],
+            "requests": args.requests,
+            "login_requests": args.login_requests,
+            "concurrency": args.concurrency,
+            "write_ratio": args.write_ratio,
+        },
+        "scenarios": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=2000, help="requests per scenario")
+    parser.add_argument("--login-requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="share of writes in mixed_read_write")
+    parser.add_argument("--app-port", type=int, default=8100)
+    parser.add_argument("--mock-port", type=int, default=8101)
+    parser.add_argument("--workdir", type=Path, default=ROOT / "benchmarks" / ".work")
+    parser.add_argument("--output", type=Path, help="write the JSON report here (stdout otherwise)")
+    args = parser.parse_args()
+    args.workdir.mkdir(parents=True, exist_ok=True)
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text + "\n")
+        print(f"report written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from sqlalchemy import select
+
+from app import metrics
+from app.cache import TTLCache
+from app.external_api import lookup_cache_key
+from app.models import QueryLog
+from app.pagination import decode_cursor, encode_cursor, history_statement
+
+
+def test_cache_hit(benchmark):
+    cache = TTLCache(max_size=10000)
+    for number in range(10000):
+        cache.set(str(number), {"status": "Success"}, ttl=300)
+    benchmark(cache.get, "5000")
+
+
+def test_cache_set_with_eviction(benchmark):
+    cache = TTLCache(max_size=1000)
+    keys = iter(range(10 ** 9))
+    benchmark(lambda: cache.set(next(keys), {"status": "Success"}, ttl=300))
+
+
+def test_cache_get_or_load_hit(benchmark):
+    cache = TTLCache(max_size=100)
+    cache.set("key", {"status": "Success"}, ttl=300)
+    loop = asyncio.new_event_loop()
+
+    async def loader():
+        return {"status": "Success"}
+
+    benchmark(lambda: loop.run_until_complete(cache.get_or_load("key", loader, lambda value: 300)))
+    loop.close()
+
+
+def test_lookup_cache_key(benchmark):
+    benchmark(lookup_cache_key, " 77:01:0001001:1234 ", 55.7558, 37.6173)
+
+
+def test_cursor_round_trip(benchmark):
+    created_at = datetime(2026, 1, 1, 12, 30, 15, 123456)
+    benchmark(lambda: decode_cursor(encode_cursor(created_at, 123456789)))
+
+
+def test_history_statement_build(benchmark):
+    cursor = encode_cursor(datetime(2026, 1, 1), 100)
+    benchmark(lambda: history_statement(select(QueryLog), "123456789012", cursor).limit(101))
+
+
+def test_stage_timer_overhead(benchmark):
+    def timed():
+        with metrics.stage("bench", "noop"):
+            pass
+
+    benchmark(timed)
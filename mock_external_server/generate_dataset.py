@@ -0,0 +1,38 @@
+"""Write a synthetic cadastral dataset for the mock server.
+
+Usage: python generate_dataset.py --count 1000000 --output dataset.jsonl
+Then start the mock with MOCK_DATASET_PATH=dataset.jsonl.
+"""
+import argparse
+import json
+import random
+
+
+def cadastral_number(index: int) -> str:
+    # District:zone:block:parcel, the same shape as real Russian cadastral numbers.
+    return f"{index % 90 + 1:02d}:{index // 90 % 100:02d}:{index // 9000 % 10000000:07d}:{index % 9973 + 1}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--not-found-share", type=float, default=0.0,
+                        help="share of records stored with status NotFound")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="dataset.jsonl")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with open(args.output, "w") as f:
+        for index in range(args.count):
+            record = {
+                "cadastral_number": cadastral_number(index),
+                "address": f"Synthetic Street, {index}",
+                "value": round(rng.lognormvariate(14.5, 0.6), 2),
+                "status": "NotFound" if rng.random() < args.not_found_share else "Success",
+            }
+            f.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,13 @@
+import asyncio
+import csv
+import json
+import os
+import random
+import time
+from typing import List, Optional
+
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel, Field
-from typing import Optional
 import uvicorn
 
 
@@ -18,34 +25,148 @@ class ExternalAPIResponse(BaseModel):
     value: Optional[float] = None
 
 
+class MockConfig(BaseModel):
+    latency_distribution: str = Field("none", pattern="^(none|fixed|normal|long_tail)$")
+    latency_ms: float = 0.0
+    latency_stddev_ms: float = 0.0
+    long_tail_probability: float = Field(0.0, ge=0, le=1)
+    long_tail_ms: float = 1000.0
+    error_rate: float = Field(0.0, ge=0, le=1)
+    error_status: int = 503
+    timeout_rate: float = Field(0.0, ge=0, le=1)
+    timeout_seconds: float = 30.0
+    rate_limit_rps: float = 0.0
+    rate_limit_burst: int = 0
+
+
+class MockConfigUpdate(BaseModel):
+    latency_distribution: Optional[str] = Field(None, pattern="^(none|fixed|normal|long_tail)$")
+    latency_ms: Optional[float] = None
+    latency_stddev_ms: Optional[float] = None
+    long_tail_probability: Optional[float] = Field(None, ge=0, le=1)
+    long_tail_ms: Optional[float] = None
+    error_rate: Optional[float] = Field(None, ge=0, le=1)
+    error_status: Optional[int] = None
+    timeout_rate: Optional[float] = Field(None, ge=0, le=1)
+    timeout_seconds: Optional[float] = None
+    rate_limit_rps: Optional[float] = None
+    rate_limit_burst: Optional[int] = None
+
+
+BUILTIN_RECORDS = [
+    ExternalAPIResponse(cadastral_number="123456789012", address="Some Street, 123", value=1500000.50,
+                        status="Success"),
+    ExternalAPIResponse(cadastral_number="987654321098", address="Another Ave, 45", value=2000000.00,
+                        status="Success"),
+]
+
+
+def config_from_env() -> MockConfig:
+    values = {}
+    for name, field in MockConfig.__fields__.items():
+        raw = os.environ.get(f"MOCK_{name.upper()}")
+        if raw is not None and raw != "":
+            values[name] = raw
+    return MockConfig(**values)
+
+
+def load_dataset(path: Optional[str]) -> dict[str, ExternalAPIResponse]:
+    records = {record.cadastral_number: record for record in BUILTIN_RECORDS}
+    if not path:
+        return records
+    with open(path, newline="") as f:
+        if path.endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for row in rows:
+            record = ExternalAPIResponse(
+                cadastral_number=row["cadastral_number"],
+                address=row.get("address") or None,
+                value=float(row["value"]) if row.get("value") not in (None, "") else None,
+                status=row.get("status") or "Success",
+            )
+            records[record.cadastral_number] = record
+    return records
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+
+    def try_acquire(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def retry_after(self) -> float:
+        return (1 - self.tokens) / self.rate if self.rate else 1.0
+
+
 app = FastAPI()
 
+config = config_from_env()
+dataset = load_dataset(os.environ.get("MOCK_DATASET_PATH"))
+rate_limiter = TokenBucket(config.rate_limit_rps, config.rate_limit_burst or int(config.rate_limit_rps) or 1)
+stats = {"requests": 0, "errors_injected": 0, "timeouts_injected": 0, "rate_limited": 0}
+
 
 def generate_external_response(cadastral_number: str):
-    if cadastral_number == "123456789012":
-        return ExternalAPIResponse(
-            cadastral_number=cadastral_number,
-            address="Some Street, 123",
-            value=1500000.50,
-            status="Success"
-        )
-    elif cadastral_number == "987654321098":
-        return ExternalAPIResponse(
-            cadastral_number=cadastral_number,
-            address="Another Ave, 45",
-            value=2000000.00,
-            status="Success"
-        )
+    record = dataset.get(cadastral_number)
+    if record is not None:
+        return record
+    return ExternalAPIResponse(
+        cadastral_number=cadastral_number,
+        status="NotFound",
+        message="Cadastral number not found in mock data"
+    )
+
+
+def sample_latency() -> float:
+    if config.latency_distribution == "fixed":
+        latency_ms = config.latency_ms
+    elif config.latency_distribution == "normal":
+        latency_ms = random.gauss(config.latency_ms, config.latency_stddev_ms)
+    elif config.latency_distribution == "long_tail":
+        latency_ms = config.latency_ms
+        if random.random() < config.long_tail_probability:
+            # Pareto-shaped tail: most slow requests sit near long_tail_ms, a few go far beyond it.
+            latency_ms = config.long_tail_ms * random.paretovariate(3)
     else:
-        return ExternalAPIResponse(
-            cadastral_number=cadastral_number,
-            status="NotFound",
-            message="Cadastral number not found in mock data"
-        )
+        latency_ms = 0.0
+    return max(latency_ms, 0.0) / 1000
+
+
+async def simulate_upstream_behaviour() -> None:
+    stats["requests"] += 1
+    if config.rate_limit_rps > 0 and not rate_limiter.try_acquire():
+        stats["rate_limited"] += 1
+        raise HTTPException(status_code=429, detail="Rate limit exceeded",
+                            headers={"Retry-After": str(max(1, round(rate_limiter.retry_after())))})
+
+    latency = sample_latency()
+    if latency:
+        await asyncio.sleep(latency)
+
+    roll = random.random()
+    if roll < config.timeout_rate:
+        stats["timeouts_injected"] += 1
+        await asyncio.sleep(config.timeout_seconds)
+    elif roll < config.timeout_rate + config.error_rate:
+        stats["errors_injected"] += 1
+        raise HTTPException(status_code=config.error_status, detail="Injected upstream error")
 
 
 @app.post("/mock_query/", response_model=ExternalAPIResponse)
 async def handle_mock_query(request: ExternalQueryRequest):
+    await simulate_upstream_behaviour()
     response_data = generate_external_response(request.cadastral_number)
 
     if response_data.status == "NotFound":
@@ -54,5 +175,29 @@ async def handle_mock_query(request: ExternalQueryRequest):
     return response_data
 
 
+@app.post("/mock_query/batch/", response_model=List[ExternalAPIResponse])
+async def handle_mock_query_batch(requests: List[ExternalQueryRequest]):
+    await simulate_upstream_behaviour()
+    return [generate_external_response(request.cadastral_number) for request in requests]
+
+
+@app.get("/admin/config", response_model=MockConfig)
+async def get_mock_config():
+    return config
+
+
+@app.put("/admin/config", response_model=MockConfig)
+async def update_mock_config(update: MockConfigUpdate):
+    global config, rate_limiter
+    config = MockConfig(**{**config.dict(), **update.dict(exclude_unset=True)})
+    rate_limiter = TokenBucket(config.rate_limit_rps, config.rate_limit_burst or int(config.rate_limit_rps) or 1)
+    return config
+
+
+@app.get("/admin/stats")
+async def get_mock_stats():
+    return {**stats, "dataset_size": len(dataset)}
+
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("EXTERNAL_API_PORT", 8001)))
@@ -0,0 +1,61 @@
+import httpx
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+
+@pytest_asyncio.fixture
+async def api(tmp_path, monkeypatch):
+    """App client against a throwaway sqlite database, with the upstream lookup answered in-process.
+
+    Runs on the test's event loop without the lifespan, so no background workers start. The session
+    maker is exposed as `api.session_maker` and the upstream calls as `api.lookups`.
+    """
+    pytest.importorskip("aiosqlite")
+    from app import main
+    from app.db import get_db, get_read_db
+    from app.dependencies import principal_cache, token_claims_cache
+    from app.external_api import lookup_cache
+    from app.models import Base
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'api.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_maker = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def get_test_db():
+        async with session_maker() as session:
+            yield session
+
+    lookups = []
+
+    async def lookup(cadastral_number, latitude, longitude, use_cache=True):
+        lookups.append(cadastral_number)
+        return {"cadastral_number": cadastral_number, "address": "Some Street, 123", "value": 1500000.5,
+                "status": "Success"}
+
+    monkeypatch.setitem(main.app.dependency_overrides, get_db, get_test_db)
+    monkeypatch.setitem(main.app.dependency_overrides, get_read_db, get_test_db)
+    monkeypatch.setattr(main, "read_session_maker", session_maker)
+    monkeypatch.setattr(main, "call_external_api", lookup)
+    for cache in (principal_cache, token_claims_cache, lookup_cache):
+        cache.clear()
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        client.session_maker = session_maker
+        client.lookups = lookups
+        yield client
+    await engine.dispose()
+
+
+@pytest.fixture
+def login(api):
+    """Register a user through the API and return the /login response body."""
+    async def register_and_login(email: str, password: str = "testpassword123") -> dict:
+        assert (await api.post("/register", json={"email": email, "password": password})).status_code == 200
+        response = await api.post("/login", data={"username": email, "password": password})
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    return register_and_login
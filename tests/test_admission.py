@@ -0,0 +1,131 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app import admission, external_api
+from app.models import User
+from app.resilience import CircuitBreaker, ConcurrencyLimiter, Overloaded
+
+
+@pytest.fixture(autouse=True)
+def fresh_buckets(monkeypatch):
+    monkeypatch.setattr(admission, "_buckets", type(admission._buckets)())
+    monkeypatch.setattr(admission, "RATE_LIMIT_TIERS", {"default": (1.0, 3), "admin": (0.0, 100)})
+    monkeypatch.setattr(admission, "rate_limit_counters",
+                        {tier: {"allowed": 0, "limited": 0} for tier in ("default", "admin")})
+
+
+def test_rate_limit_is_per_user_and_per_tier():
+    alice = User(email="alice@example.com", is_superuser=False)
+    bob = User(email="bob@example.com", is_superuser=False)
+    admin = User(email="admin@example.com", is_superuser=True)
+
+    for _ in range(3):
+        admission.check_rate_limit(alice)
+    with pytest.raises(HTTPException) as exc_info:
+        admission.check_rate_limit(alice)
+    assert exc_info.value.status_code == 429
+    assert exc_info.value.headers["Retry-After"] == "1"
+
+    admission.check_rate_limit(bob)
+    for _ in range(50):
+        admission.check_rate_limit(admin)
+    assert admission.rate_limit_counters["default"] == {"allowed": 4, "limited": 1}
+
+
+def test_batch_larger_than_the_burst_is_rejected_without_spending_tokens():
+    carol = User(email="carol@example.com", is_superuser=False)
+
+    for _ in range(2):
+        with pytest.raises(HTTPException) as exc_info:
+            admission.check_rate_limit(carol, cost=1000)
+        assert exc_info.value.status_code == 413
+        assert "at most 3" in exc_info.value.detail
+
+    admission.check_rate_limit(carol, cost=3)
+    with pytest.raises(HTTPException) as exc_info:
+        admission.check_rate_limit(carol, cost=4)
+    assert exc_info.value.status_code == 413
+    with pytest.raises(HTTPException) as exc_info:
+        admission.check_rate_limit(carol)
+    assert exc_info.value.status_code == 429
+    assert admission.rate_limit_counters["default"] == {"allowed": 1, "limited": 4}
+
+
+@pytest.mark.asyncio
+async def test_limiter_sheds_when_queue_is_full_or_wait_times_out():
+    limiter = ConcurrencyLimiter(max_concurrency=1, max_queue=1, queue_timeout=0.05, shed_wait=0)
+    release = asyncio.Event()
+
+    async def hold():
+        async with limiter.slot():
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+
+    with pytest.raises(Overloaded) as exc_info:
+        async with limiter.slot():
+            pass
+    assert exc_info.value.reason == "queue_full"
+
+    with pytest.raises(Overloaded) as exc_info:
+        await waiter
+    assert exc_info.value.reason == "queue_timeout"
+
+    release.set()
+    await holder
+    assert limiter.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_overloaded_upstream_call_becomes_503(monkeypatch):
+    limiter = ConcurrencyLimiter(max_concurrency=1, max_queue=0, queue_timeout=1, shed_wait=0)
+    monkeypatch.setattr(admission, "upstream_limiter", limiter)
+    started = asyncio.Event()
+
+    async def slow_call():
+        started.set()
+        await asyncio.sleep(0.05)
+        return {"status": "Success"}
+
+    first = asyncio.create_task(admission.admit_upstream_call(slow_call))
+    await started.wait()
+    with pytest.raises(HTTPException) as exc_info:
+        await admission.admit_upstream_call(slow_call)
+    assert exc_info.value.status_code == 503
+    assert "Retry-After" in exc_info.value.headers
+    assert await first == {"status": "Success"}
+
+
+@pytest.mark.asyncio
+async def test_upstream_slot_is_released_during_retry_backoff(monkeypatch):
+    limiter = ConcurrencyLimiter(max_concurrency=1, max_queue=0, queue_timeout=1, shed_wait=0)
+    monkeypatch.setattr(admission, "upstream_limiter", limiter)
+    monkeypatch.setattr(external_api, "external_api_breaker", CircuitBreaker(failure_threshold=5, reset_timeout=60))
+    monkeypatch.setattr(external_api, "backoff_delay", lambda *args: 0.1)
+    monkeypatch.setattr(external_api, "LOOKUP_CACHE_ENABLED", False)
+    first_attempt_failed = asyncio.Event()
+    responses = [503, 200]
+    slots_in_use = []
+
+    async def post_lookup(payload):
+        slots_in_use.append(limiter.stats()["in_flight"])
+        code = responses.pop(0)
+        if code == 503:
+            first_attempt_failed.set()
+        return httpx.Response(code, json={"status": "Success"}, request=httpx.Request("POST", "http://upstream"))
+
+    monkeypatch.setattr(external_api, "post_lookup", post_lookup)
+    lookup = asyncio.create_task(external_api.call_external_api("1", 0, 0))
+    await first_attempt_failed.wait()
+    await asyncio.sleep(0.02)
+
+    assert limiter.stats()["in_flight"] == 0, "Backoff must not hold the upstream slot"
+    assert await admission.admit_upstream_call(lambda: asyncio.sleep(0, "other")) == "other"
+    assert await lookup == {"status": "Success"}
+    assert slots_in_use == [1, 1], "Each attempt runs in a slot of its own"
@@ -0,0 +1,99 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from app import auth
+from app.models import RefreshToken, RevokedToken
+from app.revocation import revocation_list
+
+
+def bearer(tokens: dict) -> dict:
+    return {"Authorization": f"Bearer {tokens['access_token']}"}
+
+
+async def login_again(api, email: str, password: str = "testpassword123") -> dict:
+    response = await api.post("/login", data={"username": email, "password": password})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+@pytest.mark.asyncio
+async def test_refresh_rotates_tokens_within_the_session(api, login):
+    tokens = await login("rotation@example.com")
+
+    response = await api.post("/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200, response.text
+    rotated = response.json()
+    assert rotated["refresh_token"] != tokens["refresh_token"]
+    assert (await api.get("/users/me", headers=bearer(rotated))).status_code == 200
+    assert (await api.get("/users/me", headers=bearer(tokens))).status_code == 200, \
+        "Rotation alone does not revoke access tokens that are still valid"
+
+    async with api.session_maker() as session:
+        stored = (await session.execute(select(RefreshToken).order_by(RefreshToken.created_at))).scalars().all()
+    assert len(stored) == 2
+    assert stored[0].session_id == stored[1].session_id
+    assert stored[0].used_at is not None and stored[1].used_at is None
+
+
+@pytest.mark.asyncio
+async def test_refresh_token_is_not_accepted_as_an_access_token(api, login):
+    tokens = await login("wrong-type@example.com")
+
+    response = await api.get("/users/me", headers={"Authorization": f"Bearer {tokens['refresh_token']}"})
+    assert response.status_code == 401
+    response = await api.post("/refresh", json={"refresh_token": tokens["access_token"]})
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_reusing_a_rotated_refresh_token_revokes_the_whole_session(api, login):
+    tokens = await login("reuse@example.com")
+    other_session = await login_again(api, "reuse@example.com")
+    rotated = (await api.post("/refresh", json={"refresh_token": tokens["refresh_token"]})).json()
+    async with api.session_maker() as session:
+        # Past the retry grace window.
+        await session.execute(update(RefreshToken).where(RefreshToken.used_at.is_not(None))
+                              .values(used_at=datetime.utcnow() - timedelta(seconds=auth.REFRESH_REUSE_GRACE_SECONDS)))
+        await session.commit()
+
+    reuse = await api.post("/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert reuse.status_code == 401
+
+    assert (await api.post("/refresh", json={"refresh_token": rotated["refresh_token"]})).status_code == 401
+    assert (await api.get("/users/me", headers=bearer(rotated))).status_code == 401
+    assert (await api.get("/users/me", headers=bearer(tokens))).status_code == 401
+    assert (await api.get("/users/me", headers=bearer(other_session))).status_code == 200, \
+        "Only the session the leaked token belongs to is ended"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_refreshes_of_one_token_rotate_it_once(api, login):
+    tokens = await login("concurrent@example.com")
+
+    responses = await asyncio.gather(*(api.post("/refresh", json={"refresh_token": tokens["refresh_token"]})
+                                       for _ in range(2)))
+
+    assert sorted(response.status_code for response in responses) == [200, 401]
+    winner = next(response.json() for response in responses if response.status_code == 200)
+    # The loser presented a token rotated moments ago, which is refused without ending the session.
+    assert (await api.get("/users/me", headers=bearer(winner))).status_code == 200
+    assert (await api.post("/refresh", json={"refresh_token": winner["refresh_token"]})).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_logout_revokes_the_session_without_a_query_per_request(api, login):
+    tokens = await login("logout@example.com")
+    assert (await api.get("/users/me", headers=bearer(tokens))).status_code == 200
+    hits = revocation_list.filter_hits
+    assert (await api.get("/users/me", headers=bearer(tokens))).status_code == 200
+    assert revocation_list.filter_hits == hits, "Live tokens are cleared by the filter alone"
+
+    assert (await api.post("/logout", headers=bearer(tokens))).json() == {"message": "Logged out"}
+
+    assert (await api.get("/users/me", headers=bearer(tokens))).status_code == 401
+    assert (await api.post("/refresh", json={"refresh_token": tokens["refresh_token"]})).status_code == 401
+    async with api.session_maker() as session:
+        assert len((await session.execute(select(RevokedToken))).scalars().all()) == 1
@@ -0,0 +1,138 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import bulk, bulk_routes
+from app.bulk import (_ChunkSink, export_csv, export_query, gzip_chunks, import_records, parquet_schema,
+                      parse_timestamp, spool_chunks)
+from app.geo import encode_geohash
+from app.models import User
+
+
+async def iterate(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def collect(records):
+    return [record async for record in records]
+
+
+def test_export_query_numbers_filter_placeholders():
+    query, args = export_query(until=datetime(2026, 1, 1), cadastral_number="77:01:0001")
+
+    assert "WHERE created_at < $1 AND cadastral_number = $2 ORDER BY created_at, id" in query
+    assert args == [datetime(2026, 1, 1), "77:01:0001"]
+
+
+def test_parse_timestamp_accepts_any_number_of_fraction_digits():
+    # COPY writes "10:00:00.5" for half a second; Python 3.10's fromisoformat only takes 3 or 6 digits.
+    assert parse_timestamp("2026-01-01 10:00:00.5") == datetime(2026, 1, 1, 10, 0, 0, 500000)
+    assert parse_timestamp("2026-01-01 10:00:00.1234") == datetime(2026, 1, 1, 10, 0, 0, 123400)
+    assert parse_timestamp("2026-01-01T10:00:00.123456") == datetime(2026, 1, 1, 10, 0, 0, 123456)
+    assert parse_timestamp("2026-01-01 10:00:00") == datetime(2026, 1, 1, 10, 0, 0)
+
+
+@pytest.mark.asyncio
+async def test_aborted_csv_export_stops_the_copy_producer(monkeypatch):
+    copy_cancelled = asyncio.Event()
+
+    class Driver:
+        async def copy_from_query(self, query, *args, output, format, header):
+            try:
+                for number in range(10 * bulk.BULK_EXPORT_QUEUE_CHUNKS):
+                    await output(f"{number}\n".encode())
+            except asyncio.CancelledError:
+                copy_cancelled.set()
+                raise
+
+    class Engine:
+        @asynccontextmanager
+        async def connect(self):
+            yield None
+
+    async def driver_connection(conn):
+        return Driver()
+
+    monkeypatch.setattr(bulk, "driver_connection", driver_connection)
+    chunks = export_csv(Engine(), "SELECT 1", [])
+    assert await anext(chunks) == b"0\n"
+    await asyncio.sleep(0)
+
+    # The client went away with the queue full, as StreamingResponse does on disconnect.
+    await asyncio.wait_for(chunks.aclose(), timeout=1)
+
+    assert copy_cancelled.is_set()
+    assert [task for task in asyncio.all_tasks() if task is not asyncio.current_task()] == []
+
+
+@pytest.mark.asyncio
+async def test_gzip_csv_round_trip_fills_geohash_and_applies_filters():
+    csv_text = (
+        "id,cadastral_number,latitude,longitude,external_server_response,created_at,geohash\n"
+        "1,a,55.75,37.61,\"{'status': 'Success'}\",2026-01-01 10:00:00.5,\n"
+        "2,b,55.75,37.61,,2026-01-02 10:00:00,\n"
+        "3,a,10.0,20.0,,2025-12-31 23:59:59,\n"
+    ).encode()
+    compressed = b"".join([chunk async for chunk in gzip_chunks(iterate(csv_text[:50], csv_text[50:]))])
+    spool = await spool_chunks(iterate(compressed[:10], compressed[10:]), compressed=True)
+
+    records = await collect(import_records(spool, "csv", datetime(2026, 1, 1), None, "a"))
+
+    assert records == [("a", 55.75, 37.61, "{'status': 'Success'}", datetime(2026, 1, 1, 10, 0, 0, 500000),
+                        encode_geohash(55.75, 37.61), '{"status": "Success"}', "Success", None, None)]
+
+
+@pytest.mark.asyncio
+async def test_parquet_chunks_read_back():
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    schema = parquet_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+    chunks = []
+    for start in (0, 3):
+        rows = [(i, f"n{i}", 1.0, 2.0, None, datetime(2026, 1, 1, i), "s", '{"value": 1.5}', "Success", None, 1.5)
+                for i in range(start, start + 3)]
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(zip(*rows), schema)], schema=schema))
+        chunks.append(sink.drain())
+    writer.close()
+    chunks.append(sink.drain())
+
+    spool = await spool_chunks(iterate(*chunks), compressed=False)
+    records = await collect(import_records(spool, "parquet", None, None, None))
+
+    assert [record[0] for record in records] == [f"n{i}" for i in range(6)]
+    assert records[5][4] == datetime(2026, 1, 1, 5)
+    assert records[5][6:] == ('{"value": 1.5}', "Success", None, 1.5)
+
+
+@pytest.mark.asyncio
+async def test_bulk_routes_are_admin_only_and_require_postgresql(api, login, monkeypatch):
+    sqlite_engine = create_async_engine("sqlite+aiosqlite://")
+    monkeypatch.setattr(bulk_routes, "engine", sqlite_engine)
+    monkeypatch.setattr(bulk_routes, "read_engine", sqlite_engine)
+    headers = {"Authorization": f"Bearer {(await login('bulk@example.com'))['access_token']}"}
+
+    assert (await api.get("/admin/query_logs/export", headers=headers)).status_code == 403
+    assert (await api.post("/admin/query_logs/import", content=b"", headers=headers)).status_code == 403
+    assert (await api.get("/admin/query_logs/export")).status_code == 401
+
+    async with api.session_maker() as session:
+        user = (await session.execute(select(User).where(User.email == "bulk@example.com"))).scalar_one()
+        user.is_superuser = True
+        await session.commit()
+
+    export = await api.get("/admin/query_logs/export", headers=headers)
+    assert export.status_code == 400
+    assert export.json()["detail"] == "Bulk export/import requires PostgreSQL (asyncpg)"
+    imported = await api.post("/admin/query_logs/import", content=b"cadastral_number,latitude,longitude\n",
+                              headers=headers)
+    assert imported.status_code == 400
+    assert (await api.get("/admin/query_logs/export", params={"format": "xml"}, headers=headers)).status_code == 422
+    await sqlite_engine.dispose()
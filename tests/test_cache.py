@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from app.cache import TTLCache
+
+
+def test_lru_eviction_and_counters():
+    cache = TTLCache(max_size=2)
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    assert cache.get("a") == 1
+    cache.set("c", 3, ttl=60)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+
+
+def test_expired_entry_is_a_miss_but_kept_as_stale():
+    cache = TTLCache(max_size=10)
+    cache.set("a", 1, ttl=60)
+    cache.get_entry("a").expires_at = 0
+
+    assert cache.get("a") is None
+    assert cache.get_entry("a").value == 1
+
+
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_concurrent_loads():
+    cache = TTLCache(max_size=10)
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"status": "Success"}
+
+    results = await asyncio.gather(*(cache.get_or_load("key", loader, lambda v: 60) for _ in range(20)))
+
+    assert calls == 1
+    assert all(result == {"status": "Success"} for result in results)
+    assert cache.stats()["coalesced"] == 19
+    assert await cache.get_or_load("key", loader, lambda v: 60) == {"status": "Success"}
+    assert calls == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_load_is_shared_and_not_cached():
+    cache = TTLCache(max_size=10)
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    results = await asyncio.gather(*(cache.get_or_load("key", loader, lambda v: 60) for _ in range(5)),
+                                   return_exceptions=True)
+
+    assert calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_bypass_reloads_and_refreshes_entry():
+    cache = TTLCache(max_size=10)
+    cache.set("key", "old", ttl=60)
+
+    async def loader():
+        return "new"
+
+    assert await cache.get_or_load("key", loader, lambda v: 60, bypass=True) == "new"
+    assert cache.get("key") == "new"
+
+
+@pytest.mark.asyncio
+async def test_stale_while_revalidate_serves_expired_entry_and_refreshes_once():
+    cache = TTLCache(max_size=10)
+    cache.set("key", "old", ttl=60)
+    cache.get_entry("key").expires_at -= 61
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return f"v{calls}"
+
+    results = await asyncio.gather(*(cache.get_or_load("key", loader, lambda v: 60, stale_ttl=30) for _ in range(5)))
+    assert results == ["old"] * 5
+    assert cache.stats()["stale_hits"] == 5
+
+    await asyncio.sleep(0.02)
+    assert calls == 1
+    assert await cache.get_or_load("key", loader, lambda v: 60, stale_ttl=30) == "v1"
+
+    # Past the stale window the caller waits for a fresh load.
+    cache.get_entry("key").expires_at -= 120
+    assert await cache.get_or_load("key", loader, lambda v: 60, stale_ttl=30) == "v2"
+    assert calls == 2
@@ -0,0 +1,181 @@
+import asyncio
+import json
+import time
+
+import pytest
+import pytest_asyncio
+
+from app import cache_backends
+from app.cache_backends import Cache, set_redis_client, start_cache_invalidation, stop_cache_invalidation
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest_asyncio.fixture
+async def redis_client():
+    client = fakeredis.FakeAsyncRedis()
+    set_redis_client(client)
+    yield client
+    await stop_cache_invalidation()
+
+
+def counting_loader(value):
+    calls = []
+
+    async def loader():
+        calls.append(value)
+        return value
+
+    return loader, calls
+
+
+@pytest.mark.asyncio
+async def test_workers_share_loaded_values_through_l2(redis_client):
+    first_worker = Cache("shared_test", max_size=10, backend="tiered")
+    second_worker = Cache("shared_test", max_size=10, backend="tiered")
+    loader, calls = counting_loader({"status": "Success"})
+
+    assert await first_worker.get_or_load(("77:01",), loader, lambda value: 60) == {"status": "Success"}
+    assert await second_worker.get_or_load(("77:01",), loader, lambda value: 60) == {"status": "Success"}
+    assert len(calls) == 1
+    assert second_worker.stats()["l2_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_get_many_uses_one_round_trip_and_fills_l1(redis_client):
+    writer = Cache("many_test", max_size=10, backend="redis")
+    reader = Cache("many_test", max_size=10, backend="tiered")
+    await writer.set("a", 1, ttl=60)
+    await writer.set("b", 2, ttl=60)
+
+    assert await reader.get_many(["a", "b", "c"]) == {"a": 1, "b": 2}
+    assert reader.local.get(reader._key("a")) == 1
+    assert reader.stats()["l2_misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_invalidation_from_another_worker_drops_l1_copy(redis_client):
+    cache = Cache("invalidate_test", max_size=10, backend="tiered")
+    await cache.set("user@example.com", {"is_active": True}, ttl=60)
+    await start_cache_invalidation()
+
+    # Another worker deletes the shared value and announces it on the channel.
+    await redis_client.delete(cache._redis_key(cache._key("user@example.com")))
+    await redis_client.publish(cache_backends.CACHE_INVALIDATION_CHANNEL,
+                               json.dumps({"cache": "invalidate_test", "key": cache._key("user@example.com")}))
+    for _ in range(50):
+        if cache.stats()["invalidations_received"]:
+            break
+        await asyncio.sleep(0.02)
+
+    assert await cache.get_many(["user@example.com"]) == {}
+
+
+async def wait_for_invalidations(cache: Cache, count: int) -> None:
+    for _ in range(100):
+        if cache.stats()["invalidations_received"] >= count:
+            return
+        await asyncio.sleep(0.02)
+
+
+@pytest.mark.asyncio
+async def test_malformed_invalidation_messages_do_not_stop_the_listener(redis_client):
+    cache = Cache("malformed_test", max_size=10, backend="tiered")
+    await cache.set("a", 1, ttl=60)
+    await start_cache_invalidation()
+
+    for junk in (b"not json", b"[1, 2]", json.dumps({"cache": "malformed_test"})):
+        await redis_client.publish(cache_backends.CACHE_INVALIDATION_CHANNEL, junk)
+    await redis_client.publish(cache_backends.CACHE_INVALIDATION_CHANNEL,
+                               json.dumps({"cache": "malformed_test", "key": cache._key("a")}))
+    await wait_for_invalidations(cache, 1)
+
+    assert cache.local.get(cache._key("a")) is None
+    assert not cache_backends._listener.done()
+
+
+@pytest.mark.asyncio
+async def test_unreadable_l2_entries_are_misses_and_get_dropped(redis_client):
+    writer = Cache("corrupt_test", max_size=10, backend="redis")
+    reader = Cache("corrupt_test", max_size=10, backend="tiered", decode=lambda value: {"count": int(value)})
+    await writer.set("good", "1", ttl=60)
+    for key, payload in (("not_json", b"{truncated"), ("no_value", json.dumps({"expires_at": time.time() + 60})),
+                         ("bad_value", json.dumps({"value": "x", "expires_at": time.time() + 60}))):
+        await redis_client.set(reader._redis_key(reader._key(key)), payload)
+
+    assert await reader.get_many(["good", "not_json", "no_value", "bad_value"]) == {"good": {"count": 1}}
+    assert reader.stats()["l2_misses"] == 3
+    for key in ("not_json", "no_value", "bad_value"):
+        assert await redis_client.get(reader._redis_key(reader._key(key))) is None
+
+    await redis_client.set(reader._redis_key(reader._key("reloaded")), b"\xff\xfe")
+    loader, calls = counting_loader("2")
+    assert await reader.get_or_load("reloaded", loader, lambda value: 60) == "2"
+    assert calls == ["2"]
+    assert await reader.get_entry("missing") is None
+
+
+@pytest.mark.asyncio
+async def test_listener_is_restarted_after_an_unexpected_failure(redis_client, monkeypatch):
+    cache = Cache("restart_test", max_size=10, backend="tiered")
+    apply_invalidation = cache_backends._apply_invalidation
+    failures = []
+
+    def fail_once(raw):
+        if not failures:
+            failures.append(raw)
+            raise RuntimeError("listener bug")
+        apply_invalidation(raw)
+
+    monkeypatch.setattr(cache_backends, "_apply_invalidation", fail_once)
+    monkeypatch.setattr(cache_backends, "CACHE_LISTENER_RESTART_DELAY", 0)
+    await start_cache_invalidation()
+    first_listener = cache_backends._listener
+    message = json.dumps({"cache": "restart_test", "key": cache._key("a")})
+
+    await redis_client.publish(cache_backends.CACHE_INVALIDATION_CHANNEL, message)
+    for _ in range(100):
+        if cache_backends._listener not in (None, first_listener):
+            break
+        await asyncio.sleep(0.02)
+    await redis_client.publish(cache_backends.CACHE_INVALIDATION_CHANNEL, message)
+    await wait_for_invalidations(cache, 1)
+
+    assert failures and first_listener.done()
+    assert cache.stats()["invalidations_received"] == 1
+
+
+@pytest.mark.asyncio
+async def test_l2_failures_fall_back_to_the_loader():
+    class BrokenRedis:
+        async def mget(self, keys):
+            raise ConnectionError("redis is down")
+
+        async def set(self, *args, **kwargs):
+            raise ConnectionError("redis is down")
+
+    set_redis_client(BrokenRedis())
+    cache = Cache("broken_test", max_size=10, backend="tiered")
+    loader, calls = counting_loader("value")
+
+    assert await cache.get_or_load("key", loader, lambda value: 60) == "value"
+    assert await cache.get_or_load("key", loader, lambda value: 60) == "value"
+    assert len(calls) == 1
+    assert cache.stats()["l2_errors"] == 2
+    set_redis_client(None)
+
+
+@pytest.mark.asyncio
+async def test_stale_l2_entry_is_served_while_refreshed_in_background(redis_client):
+    cache = Cache("stale_test", max_size=10, backend="redis")
+    redis_key = cache._redis_key(cache._key("key"))
+    await redis_client.set(redis_key, json.dumps({"value": "old", "expires_at": time.time() - 5}))
+    loader, calls = counting_loader("new")
+
+    assert await cache.get_or_load("key", loader, lambda value: 60, stale_ttl=30) == "old"
+    await asyncio.gather(*cache_backends._background_tasks)
+
+    assert calls == ["new"]
+    assert cache.stats()["l2_stale_hits"] == 1
+    assert await cache.get_or_load("key", loader, lambda value: 60, stale_ttl=30) == "new"
+    assert calls == ["new"]
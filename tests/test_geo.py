@@ -0,0 +1,27 @@
+import random
+
+from app.geo import covering_geohashes, encode_geohash, haversine_m
+
+
+def test_encode_geohash_known_value():
+    assert encode_geohash(57.64911, 10.40744, 11) == "u4pruydqqvj"
+
+
+def test_haversine_distance():
+    # One hundredth of a degree of latitude is about 1.1 km.
+    assert abs(haversine_m(55.7558, 37.6173, 55.7658, 37.6173) - 1112) < 2
+
+
+def test_covering_geohashes_contain_every_point_in_radius():
+    rng = random.Random(7)
+    for latitude, longitude, radius_m in ((55.7558, 37.6173, 1000), (-33.86, 151.21, 250), (0.0, 179.999, 5000)):
+        cells = covering_geohashes(latitude, longitude, radius_m)
+        assert cells
+        for _ in range(200):
+            point_lat = latitude + rng.uniform(-1, 1) * radius_m / 111320
+            point_lon = longitude + rng.uniform(-1, 1) * radius_m / 111320
+            point_lon = (point_lon + 180) % 360 - 180
+            if haversine_m(latitude, longitude, point_lat, point_lon) > radius_m:
+                continue
+            geohash = encode_geohash(point_lat, point_lon)
+            assert any(geohash.startswith(cell) for cell in cells)
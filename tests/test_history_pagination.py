@@ -0,0 +1,108 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.models import QueryLog
+
+
+@pytest.mark.asyncio
+async def test_history_keyset_pagination_and_stream(api, login):
+    tokens = await login("testuser_for_pagination@example.com")
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    # Explicit timestamps: sqlite's CURRENT_TIMESTAMP default has second precision. Rows 2 and 3 share
+    # one, so the page boundary falls inside a created_at tie and has to be resolved by id.
+    started = datetime(2026, 10, 1, 12, 0, 0, 500000)
+    offsets = [0, 1, 1, 2, 3]
+    async with api.session_maker() as session:
+        session.add_all([QueryLog(cadastral_number=str(number), latitude=55.7558, longitude=37.6173,
+                                  created_at=started + timedelta(seconds=offset))
+                         for number, offset in enumerate(offsets)])
+        await session.commit()
+
+    first_page = await api.get("/history", params={"limit": 3}, headers=headers)
+    assert first_page.status_code == 200
+    assert len(first_page.json()) == 3
+    next_cursor = first_page.headers.get("X-Next-Cursor")
+    assert next_cursor, "A full page should return a cursor for the next one"
+
+    second_page = await api.get("/history", params={"limit": 3, "cursor": next_cursor}, headers=headers)
+    assert second_page.status_code == 200
+    assert len(second_page.json()) == 2
+    assert "X-Next-Cursor" not in second_page.headers
+    page_ids = [item["id"] for item in first_page.json() + second_page.json()]
+    assert len(set(page_ids)) == 5
+    assert page_ids == [5, 4, 3, 2, 1], "Newest first, ties broken by id descending"
+
+    invalid_cursor_response = await api.get("/history", params={"cursor": "not-a-cursor"}, headers=headers)
+    assert invalid_cursor_response.status_code == 400
+
+    stream_response = await api.get("/history/stream", headers=headers)
+    assert stream_response.status_code == 200
+    assert stream_response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line)["id"] for line in stream_response.text.splitlines()] == page_ids
+
+    resumed_stream = await api.get("/history/stream", params={"cursor": next_cursor}, headers=headers)
+    assert [json.loads(line)["id"] for line in resumed_stream.text.splitlines()] == page_ids[3:]
+
+
+@pytest.mark.asyncio
+async def test_history_etag_revalidates_from_the_page_without_counting(api, login):
+    tokens = await login("testuser_for_etag@example.com")
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    query = {"cadastral_number": "77:01:0001", "latitude": 55.7558, "longitude": 37.6173}
+    assert (await api.post("/query", json=query, headers=headers)).status_code == 200
+
+    statements = []
+    engine = api.session_maker.kw["bind"].sync_engine
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+
+    first = await api.get("/history", headers=headers)
+    etag = first.headers["ETag"]
+    revalidated = await api.get("/history", headers={**headers, "If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["ETag"] == etag
+    assert not [statement for statement in statements if "count(" in statement.lower()]
+
+    assert (await api.post("/query", json=query, headers=headers)).status_code == 200
+    changed = await api.get("/history", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert len(changed.json()) == 2
+
+
+@pytest.mark.asyncio
+async def test_history_filters_narrow_the_page_and_its_cursor(api, login):
+    tokens = await login("testuser_for_filters@example.com")
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    started = datetime(2026, 10, 1, 12, 0, 0, 500000)
+    rows = [("Success", 100.0), ("NotFound", None), ("Success", 250.0), ("Success", 400.0), ("NotFound", None),
+            ("Success", 300.0)]
+    async with api.session_maker() as session:
+        session.add_all([QueryLog(cadastral_number=str(number), latitude=55.7558, longitude=37.6173,
+                                  created_at=started + timedelta(seconds=number), status=row_status, value=value)
+                         for number, (row_status, value) in enumerate(rows)])
+        await session.commit()
+
+    async def history_ids(**params):
+        response = await api.get("/history", params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        return [item["id"] for item in response.json()], response.headers.get("X-Next-Cursor")
+
+    assert (await history_ids())[0] == [6, 5, 4, 3, 2, 1]
+    assert (await history_ids(status="NotFound"))[0] == [5, 2]
+    assert (await history_ids(min_value=250))[0] == [6, 4, 3]
+    assert (await history_ids(max_value=250))[0] == [3, 1]
+    assert (await history_ids(min_value=200, max_value=350))[0] == [6, 3]
+
+    first_page, cursor = await history_ids(status="Success", limit=2)
+    assert first_page == [6, 4] and cursor
+    second_page, last_cursor = await history_ids(status="Success", limit=2, cursor=cursor)
+    assert second_page == [3, 1], "The cursor continues within the filtered rows"
+    assert last_cursor is None
+
+    stream = await api.get("/history/stream", params={"status": "Success", "min_value": 200}, headers=headers)
+    assert [json.loads(line)["id"] for line in stream.text.splitlines()] == [6, 4, 3]
@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import QueryLogRollup
+
+HOUR = datetime(2026, 10, 1, 9, 0)
+
+
+@pytest.mark.asyncio
+async def test_history_stats_sums_rollups_per_hour_and_status(api, login):
+    headers = {"Authorization": f"Bearer {(await login('stats@example.com'))['access_token']}"}
+    async with api.session_maker() as session:
+        session.add_all([
+            QueryLogRollup(bucket=HOUR, cadastral_number="a", status="Success", query_count=3),
+            QueryLogRollup(bucket=HOUR, cadastral_number="b", status="Success", query_count=2),
+            QueryLogRollup(bucket=HOUR, cadastral_number="a", status="NotFound", query_count=1),
+            QueryLogRollup(bucket=HOUR + timedelta(hours=1), cadastral_number="a", status="Success", query_count=4),
+            # Outside the window below.
+            QueryLogRollup(bucket=HOUR + timedelta(hours=2), cadastral_number="a", status="Success", query_count=50),
+            QueryLogRollup(bucket=HOUR - timedelta(hours=1), cadastral_number="a", status="Success", query_count=50),
+        ])
+        await session.commit()
+    window = {"since": HOUR.isoformat(), "until": (HOUR + timedelta(hours=2)).isoformat()}
+
+    response = await api.get("/history/stats", params=window, headers=headers)
+    assert response.status_code == 200, response.text
+    stats = response.json()
+    assert stats["total"] == 10
+    assert stats["by_status"] == {"NotFound": 1, "Success": 9}
+    assert [(bucket["bucket"], bucket["status"], bucket["query_count"]) for bucket in stats["buckets"]] == [
+        ("2026-10-01T09:00:00", "NotFound", 1),
+        ("2026-10-01T09:00:00", "Success", 5),
+        ("2026-10-01T10:00:00", "Success", 4),
+    ]
+
+    stats = (await api.get("/history/stats", params={**window, "cadastral_number": "b"}, headers=headers)).json()
+    assert stats["cadastral_number"] == "b"
+    assert stats["total"] == 2 and stats["by_status"] == {"Success": 2}
+
+
+@pytest.mark.asyncio
+async def test_history_stats_rejects_an_empty_window(api, login):
+    headers = {"Authorization": f"Bearer {(await login('stats-window@example.com'))['access_token']}"}
+
+    response = await api.get("/history/stats", params={"since": HOUR.isoformat(), "until": HOUR.isoformat()},
+                             headers=headers)
+    assert response.status_code == 400
+    assert (await api.get("/history/stats")).status_code == 401
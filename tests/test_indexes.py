@@ -0,0 +1,75 @@
+import json
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.db import DATABASE_URL
+from app.models import Base, QueryLog
+from app.pagination import history_statement
+
+
+@pytest_asyncio.fixture
+async def engine():
+    # Own engine per test: pooled asyncpg connections cannot move between the tests' event loops.
+    engine = create_async_engine(DATABASE_URL, poolclass=NullPool)
+    if engine.dialect.name != "postgresql":
+        await engine.dispose()
+        pytest.skip("query plans are checked against PostgreSQL")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(text(
+            "INSERT INTO query_logs (cadastral_number, latitude, longitude, created_at, status, value) "
+            "SELECT 'cn-' || (n % 50), 55.0, 37.0, now() - n * interval '1 second', "
+            "CASE WHEN n % 100 = 0 THEN 'NotFound' ELSE 'Success' END, n "
+            "FROM generate_series(1, 50000) AS n"
+        ))
+        await conn.execute(text("ANALYZE query_logs"))
+    yield engine
+    await engine.dispose()
+
+
+async def explain(engine, statement) -> str:
+    compiled = statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+    async with engine.connect() as conn:
+        result = await conn.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}"))
+        return json.dumps(result.scalar())
+
+
+@pytest.mark.asyncio
+async def test_filtered_history_uses_composite_index(engine):
+    statement = history_statement(select(QueryLog), cadastral_number="cn-42").limit(100)
+    plan = await explain(engine, statement)
+
+    assert "ix_query_logs_cadastral_number_created_at_id" in plan
+    assert '"Node Type": "Sort"' not in plan, "The index order should satisfy ORDER BY without a sort"
+
+
+@pytest.mark.asyncio
+async def test_unfiltered_history_uses_created_at_index(engine):
+    statement = history_statement(select(QueryLog)).limit(100)
+    plan = await explain(engine, statement)
+
+    assert "ix_query_logs_created_at_id" in plan
+    assert '"Node Type": "Sort"' not in plan
+
+
+@pytest.mark.asyncio
+async def test_status_filtered_history_uses_status_index(engine):
+    statement = history_statement(select(QueryLog), status="NotFound").limit(100)
+    plan = await explain(engine, statement)
+
+    assert "ix_query_logs_status_created_at_id" in plan
+    assert '"Node Type": "Sort"' not in plan
+
+
+@pytest.mark.asyncio
+async def test_value_range_history_uses_value_index(engine):
+    statement = history_statement(select(QueryLog), min_value=100, max_value=200).limit(100)
+    plan = await explain(engine, statement)
+
+    assert "ix_query_logs_value" in plan
+
@@ -0,0 +1,202 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import jobs
+from app.models import Base, QueryJob, QueryLog
+
+pytest.importorskip("aiosqlite")
+
+
+@pytest_asyncio.fixture
+async def session_maker(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'jobs.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_job_left_running_by_a_dead_worker_is_retried(session_maker, monkeypatch):
+    async def lookup(cadastral_number, latitude, longitude, use_cache=True):
+        return {"cadastral_number": cadastral_number, "status": "Success"}
+
+    monkeypatch.setattr(jobs, "call_external_api", lookup)
+    runner = jobs.JobRunner(session_maker, workers=1, poll_interval=0.05, lease_seconds=30, max_attempts=3)
+    async with session_maker() as session:
+        session.add_all([
+            QueryJob(id="orphaned", user_id=1, cadastral_number="1", latitude=0, longitude=0, use_cache=True,
+                     status=jobs.RUNNING, attempts=1, lease_expires_at=datetime.utcnow() - timedelta(seconds=1)),
+            QueryJob(id="exhausted", user_id=1, cadastral_number="2", latitude=0, longitude=0, use_cache=True,
+                     status=jobs.RUNNING, attempts=3, lease_expires_at=datetime.utcnow() - timedelta(seconds=1)),
+        ])
+        await session.commit()
+
+    runner.start()
+    try:
+        await runner.wait_for_update("orphaned", timeout=2)
+    finally:
+        await runner.stop()
+
+    async with session_maker() as session:
+        orphaned = await session.get(QueryJob, "orphaned")
+        exhausted = await session.get(QueryJob, "exhausted")
+        log = await session.get(QueryLog, orphaned.query_log_id)
+    assert orphaned.status == jobs.SUCCEEDED and orphaned.attempts == 2
+    assert log.cadastral_number == "1"
+    assert exhausted.status == jobs.FAILED and "abandoned" in exhausted.error
+    assert runner.stats()["recovered"] == 1
+
+
+class Upstream:
+    """Stand-in for call_external_api that answers once `release` is set, or fails with `error`."""
+
+    def __init__(self):
+        self.called = asyncio.Event()
+        self.release = asyncio.Event()
+        self.error: HTTPException | None = None
+        self.during_call = None
+
+    async def __call__(self, cadastral_number, latitude, longitude, use_cache=True):
+        self.called.set()
+        if self.during_call is not None:
+            await self.during_call()
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return {"cadastral_number": cadastral_number, "address": "Some Street, 123", "value": 1500000.5,
+                "status": "Success"}
+
+
+@pytest_asyncio.fixture
+async def runner(api, monkeypatch):
+    from app import main
+
+    runner = jobs.JobRunner(api.session_maker, workers=1, poll_interval=0.05, lease_seconds=30, max_attempts=3)
+    upstream = Upstream()
+    monkeypatch.setattr(jobs, "job_runner", runner)
+    monkeypatch.setattr(main, "job_runner", runner)
+    monkeypatch.setattr(jobs, "JOB_POLL_INTERVAL", 0.05)
+    monkeypatch.setattr(main, "JOB_POLL_INTERVAL", 0.05)
+    monkeypatch.setattr(jobs, "call_external_api", upstream)
+    runner.upstream = upstream
+    yield runner
+    await runner.stop()
+
+
+async def submit(api, headers) -> dict:
+    response = await api.post("/query/async", headers=headers,
+                              json={"cadastral_number": "123456789012", "latitude": 55.7558, "longitude": 37.6173})
+    assert response.status_code == 202, response.text
+    job = response.json()
+    assert response.headers["Location"] == f"/jobs/{job['id']}"
+    return job
+
+
+@pytest.mark.asyncio
+async def test_async_query_is_accepted_and_long_poll_returns_the_result(api, login, runner):
+    headers = {"Authorization": f"Bearer {(await login('async@example.com'))['access_token']}"}
+    job = await submit(api, headers)
+    assert job["status"] == jobs.PENDING
+
+    runner.start()
+    await runner.upstream.called.wait()
+    poll = asyncio.create_task(api.get(f"/jobs/{job['id']}", params={"wait": 5}, headers=headers))
+    await asyncio.sleep(0.1)
+    assert not poll.done(), "wait= should hold the request open until the job finishes"
+    runner.upstream.release.set()
+
+    response = await poll
+    assert response.status_code == 200
+    result = response.json()
+    assert result["status"] == jobs.SUCCEEDED and result["status_code"] == 200
+    history = (await api.get("/history", headers=headers)).json()
+    assert [log["id"] for log in history] == [result["query_log_id"]]
+
+    other = {"Authorization": f"Bearer {(await login('other@example.com'))['access_token']}"}
+    assert (await api.get(f"/jobs/{job['id']}", headers=other)).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_job_events_stream_each_state_until_the_terminal_one(api, login, runner):
+    headers = {"Authorization": f"Bearer {(await login('events@example.com'))['access_token']}"}
+    job = await submit(api, headers)
+
+    stream = asyncio.create_task(api.get(f"/jobs/{job['id']}", headers={**headers, "Accept": "text/event-stream"}))
+    await asyncio.sleep(0.1)
+    runner.start()
+    await runner.upstream.called.wait()
+    await asyncio.sleep(0.1)
+    runner.upstream.release.set()
+
+    response = await asyncio.wait_for(stream, timeout=5)
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [line.removeprefix("event: ") for line in response.text.splitlines() if line.startswith("event: ")]
+    assert events == [jobs.PENDING, jobs.RUNNING, jobs.SUCCEEDED]
+    last = json.loads(response.text.strip().splitlines()[-1].removeprefix("data: "))
+    assert last["query_log_id"] is not None
+
+
+@pytest.mark.asyncio
+async def test_upstream_failure_fails_the_job_without_a_log(api, login, runner):
+    headers = {"Authorization": f"Bearer {(await login('failure@example.com'))['access_token']}"}
+    runner.upstream.error = HTTPException(status_code=503, detail="External API is unavailable")
+    runner.upstream.release.set()
+    job = await submit(api, headers)
+    runner.start()
+
+    result = (await api.get(f"/jobs/{job['id']}", params={"wait": 5}, headers=headers)).json()
+    assert result["status"] == jobs.FAILED
+    assert result["status_code"] == 503 and result["error"] == "External API is unavailable"
+    assert result["query_log_id"] is None
+    assert (await api.get("/history", headers=headers)).json() == []
+
+
+@pytest.mark.asyncio
+async def test_result_is_dropped_when_the_lease_moved_to_another_worker(api, runner):
+    async with api.session_maker() as session:
+        session.add_all([
+            QueryJob(id="reclaimed", user_id=1, cadastral_number="1", latitude=0, longitude=0, use_cache=True,
+                     status=jobs.PENDING, attempts=0),
+            QueryJob(id="purged", user_id=1, cadastral_number="2", latitude=0, longitude=0, use_cache=True,
+                     status=jobs.PENDING, attempts=0),
+        ])
+        await session.commit()
+
+    async def lose_the_job():
+        # While the first upstream call is in flight its lease expires and the job is claimed again; the
+        # second job is deleted before its worker even reads it.
+        async with api.session_maker() as session:
+            await session.execute(update(QueryJob).where(QueryJob.id == "reclaimed").values(
+                lease_expires_at=datetime.utcnow() + timedelta(seconds=90), attempts=2))
+            await session.execute(delete(QueryJob).where(QueryJob.id == "purged"))
+            await session.commit()
+
+    runner.upstream.during_call = lose_the_job
+    runner.upstream.release.set()
+    claims = [await runner._claim(), await runner._claim()]
+    assert [job_id for job_id, _ in claims] == ["reclaimed", "purged"]
+    for claim in claims:
+        await runner._run(*claim)
+
+    async with api.session_maker() as session:
+        reclaimed = await session.get(QueryJob, "reclaimed")
+        logs = (await session.execute(select(QueryLog))).scalars().all()
+    assert reclaimed.status == jobs.RUNNING and reclaimed.attempts == 2
+    assert logs == []
+    assert runner.stats()["lost_leases"] == 1 and runner.stats()["succeeded"] == 0
+
+
+@pytest.mark.asyncio
+async def test_job_events_end_with_an_error_event_for_a_missing_job(api, runner):
+    events = [event async for event in jobs.job_events("purged")]
+
+    assert events == ['event: error\ndata: {"id": "purged", "error": "Job not found"}\n\n']
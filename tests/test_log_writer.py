@@ -0,0 +1,63 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi import HTTPException
+
+from app.log_writer import QueryLogWriter
+
+
+class RecordingEngine:
+    def __init__(self, delay: float = 0):
+        self.batches = []
+        self.delay = delay
+
+    @asynccontextmanager
+    async def begin(self):
+        engine = self
+
+        class Connection:
+            async def execute(self, statement, rows):
+                await asyncio.sleep(engine.delay)
+                engine.batches.append(list(rows))
+
+        yield Connection()
+
+
+def make_row(number: int) -> dict:
+    return {"cadastral_number": str(number), "latitude": 1.0, "longitude": 2.0}
+
+
+@pytest.mark.asyncio
+async def test_rows_are_flushed_in_batches_and_drained_on_stop():
+    engine = RecordingEngine()
+    writer = QueryLogWriter(engine, queue_size=100, batch_size=10, flush_interval=0.05,
+                            enqueue_timeout=1, flush_retries=0)
+    writer.start()
+    for number in range(25):
+        await writer.enqueue(make_row(number))
+    await writer.stop()
+
+    flushed = [row["cadastral_number"] for batch in engine.batches for row in batch]
+    assert flushed == [str(number) for number in range(25)]
+    assert all(len(batch) <= 10 for batch in engine.batches)
+    stats = writer.stats()
+    assert stats["flushed_rows"] == 25
+    assert stats["queue_depth"] == 0
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_with_503():
+    engine = RecordingEngine(delay=0.5)
+    writer = QueryLogWriter(engine, queue_size=1, batch_size=1, flush_interval=0.01,
+                            enqueue_timeout=0.05, flush_retries=0)
+    writer.start()
+    await writer.enqueue(make_row(1))
+    await asyncio.sleep(0.01)
+    await writer.enqueue(make_row(2))
+
+    with pytest.raises(HTTPException) as exc_info:
+        await writer.enqueue(make_row(3))
+    assert exc_info.value.status_code == 503
+    assert writer.stats()["rejected"] == 1
+    await writer.stop()
@@ -0,0 +1,29 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app import metrics
+
+pytest.importorskip("prometheus_client")
+
+
+def sample(name: str, pool: str) -> float:
+    return metrics.registry.get_sample_value(name, {"pool": pool})
+
+
+@pytest.mark.asyncio
+async def test_pool_checkout_wait_includes_time_queued_for_a_busy_pool(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'metrics.db'}", pool_size=1, max_overflow=0)
+    metrics.instrument_pool(engine.sync_engine.pool, "metrics_test")
+
+    async with engine.connect():
+        assert sample("db_pool_connections_in_use", "metrics_test") == 1
+        waiting = asyncio.create_task(engine.connect().start())
+        await asyncio.sleep(0.2)
+    await (await waiting).close()
+
+    assert sample("db_pool_checkout_wait_seconds_count", "metrics_test") == 2
+    assert sample("db_pool_checkout_wait_seconds_sum", "metrics_test") >= 0.15
+    assert sample("db_pool_connections_in_use", "metrics_test") == 0
+    await engine.dispose()
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import main
+from app.geo import haversine_m
+from app.models import QueryLog
+
+CENTER = (55.7558, 37.6173)
+# Metres north of the center, in insertion order (oldest first).
+OFFSETS_M = [900, 0, 1500, 400, 650]
+
+
+@pytest.fixture
+def seeded(api):
+    async def seed():
+        started = datetime(2026, 10, 1, 12, 0, 0)
+        async with api.session_maker() as session:
+            session.add_all([QueryLog(cadastral_number=f"north-{offset}", latitude=CENTER[0] + offset / 111195,
+                                      longitude=CENTER[1], created_at=started + timedelta(seconds=number))
+                             for number, offset in enumerate(OFFSETS_M)])
+            await session.commit()
+
+    return seed
+
+
+async def nearby(api, headers, **params):
+    response = await api.get("/history/nearby", params={"lat": CENTER[0], "lon": CENTER[1], **params},
+                              headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+@pytest.mark.asyncio
+async def test_nearby_filters_by_radius_and_orders_by_distance(api, login, seeded):
+    headers = {"Authorization": f"Bearer {(await login('nearby@example.com'))['access_token']}"}
+    await seeded()
+
+    results = await nearby(api, headers, radius_m=1000)
+    assert [log["cadastral_number"] for log in results] == ["north-0", "north-400", "north-650", "north-900"]
+    distances = [log["distance_m"] for log in results]
+    assert distances == sorted(distances)
+    for log in results:
+        assert log["distance_m"] == pytest.approx(haversine_m(*CENTER, log["latitude"], log["longitude"]), abs=0.1)
+        assert log["distance_m"] == pytest.approx(int(log["cadastral_number"].split("-")[1]), abs=1)
+
+    assert [log["cadastral_number"] for log in await nearby(api, headers, radius_m=500)] == ["north-0", "north-400"]
+    assert len(await nearby(api, headers, radius_m=1000, limit=2)) == 2
+
+
+@pytest.mark.asyncio
+async def test_nearby_radius_is_validated(api, login):
+    headers = {"Authorization": f"Bearer {(await login('nearby-radius@example.com'))['access_token']}"}
+
+    for radius_m in (0, main.NEARBY_MAX_RADIUS_M + 1):
+        response = await api.get("/history/nearby", params={"lat": CENTER[0], "lon": CENTER[1], "radius_m": radius_m},
+                                 headers=headers)
+        assert response.status_code == 422
+    assert (await api.get("/history/nearby", params={"lat": 91, "lon": 0, "radius_m": 10},
+                          headers=headers)).status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_nearby_only_considers_the_most_recent_candidates(api, login, seeded, monkeypatch):
+    headers = {"Authorization": f"Bearer {(await login('nearby-cap@example.com'))['access_token']}"}
+    await seeded()
+    monkeypatch.setattr(main, "NEARBY_MAX_CANDIDATES", 2)
+
+    # north-1500 is pruned by the bounding box, so the two newest candidates are north-650 and north-400;
+    # the older north-0 and north-900 are never read.
+    results = await nearby(api, headers, radius_m=1000)
+    assert [log["cadastral_number"] for log in results] == ["north-400", "north-650"]
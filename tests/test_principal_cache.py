@@ -0,0 +1,26 @@
+import pytest
+from sqlalchemy import select
+
+from app.dependencies import principal_cache
+from app.models import User
+
+
+@pytest.mark.asyncio
+async def test_cached_principal_is_invalidated_on_deactivation(api, login):
+    email = "testuser_for_principal_cache@example.com"
+    tokens = await login(email)
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    assert (await api.get("/users/me", headers=headers)).status_code == 200
+    hits = principal_cache.stats()["hits"]
+    assert (await api.get("/users/me", headers=headers)).status_code == 200
+    assert principal_cache.stats()["hits"] == hits + 1, "The second request should be served from the cache"
+
+    async with api.session_maker() as session:
+        user = (await session.execute(select(User).where(User.email == email))).scalar_one()
+        user.is_active = False
+        await session.commit()
+
+    inactive_response = await api.get("/users/me", headers=headers)
+    assert inactive_response.status_code == 400, "Deactivation should invalidate the cached principal"
+    assert "Inactive user" in inactive_response.text
@@ -0,0 +1,47 @@
+import asyncio
+import sys
+
+import pytest
+
+from app.profiling import ProfileStore, RequestProfile, task_stack
+
+
+async def wait_on(event: asyncio.Event):
+    await event.wait()
+
+
+async def handler(event: asyncio.Event, frames: list):
+    frames.append(sys._getframe())
+    await wait_on(event)
+
+
+@pytest.mark.asyncio
+async def test_task_stack_of_suspended_task_starts_below_root_frame():
+    event = asyncio.Event()
+    frames = []
+    task = asyncio.create_task(handler(event, frames))
+    await asyncio.sleep(0)
+
+    stack = task_stack(task, None, frames[0])
+    event.set()
+    await task
+
+    assert stack.startswith("wait_on (test_profiling.py:")
+    assert stack.split(";")[-1] == "[awaiting Future]"
+
+
+def test_profile_store_aggregates_stacks_by_route_and_caps_distinct_stacks():
+    store = ProfileStore(max_profiles=10, max_stacks=2)
+    for route, stack in (("/history", "a;b"), ("/history", "a;b"), ("/query", "c")):
+        profile = RequestProfile("GET", route, sampled=True, requested_only=False, root_frame=None)
+        profile.samples[stack] += 3
+        profile.record_sql("SELECT 1", 0.002, executemany=False)
+        store.add(profile, slow=False)
+    extra = RequestProfile("GET", "/history/nearby", sampled=True, requested_only=False, root_frame=None)
+    extra.samples["d"] += 1
+    store.add(extra, slow=True)
+
+    assert store.collapsed() == "GET /history;a;b 6\nGET /query;c 3\n"
+    assert store.dropped_samples == 1
+    assert store.top_sql() == [{"statement": "SELECT 1", "count": 3, "total_ms": 6.0}]
+    assert store.stats()["slow_requests"] == 1
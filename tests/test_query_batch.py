@@ -0,0 +1,23 @@
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_query_batch_endpoint(api, login):
+    tokens = await login("testuser_for_batch@example.com")
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    batch = [
+        {"cadastral_number": "123456789012", "latitude": 55.7558, "longitude": 37.6173},
+        {"cadastral_number": "987654321098", "latitude": 51.5074, "longitude": -0.1278},
+        {"cadastral_number": "123456789012", "latitude": 55.7558, "longitude": 37.6173},
+    ]
+    response = await api.post("/query/batch", json=batch, headers=headers)
+    assert response.status_code == 200, f"POST /query/batch failed: {response.text}"
+    results = response.json()
+    assert len(results) == 3
+    assert all(result["status_code"] == 200 for result in results)
+    assert results[0]["log"]["id"] == results[2]["log"]["id"], "Duplicate items should share one log row"
+    assert sorted(api.lookups) == ["123456789012", "987654321098"], "Duplicates should be looked up once"
+
+    history_items = (await api.get("/history", headers=headers)).json()
+    assert len(history_items) == 2, f"Expected 2 deduplicated rows in history, got {len(history_items)}"
@@ -0,0 +1,171 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app import external_api
+from app.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    handlers = []
+
+    async def dispatch(request: httpx.Request) -> httpx.Response:
+        return await handlers[0](request)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(dispatch), base_url="http://upstream")
+    monkeypatch.setattr(external_api, "_http_client", client)
+    monkeypatch.setattr(external_api, "EXTERNAL_API_RETRY_BASE_DELAY", 0)
+    monkeypatch.setattr(external_api, "external_api_breaker", CircuitBreaker(failure_threshold=3, reset_timeout=60))
+    monkeypatch.setattr(external_api, "lookup_cache", external_api.Cache("lookup", max_size=100, backend="memory"))
+    monkeypatch.setattr(external_api, "external_api_counters", dict.fromkeys(external_api.external_api_counters, 0))
+    yield handlers.append
+
+
+def success(cadastral_number: str) -> httpx.Response:
+    return httpx.Response(200, json={"cadastral_number": cadastral_number, "status": "Success"})
+
+
+def test_breaker_opens_and_recovers_through_half_open():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow_request()
+
+    breaker.opened_at -= 1
+    assert breaker.allow_request()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow_request(), "Only one probe is allowed while half-open"
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_unsettled_half_open_probe_expires_after_reset_timeout():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    breaker.opened_at -= 1
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+    breaker.half_open_at -= 1
+    assert breaker.allow_request(), "A probe that never reported back must not block the breaker forever"
+    breaker.release()
+    assert breaker.allow_request()
+
+
+def half_open_breaker() -> CircuitBreaker:
+    breaker = external_api.external_api_breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    breaker.opened_at -= breaker.reset_timeout
+    return breaker
+
+
+@pytest.mark.asyncio
+async def test_half_open_probe_with_invalid_body_reopens_the_breaker(upstream):
+    async def invalid_body(request):
+        return httpx.Response(200, content=b"not json")
+
+    upstream(invalid_body)
+    breaker = half_open_breaker()
+
+    with pytest.raises(HTTPException) as exc_info:
+        await external_api.fetch_external_api("1", 0, 0)
+
+    assert exc_info.value.status_code == 503
+    assert breaker.state == OPEN
+
+
+@pytest.mark.asyncio
+async def test_cancelled_half_open_probe_frees_its_slot(upstream):
+    started = asyncio.Event()
+    calls = 0
+
+    async def hang_once(request):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            started.set()
+            await asyncio.Event().wait()
+        return success("1")
+
+    upstream(hang_once)
+    breaker = half_open_breaker()
+    probe = asyncio.create_task(external_api.fetch_external_api("1", 0, 0))
+    await started.wait()
+    assert breaker.state == HALF_OPEN and breaker.half_open_calls == 1
+
+    probe.cancel()
+    await asyncio.gather(probe, return_exceptions=True)
+
+    assert breaker.half_open_calls == 0
+    assert (await external_api.fetch_external_api("1", 0, 0))["status"] == "Success"
+    assert breaker.state == CLOSED
+
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_retried(upstream):
+    calls = 0
+
+    async def flaky(request):
+        nonlocal calls
+        calls += 1
+        return httpx.Response(503) if calls < 3 else success("1")
+
+    upstream(flaky)
+    result = await external_api.fetch_external_api("1", 0, 0)
+
+    assert result["status"] == "Success"
+    assert calls == 3
+    assert external_api.external_api_counters["retries"] == 2
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_fails_fast_and_serves_stale(upstream):
+    calls = 0
+
+    async def down(request):
+        nonlocal calls
+        calls += 1
+        return httpx.Response(502)
+
+    upstream(down)
+    await external_api.lookup_cache.set(("1",), {"cadastral_number": "1", "status": "Success"}, ttl=60)
+    (await external_api.lookup_cache.get_entry(("1",))).expires_at = 0
+
+    result = await external_api.call_external_api("1", 0, 0)
+    assert result["status"] == "Success"
+    assert external_api.external_api_breaker.state == OPEN
+    assert external_api.external_api_counters["stale_served"] == 1
+
+    calls_before = calls
+    with pytest.raises(HTTPException) as exc_info:
+        await external_api.call_external_api("2", 0, 0)
+    assert exc_info.value.status_code == 503
+    assert "Retry-After" in exc_info.value.headers
+    assert calls == calls_before, "An open breaker must not reach the upstream"
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_is_hedged(upstream, monkeypatch):
+    monkeypatch.setattr(external_api, "EXTERNAL_API_HEDGE_ENABLED", True)
+    monkeypatch.setattr(external_api, "EXTERNAL_API_HEDGE_MIN_DELAY", 0.01)
+    calls = 0
+
+    async def first_call_stalls(request):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            await asyncio.sleep(5)
+        return success("1")
+
+    upstream(first_call_stalls)
+    result = await asyncio.wait_for(external_api.fetch_external_api("1", 0, 0), timeout=1)
+
+    assert result["status"] == "Success"
+    assert external_api.external_api_counters["hedges"] == 1
+    assert external_api.external_api_counters["hedge_wins"] == 1
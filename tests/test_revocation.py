@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base, RevokedToken
+from app.revocation import BloomFilter, RevocationList
+
+pytest.importorskip("aiosqlite")
+
+
+@pytest_asyncio.fixture
+async def session_maker(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'revocation.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
+def worker(session_maker) -> RevocationList:
+    return RevocationList(session_maker, capacity=1000, error_rate=0.01, sync_interval=1, rebuild_interval=3600,
+                          sync_overlap=60)
+
+
+def test_bloom_filter_has_no_false_negatives_and_bounded_false_positives():
+    bloom = BloomFilter(capacity=10000, error_rate=0.01)
+    for number in range(10000):
+        bloom.add(f"revoked-{number}")
+
+    assert all(f"revoked-{number}" in bloom for number in range(10000))
+    false_positives = sum(f"live-{number}" in bloom for number in range(10000))
+    assert false_positives < 200
+    assert len(bloom.bits) < 12 * 1024
+
+
+@pytest.mark.asyncio
+async def test_revocation_reaches_other_workers_on_sync_and_expired_ids_are_purged(session_maker):
+    revoking, other = worker(session_maker), worker(session_maker)
+    await revoking.rebuild()
+    await other.rebuild()
+
+    async with session_maker() as session:
+        await revoking.revoke(session, "session-1", datetime.utcnow() + timedelta(minutes=30))
+        session.add(RevokedToken(token_id="expired", expires_at=datetime.utcnow() - timedelta(seconds=1)))
+        await session.commit()
+
+        assert await revoking.is_revoked(session, "token-1", "session-1")
+        assert not await other.is_revoked(session, "token-1", "session-1")
+        await other.sync()
+        assert await other.is_revoked(session, "token-1", "session-1")
+        assert not await other.is_revoked(session, "expired")
+        assert other.checks == 3 and other.filter_hits == 2
+
+    assert await other.rebuild() == 1
+    async with session_maker() as session:
+        assert await session.get(RevokedToken, "expired") is None
+    assert "expired" not in other.bloom
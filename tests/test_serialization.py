@@ -0,0 +1,81 @@
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+
+from app import main
+from app.models import QueryLog
+
+pytest.importorskip("orjson")
+
+
+def canonical(body: bytes):
+    # Keeps each number's exact spelling, so 100 and 100.0 or differently rounded floats do not compare equal.
+    return json.loads(body, parse_float=lambda token: ("float", token), parse_int=lambda token: ("int", token))
+
+
+def pydantic_json(log: QueryLog) -> bytes:
+    return main.QueryLogResponse.model_validate(log, from_attributes=True).model_dump_json().encode()
+
+
+@pytest.mark.asyncio
+async def test_fast_json_history_matches_the_pydantic_response(api, login, monkeypatch):
+    headers = {"Authorization": f"Bearer {(await login('fast-history@example.com'))['access_token']}"}
+    async with api.session_maker() as session:
+        session.add_all([
+            QueryLog(cadastral_number="77:01:0001", latitude=55.7558, longitude=37.6173,
+                     created_at=datetime(2026, 10, 1, 12, 0, 0, 123),
+                     external_server_response="{'status': 'Success', 'value': 0.30000000000000004}",
+                     external_response={"status": "Success", "value": 0.30000000000000004, "address": "Улица, 1",
+                                        "nested": {"floors": [1, 2.5]}},
+                     status="Success", address="Улица, 1", value=0.1 + 0.2),
+            QueryLog(cadastral_number="77:01:0002", latitude=-33.0, longitude=151.0,
+                     created_at=datetime(2026, 10, 1, 12, 0, 1), value=100.0),
+            QueryLog(cadastral_number="77:01:0003", latitude=0.0, longitude=1e-7,
+                     created_at=datetime(2026, 10, 1, 12, 0, 2, 500000)),
+        ])
+        await session.commit()
+
+    bodies = {}
+    for fast in (False, True):
+        monkeypatch.setattr(main, "FAST_JSON_ENABLED", fast)
+        response = await api.get("/history", headers=headers)
+        assert response.status_code == 200, response.text
+        bodies[fast] = response.content
+
+    assert canonical(bodies[True]) == canonical(bodies[False])
+    assert len(canonical(bodies[True])) == 3
+
+
+@pytest.mark.asyncio
+async def test_fast_json_query_matches_the_pydantic_response(api, login, monkeypatch):
+    headers = {"Authorization": f"Bearer {(await login('fast-query@example.com'))['access_token']}"}
+    query = {"cadastral_number": "77:01:0001", "latitude": 55.7558, "longitude": 37.6173}
+
+    for fast in (False, True):
+        monkeypatch.setattr(main, "FAST_JSON_ENABLED", fast)
+        response = await api.post("/query", json=query, headers=headers)
+        assert response.status_code == 200, response.text
+        async with api.session_maker() as session:
+            log = (await session.execute(select(QueryLog).where(QueryLog.id == response.json()["id"]))).scalar_one()
+        assert canonical(response.content) == canonical(pydantic_json(log))
+
+
+@pytest.mark.asyncio
+async def test_fast_json_write_behind_query_matches_the_pydantic_response(api, login, monkeypatch):
+    headers = {"Authorization": f"Bearer {(await login('fast-write-behind@example.com'))['access_token']}"}
+    query = {"cadastral_number": "77:01:0001", "latitude": 55.7558, "longitude": 37.6173}
+    enqueued = []
+
+    async def enqueue(row):
+        enqueued.append(row)
+
+    monkeypatch.setattr(main, "QUERY_LOG_WRITE_BEHIND", True)
+    monkeypatch.setattr(main.query_log_writer, "enqueue", enqueue)
+    for fast in (False, True):
+        monkeypatch.setattr(main, "FAST_JSON_ENABLED", fast)
+        response = await api.post("/query", json=query, headers=headers)
+        assert response.status_code == 200, response.text
+        expected = main.QueryLogResponse.model_validate(enqueued[-1]).model_dump_json().encode()
+        assert canonical(response.content) == canonical(expected)
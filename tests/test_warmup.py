@@ -0,0 +1,19 @@
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.models import Base
+from app.warmup import primary_statements, read_statements, warm_engine
+
+
+@pytest.mark.asyncio
+async def test_warm_engine_fills_the_pool_and_runs_hot_statements(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'warmup.db'}", pool_size=3)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    assert await warm_engine(engine, 3, primary_statements() + read_statements()) == 3
+
+    pool = engine.sync_engine.pool
+    assert pool.checkedin() == 3
+    assert pool.checkedout() == 0
+    await engine.dispose()